@@ -0,0 +1,49 @@
+"""
+Compare query throughput over HTTP with basic auth (credentials checked on every request) and token auth (one sign in, then a bearer token).
+
+Needs a running SurrealDB server.
+
+Usage: python benchmarks/http_auth.py [queries] [threads] [host] [port] [user] [password]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pysurrealdb.clients.http_client import HttpClient
+
+
+def run(auth, queries, threads, settings):
+    client = HttpClient(**settings, auth=auth)
+    # one client per thread, so sessions aren't shared. Copies start with the same token.
+    clients = [client.copy() for _ in range(threads)]
+    clients[0].query('SELECT * FROM 1')
+    per_thread = queries // threads
+
+    def work(client):
+        for _ in range(per_thread):
+            client.query('SELECT * FROM 1')
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(work, clients))
+    elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:] + [None] * 6
+    queries = int(args[0] or 2000)
+    threads = int(args[1] or 4)
+    settings = {
+        'host': args[2] or 'localhost',
+        'port': int(args[3] or 8000),
+        'user': args[4] or 'root',
+        'password': args[5] or 'root',
+        'namespace': 'test',
+        'database': 'test',
+    }
+    for auth in ['basic', 'token']:
+        print(f'{auth:>6}: {run(auth, queries, threads, settings):8.0f} queries/s')
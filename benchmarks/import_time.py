@@ -0,0 +1,46 @@
+"""
+Measure how long `import pysurrealdb` takes, and check that it doesn't load client dependencies.
+
+Each run imports the package in a fresh interpreter. Compare the result against `python -c pass` to see the cost of the package itself.
+
+Usage: python benchmarks/import_time.py [runs] [budget_ms]
+Exits with an error if the median import time goes over the budget, or if requests, websocket or the config file were loaded.
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECK = '''
+import sys, time
+start = time.perf_counter()
+import pysurrealdb
+elapsed = time.perf_counter() - start
+loaded = [m for m in ['requests', 'websocket', 'pysurrealdb.clients.http_client', 'pysurrealdb.clients.ws_client'] if m in sys.modules]
+config_read = sys.modules['pysurrealdb.config'].config._config is not None
+print(elapsed, ','.join(loaded), config_read)
+'''
+
+
+def run(runs=20):
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', CHECK], cwd=ROOT, capture_output=True, text=True, check=True).stdout.split(' ')
+        times.append(float(out[0]) * 1000)
+        loaded, config_read = out[1], out[2].strip() == 'True'
+    return statistics.median(times), loaded, config_read
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else 50.0
+    median, loaded, config_read = run(runs)
+    print(f'import pysurrealdb: {median:.1f} ms (median of {runs} runs, budget {budget:.0f} ms)')
+    if loaded:
+        print('Imported eagerly:', loaded)
+    if config_read:
+        print('The config file was read at import time.')
+    if loaded or config_read or median > budget:
+        sys.exit(1)
@@ -0,0 +1,62 @@
+"""
+Compare encoding a DataFrame for insert through df.to_dict('records') and json.dumps per row (what insert() does) with insert_dataframe()'s column-wise encoding.
+
+Only the client side encoding is timed, so it doesn't need a server. Pass a host to also time inserting into a server.
+
+Usage: python benchmarks/insert_dataframe.py [rows] [host] [port] [user] [password]
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pysurrealdb
+from pysurrealdb.dataframe import encode_dataframe
+
+
+def frame(rows):
+    rng = np.random.default_rng(0)
+    price = rng.random(rows) * 100
+    price[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        'sku': np.char.add('sku-', rng.integers(0, 100000, rows).astype(str)),
+        'quantity': rng.integers(0, 1000, rows),
+        'price': price,
+        'in_stock': rng.random(rows) < 0.9,
+        'updated': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 86400 * 365, rows), unit='s'),
+        'region': pd.Categorical(rng.choice(['eu', 'us', 'apac'], rows)),
+    })
+
+
+def encode_records(df, chunk_rows):
+    records = df.to_dict('records')
+    for start in range(0, len(records), chunk_rows):
+        yield '[' + ','.join(json.dumps(row, default=str, ensure_ascii=False) for row in records[start:start + chunk_rows]) + ']'
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:] + [None] * 5
+    rows = int(args[0] or 1000000)
+    df = frame(rows)
+    records = timed(lambda: sum(1 for _ in encode_records(df, 10000)))
+    columns = timed(lambda: sum(1 for _ in encode_dataframe(df, chunk_rows=10000)))
+    print(f'{rows} rows')
+    print(f'to_dict + json.dumps: {records:6.2f} s ({rows / records:9.0f} rows/s)')
+    print(f'    insert_dataframe: {columns:6.2f} s ({rows / columns:9.0f} rows/s, {records / columns:.1f}x faster)')
+
+    if args[1]:
+        conn = pysurrealdb.connect(host=args[1], port=int(args[2] or 8000), user=args[3] or 'root', password=args[4] or 'root', namespace='test', database='test')
+        conn.drop('dataframe_benchmark')
+        inserted = timed(lambda: conn.insert_dataframe('dataframe_benchmark', df))
+        print(f'insert into server: {inserted:6.2f} s ({rows / inserted:9.0f} rows/s)')
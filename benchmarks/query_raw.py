@@ -0,0 +1,51 @@
+"""
+Compare relaying a query result as JSON through query() (decode, check, encode again) and through query_raw() (status check only).
+
+This measures the client side cost on a reply built in memory, so it doesn't need a server.
+
+Usage: python benchmarks/query_raw.py [rows] [repeats]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pysurrealdb.utils import check_raw_result
+
+
+def reply(rows):
+    result = [{'id': f'order:{i}', 'status': 'shipped', 'total': i * 1.5, 'items': [{'sku': f'sku-{i}', 'qty': 2}]} for i in range(rows)]
+    return json.dumps([{'result': result, 'status': 'OK', 'time': '1ms'}]).encode('utf-8')
+
+
+def relay_decoded(data):
+    statements = json.loads(data)
+    for statement in statements:
+        if statement['status'] != 'OK':
+            raise ValueError(statement['result'])
+    return json.dumps(statements[0]['result']).encode('utf-8')
+
+
+def relay_raw(data):
+    return check_raw_result(data)
+
+
+def timed(function, data, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function(data)
+    return (time.perf_counter() - start) / repeats
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:] + [None] * 2
+    rows = int(args[0] or 10000)
+    repeats = int(args[1] or 20)
+    data = reply(rows)
+    print(f'{rows} rows, {len(data) / 1000000:.1f} MB reply')
+    decoded = timed(relay_decoded, data, repeats)
+    raw = timed(relay_raw, data, repeats)
+    print(f'decode + encode: {decoded * 1000:8.2f} ms')
+    print(f'      query_raw: {raw * 1000:8.2f} ms ({decoded / raw:.0f}x faster)')
@@ -0,0 +1,46 @@
+"""
+Compare writing metric samples one row at a time with writing them through a RollupWriter.
+
+Uses the in-memory client by default, so it runs without a server. Pass a host to run against a server.
+
+Usage: python benchmarks/rollup.py [samples] [hosts] [host] [port] [user] [password]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pysurrealdb
+
+
+def samples(count, hosts):
+    start = time.time() - 600
+    for i in range(count):
+        yield {'time': start + i * 600 / count, 'host': f'host-{i % hosts}', 'cpu': random.random(), 'bytes': random.randint(0, 10000)}
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:] + [None] * 6
+    count = int(args[0] or 20000)
+    hosts = int(args[1] or 20)
+    if args[2]:
+        conn = pysurrealdb.connect(host=args[2], port=int(args[3] or 8000), user=args[4] or 'root', password=args[5] or 'root', namespace='test', database='test')
+    else:
+        conn = pysurrealdb.connect(client='memory')
+    conn.drop('metric_raw')
+    conn.drop('metric_1m')
+
+    start = time.perf_counter()
+    for sample in samples(count, hosts):
+        conn.insert('metric_raw', sample)
+    raw = time.perf_counter() - start
+    print(f'  row per sample: {count / raw:8.0f} samples/s, {count} records written')
+
+    start = time.perf_counter()
+    with conn.rollup_writer('metric_1m', bucket='1m', group_by='host', aggregates={'cpu': ['mean', 'max'], 'bytes': 'sum'}) as rollup:
+        rollup.write_many(samples(count, hosts))
+    rolled = time.perf_counter() - start
+    stats = rollup.stats()
+    print(f'   rollup writer: {count / rolled:8.0f} samples/s, {stats["written"]} records written in {stats["requests"]} requests ({stats["reduction"]:.0f}x fewer)')
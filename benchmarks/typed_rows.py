@@ -0,0 +1,77 @@
+"""
+Compare memory use and decode time of plain dict rows against rows decoded with QueryBuilder.as_type().
+
+Rows are generated locally in the shape SurrealDB returns them, so no server is needed.
+
+Usage: python benchmarks/typed_rows.py [rows]
+"""
+import datetime
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import NamedTuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pysurrealdb.decoders import decode_rows
+from pysurrealdb.utils import RecordID
+
+
+class SlotsPerson:
+    __slots__ = ('id', 'name', 'age', 'created')
+    id: RecordID
+    name: str
+    age: int
+    created: datetime.datetime
+
+
+@dataclass
+class DataclassPerson:
+    id: RecordID
+    name: str
+    age: int
+    created: datetime.datetime
+
+
+class TuplePerson(NamedTuple):
+    id: RecordID
+    name: str
+    age: int
+    created: datetime.datetime
+
+
+def make_rows(n):
+    # as they come out of json.loads: every string is a separate object
+    return [{'id': f'person:{i}', 'name': f'name{i}', 'age': i % 90, 'created': f'2023-01-02T03:04:{i % 60:02d}.123456789Z'} for i in range(n)]
+
+
+def measure(n, cls):
+    """Return (megabytes held by the rows, seconds to decode). Memory is measured in a separate pass, since tracing slows decoding down."""
+    rows = make_rows(n)
+    gc.collect()
+    start = time.perf_counter()
+    if cls is not None:
+        decode_rows(rows, cls)
+    elapsed = time.perf_counter() - start
+    del rows
+
+    gc.collect()
+    tracemalloc.start()
+    rows = make_rows(n)
+    if cls is not None:
+        decode_rows(rows, cls)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return current / 1e6, elapsed
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(f'{n} rows')
+    for label, cls in [('dict', None), ('__slots__', SlotsPerson), ('dataclass', DataclassPerson), ('namedtuple', TuplePerson)]:
+        memory, elapsed = measure(n, cls)
+        print(f'{label:>12}: {memory:8.1f} MB  decode {elapsed:6.2f} s')
@@ -0,0 +1,81 @@
+"""
+Compare the JSON and CBOR wire formats of WSClient on a large query reply and a large insert.
+
+Messages are built locally in the shape SurrealDB sends them, so no server is needed. Requires cbor2.
+JSON replies hold datetimes, UUIDs and decimals as strings, so the "typed" column adds the cost of converting them, to match what CBOR returns.
+
+Usage: python benchmarks/ws_wire_format.py [rows]
+"""
+import datetime
+import decimal
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cbor2
+
+from pysurrealdb.clients import cbor
+from pysurrealdb.decoders import parse_datetime, parse_decimal, parse_uuid
+
+start_time = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_rows(n):
+    return [{
+        'id': f'event:{i}',
+        'user': f'user:{i % 1000}',
+        'at': start_time + datetime.timedelta(seconds=i, microseconds=i % 1000000),
+        'amount': decimal.Decimal(f'{i % 10000}.25'),
+        'session': uuid.UUID(int=i),
+        'count': i % 97,
+        'ok': i % 2 == 0,
+    } for i in range(n)]
+
+
+def json_reply(rows):
+    return json.dumps({'id': '1', 'result': [{'status': 'OK', 'time': '1ms', 'result': rows}]}, default=str).encode()
+
+
+def cbor_reply(rows):
+    tagged = [{**row, 'id': cbor.record_id(row['id']), 'user': cbor.record_id(row['user'])} for row in rows]
+    return cbor2.dumps({'id': '1', 'result': [{'status': 'OK', 'time': '1ms', 'result': tagged}]}, encoders=cbor._encoders)
+
+
+def type_json_rows(rows):
+    for row in rows:
+        row['at'] = parse_datetime(row['at'])
+        row['amount'] = parse_decimal(row['amount'])
+        row['session'] = parse_uuid(row['session'])
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rows = make_rows(n)
+    print(f'{n} rows')
+    try:
+        import _cbor2
+    except ImportError:
+        print('cbor2 is running without its C extension, so CBOR times are much slower than they would be in production.')
+
+    json_bytes, cbor_bytes = json_reply(rows), cbor_reply(rows)
+    reply, json_decode = timed(json.loads, json_bytes)
+    _, json_typing = timed(type_json_rows, reply['result'][0]['result'])
+    _, cbor_decode = timed(cbor.decode, cbor_bytes)
+    print(f'reply   json: {len(json_bytes) / 1e6:7.1f} MB  decode {json_decode:6.2f} s  typed {json_decode + json_typing:6.2f} s')
+    print(f'reply   cbor: {len(cbor_bytes) / 1e6:7.1f} MB  decode {cbor_decode:6.2f} s  typed {cbor_decode:6.2f} s')
+
+    request = {'id': '1', 'method': 'insert', 'params': ['event', rows]}
+    json_request, json_encode = timed(lambda: json.dumps(request, ensure_ascii=False, default=str).encode())
+    cbor_request, cbor_encode = timed(cbor.encode, request)
+    print(f'insert  json: {len(json_request) / 1e6:7.1f} MB  encode {json_encode:6.2f} s')
+    print(f'insert  cbor: {len(cbor_request) / 1e6:7.1f} MB  encode {cbor_encode:6.2f} s')
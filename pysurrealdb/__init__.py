@@ -1,14 +1,34 @@
-import requests
-
-from .clients.http_client import HttpClient
 from .connections import Connection
 from .model import Model
 from .query_builder import QueryBuilder
 from .config import config
 
+# DB-API 2.0 module globals. Cursors also accept SurrealQL's $name placeholders and ? placeholders (see cursor.bind).
+apilevel = '2.0'
+threadsafety = 1
+paramstyle = 'pyformat'
+
 Client = Instance = Connection # I've seen some people prefer to use the name Client/Instance instead of Connection. This is just an alias. Not to be confused with the HttpClient class, which is the interface to the surreal api.
 
-def connect(host=None, port=None, user=None, password=None, database=None, namespace=None, client=None) -> Connection:
+# These are imported on first use, so that importing pysurrealdb stays fast and doesn't load requests or websocket until a client is needed.
+_lazy_imports = {
+    'HttpClient': '.clients.http_client',
+    'WSClient': '.clients.ws_client',
+    'bulk_load': '.bulk',
+    'export': '.exporter',
+    'WriteScheduler': '.scheduler',
+    'ShardedConnection': '.sharding',
+}
+
+def __getattr__(name):
+    if name in _lazy_imports:
+        import importlib
+        value = getattr(importlib.import_module(_lazy_imports[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def connect(host=None, port=None, user=None, password=None, database=None, namespace=None, client=None, **kwargs) -> Connection:
     """ 
     Connect to the SurrealDB server. 
 
@@ -20,16 +40,19 @@ def connect(host=None, port=None, user=None, password=None, database=None, names
         password: The password to login with.
         database: The database to use. defaults to 'main'.
         namespace: The namespace to use. defaults to 'main'.
+        **kwargs: Other Connection options, like timeout or thread_local.
     
     This function caches the current connection. 
     """
 
     if isinstance(host, dict):
         # if host is a dict, assume it's a config object
-        Connection.connections['current'] = Connection(**host)
+        conn = Connection(**host)
     else:
-        Connection.connections['current'] = Connection(host=host, port=port, user=user, password=password, database=database, namespace=namespace, client=client)
-    return Connection.connections['current']
+        conn = Connection(host=host, port=port, user=user, password=password, database=database, namespace=namespace, client=client, **kwargs)
+    with Connection._registry_lock:
+        Connection.connections['current'] = conn
+    return conn
 
 def connection(name:str = None) -> Connection:
     """
@@ -37,37 +60,59 @@ def connection(name:str = None) -> Connection:
 
     Args:
         name: The name of the connection. This is used to look up the connection in the config file. If not specified, the most recent connection is returned. If no current connection exists, a default connection is attempted.
+
+    The registry is shared by all threads. Connections are safe to keep across a fork: the child process rebuilds their clients instead of using the parent's sockets.
     """
-    conn = None
-    # If no name is specified, return the most recent connection
-    if name is None and 'current' in Connection.connections:
-        conn = Connection.connections['current']
-
-    elif name:
-        # have we already created a connection with this name?
-        if name in Connection.connections:
-            conn = Connection.connections[name]
-        elif name in config.connections: 
-            # if not, create a new connection
-            conn = Connection(**config.connections[name])
-            Connection.connections[name] = conn
-        else:
-            raise Exception(f'SurrealDB: Connection "{name}" not found.')
-
-    # check for a default config
-    elif config.connections.get('default'):
-        conn = Connection(**config.connections['default'])
-        Connection.connections['default'] = conn
-
-    if not conn:
-        # try to connect to localhost
-        conn = Connection()
-
-    # cache the connection
-    Connection.connections['current'] = conn
+    with Connection._registry_lock:
+        conn = None
+        # If no name is specified, return the most recent connection
+        if name is None and 'current' in Connection.connections:
+            conn = Connection.connections['current']
+
+        elif name:
+            # have we already created a connection with this name?
+            if name in Connection.connections:
+                conn = Connection.connections[name]
+            elif name in config.connections: 
+                # if not, create a new connection
+                conn = Connection(**config.connections[name])
+                Connection.connections[name] = conn
+            else:
+                raise Exception(f'SurrealDB: Connection "{name}" not found.')
+
+        # check for a default config
+        elif config.connections.get('default'):
+            conn = Connection(**config.connections['default'])
+            Connection.connections['default'] = conn
+
+        if not conn:
+            # try to connect to localhost
+            conn = Connection()
+
+        # cache the connection
+        Connection.connections['current'] = conn
     
     return conn
 
+def warm_up(*names):
+    """
+    Build the named connections (or every connection in the registry if no names are given) and check that each server is reachable.
+
+    Call this before forking, for example when a gunicorn app is loaded, so configuration errors show up once in the parent. 
+    Call it again at the start of each worker (in gunicorn's post_fork hook, for example) to open the worker's own connections before its first request.
+    Returns the connections that were warmed up.
+    """
+    if names:
+        connections = [connection(name) for name in names]
+    else:
+        with Connection._registry_lock:
+            connections = list({id(conn): conn for conn in Connection.connections.values()}.values())
+        if not connections:
+            connections = [connection()]
+    for conn in connections:
+        conn.ping()
+    return connections
+
 
 ## These are utility functions to allow the use of query methods without having to create a connection object. Note: They only work if a connection has already been created, or a default connection is available.
 def table(name: str) -> QueryBuilder:
@@ -0,0 +1,327 @@
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+
+from .connections import Connection, resolve_connection
+from .err import QueryError, QueryTimeoutError, SurrealDBError
+
+
+@dataclass
+class BulkLoadStats:
+    """
+    Progress of a bulk load. Passed to the progress callback while loading, and returned when the load is finished.
+
+    offset is the byte offset in the file up to which every row has been written (or has failed). Pass it back as the offset to resume a load.
+    """
+    rows: int = 0
+    batches: int = 0
+    failed_rows: int = 0
+    failed_batches: int = 0
+    offset: int = 0
+    errors: list = field(default_factory=list)
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_sec(self):
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed else 0.0
+
+    def __str__(self):
+        return f'SurrealDB: {self.rows} rows loaded ({self.rows_per_sec:.0f} rows/s), {self.failed_rows} rows failed, offset {self.offset}'
+
+
+class _LineReader:
+    """Iterate over the lines of a binary file, keeping track of the byte offset after the last line read."""
+    def __init__(self, f, offset=0):
+        self.f = f
+        self.seek(offset)
+
+    def seek(self, offset):
+        self.f.seek(offset)
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line
+
+
+def _read_ndjson(f, offset, transform):
+    """Yield (end offset, size, row) for each line of an NDJSON file. Rows are kept as JSON text unless they need to be transformed."""
+    lines = _LineReader(f, offset)
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if transform:
+            row = transform(json.loads(line))
+            if row is None:
+                continue
+        else:
+            row = line.decode('utf-8')
+        yield lines.offset, len(line), row
+
+
+def _read_csv(f, offset, transform, delimiter):
+    """Yield (end offset, size, row) for each row of a CSV file. The first row is used as the header."""
+    lines = _LineReader(f)
+    reader = csv.reader((line.decode('utf-8-sig') for line in lines), delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        return
+    if offset > lines.offset:
+        lines.seek(offset)
+    position = lines.offset
+    for values in reader:
+        if not values:
+            continue
+        row = dict(zip(header, values))
+        if transform:
+            row = transform(row)
+            if row is None:
+                continue
+        yield lines.offset, lines.offset - position, row
+        position = lines.offset
+
+
+def _batches(rows, batch_rows, batch_bytes, scheduler=None):
+    """
+    Group rows into batches bounded by a row count and an approximate size in bytes. Yields (end offset, size, rows).
+    With a scheduler, the bounds are read from it at the start of each batch.
+    """
+    batch, size, end = [], 0, None
+    if scheduler is not None:
+        batch_rows, batch_bytes = scheduler.batch_rows, scheduler.batch_bytes
+    for end, row_size, row in rows:
+        batch.append(row)
+        size += row_size
+        if len(batch) >= batch_rows or size >= batch_bytes:
+            yield end, size, batch
+            batch, size = [], 0
+            if scheduler is not None:
+                batch_rows, batch_bytes = scheduler.batch_rows, scheduler.batch_bytes
+    if batch:
+        yield end, size, batch
+
+
+# Each worker thread (or process) writes through its own connection.
+_worker = threading.local()
+
+def _init_thread_worker(connection, connections):
+    # kept so bulk_load can close them once the executor has shut down
+    _worker.connection = Connection(client=connection.client.copy())
+    connections.append(_worker.connection)
+
+def _init_process_worker(client_type, settings):
+    from multiprocessing.util import Finalize
+    _worker.connection = Connection(client=client_type, **settings)
+    # closed when the worker process exits, after the executor shuts down
+    Finalize(None, _worker.connection.close, exitpriority=10)
+
+def _nothing_written(error):
+    """
+    Whether a failed insert certainly wrote nothing, so it can be sent again without duplicating rows.
+    That is the case when the server replied with an error (an INSERT is all or nothing), or when no connection could be made.
+    A timeout or a connection dropped after the request was sent may come after the rows were written.
+    """
+    if isinstance(error, QueryError) or (isinstance(error, SurrealDBError) and not isinstance(error, QueryTimeoutError)):
+        return True
+    try:
+        from requests.exceptions import ConnectTimeout, ConnectionError as RequestsConnectionError
+        from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
+        not_connected = (ConnectionRefusedError, ConnectTimeout, NewConnectionError, ConnectTimeoutError)
+    except ImportError:
+        RequestsConnectionError, not_connected = (), ConnectionRefusedError
+    while error is not None:
+        if isinstance(error, not_connected):
+            return True
+        # requests wraps a failed connect as ConnectionError(MaxRetryError(reason=NewConnectionError)).
+        # Other ConnectionErrors, like a dropped connection, may come after the request was sent.
+        if isinstance(error, RequestsConnectionError) and error.args and isinstance(getattr(error.args[0], 'reason', None), not_connected):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _upserts(table, rows):
+    """Return a query that writes each row by its id, replacing the record if it exists, or None if a row has no id."""
+    rows = [json.loads(row) if isinstance(row, str) else row for row in rows]
+    statements = []
+    for row in rows:
+        id = row.get('id') if isinstance(row, dict) else None
+        if id is None:
+            return None
+        if isinstance(id, str) and id.startswith(f'{table}:'):
+            id = id[len(table) + 1:]
+        statements.append(f'UPDATE type::thing({json.dumps(table)}, {json.dumps(id, default=str, ensure_ascii=False)}) CONTENT {json.dumps(row, default=str, ensure_ascii=False)}')
+    return ';\n'.join(statements)
+
+
+def _write_batch(table, rows, retries):
+    """
+    Insert one batch with a single request, retrying on failure. Runs in a worker. Returns the number of rows, the number of attempts, and the seconds the successful request took.
+
+    An INSERT is only sent again if it certainly wrote nothing. Otherwise, if every row has an id, the retry writes the rows by id instead, so rows that were already written are replaced, not duplicated.
+    """
+    if isinstance(rows[0], str):
+        # NDJSON rows are already encoded, so there is no need to decode and encode them again.
+        data = '[' + ','.join(rows) + ']'
+    else:
+        data = rows
+    upserts = None
+    for attempt in range(retries + 1):
+        try:
+            start = time.monotonic()
+            if upserts is None:
+                _worker.connection.insert_batch(table, data)
+            else:
+                _worker.connection.query(upserts)
+            return len(rows), attempt + 1, time.monotonic() - start
+        except Exception as e:
+            if attempt == retries:
+                raise
+            if upserts is None and not _nothing_written(e):
+                upserts = _upserts(table, rows)
+                if upserts is None:
+                    raise
+
+
+def _read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, 'r') as f:
+        return int(f.read().strip() or 0)
+
+def _write_checkpoint(path, offset):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(str(offset))
+    os.replace(tmp, path)
+
+
+def bulk_load(path, table, connection=None, format=None, workers=4, batch_rows=1000, batch_bytes=1000000, processes=False, offset=0, checkpoint=None, resume=False, retries=2, transform=None, progress=None, report_every=5.0, delimiter=',', scheduler=None, adaptive=False):
+    """
+    Load an NDJSON or CSV file into a table.
+
+    The file is streamed and split into batches bounded by batch_rows and batch_bytes. Each batch is sent as one INSERT statement.
+    Batches are spread over several workers, each with its own connection. At most 2 batches per worker are queued at once, so memory use stays bounded however large the file is.
+    With a scheduler (or adaptive=True), the batch size and the number of batches in flight are tuned while loading instead.
+
+    Args:
+        path: The file to load.
+        table: The table to insert into.
+        connection: A Connection, a connection name from the config file, or a dict of connection settings. Defaults to the current connection.
+        format: 'ndjson' or 'csv'. Defaults to the file extension.
+        workers: The number of connections to write with.
+        batch_rows: The maximum number of rows per batch.
+        batch_bytes: The maximum size of a batch in bytes, as read from the file.
+        processes: Use worker processes instead of threads. Useful when encoding batches to JSON is slow, as with CSV rows or rows returned by transform. transform itself runs in the reading process. Each process builds its own client from the connection's settings.
+        offset: The byte offset to start reading from.
+        checkpoint: A file to store the offset in as batches complete.
+        resume: Start from the offset stored in the checkpoint file.
+        retries: How many times to retry a failed batch before counting its rows as failed. A batch that may have been written (after a timeout, say) is only retried if every row has an id, and then as writes by id.
+        transform: A function applied to each row before it is inserted. Return None to skip the row.
+        progress: A function called with a BulkLoadStats every report_every seconds.
+        report_every: Seconds between progress reports.
+        delimiter: The CSV delimiter.
+        scheduler: A WriteScheduler that sets the batch size and the number of batches in flight from observed latency and errors. workers is then the most batches that can be in flight.
+        adaptive: Use a new WriteScheduler, starting from batch_rows, batch_bytes and workers.
+
+    Returns:
+        BulkLoadStats for the whole load.
+    """
+    connection = resolve_connection(connection)
+    if format is None:
+        format = 'csv' if str(path).lower().endswith('.csv') else 'ndjson'
+    format = format.lower()
+    if format not in ['ndjson', 'jsonl', 'json', 'csv']:
+        raise ValueError(f'Unsupported format "{format}". Use "ndjson" or "csv".')
+    if resume:
+        offset = max(offset, _read_checkpoint(checkpoint))
+    if adaptive and scheduler is None:
+        from .scheduler import WriteScheduler
+        scheduler = WriteScheduler(batch_rows, batch_bytes, concurrency=workers, max_concurrency=workers)
+
+    # the worker threads' connections, closed once the executor has shut down. Worker processes close their own.
+    connections = []
+    if processes:
+        executor = ProcessPoolExecutor(workers, initializer=_init_process_worker, initargs=(connection.client.client_type, connection.client.settings()))
+    else:
+        executor = ThreadPoolExecutor(workers, initializer=_init_thread_worker, initargs=(connection, connections))
+
+    stats = BulkLoadStats(offset=offset)
+    pending = {}
+    # Batches in the order they were read. The checkpoint only moves past a batch once every batch before it has finished.
+    order = deque()
+    last_report = time.monotonic()
+
+    def finish(future):
+        entry = pending.pop(future)
+        end, count = entry[0], entry[1]
+        error = future.exception()
+        if scheduler is not None:
+            # a batch that needed retries counts as an error, so the scheduler backs off
+            retried = error is None and future.result()[1] > 1
+            # the request's own time, measured in the worker. Batches are only reaped when the reader waits, so the time since submit would include reading.
+            elapsed = future.result()[2] if error is None else time.monotonic() - entry[3]
+            scheduler.record(count, entry[4], elapsed, error or retried, entry[5])
+        if error is None:
+            stats.rows += count
+            stats.batches += 1
+        else:
+            stats.failed_rows += count
+            stats.failed_batches += 1
+            if len(stats.errors) < 100:
+                stats.errors.append((end, repr(error)))
+        entry[2] = True
+        while order and order[0][2]:
+            stats.offset = order.popleft()[0]
+        if checkpoint:
+            _write_checkpoint(checkpoint, stats.offset)
+
+    try:
+        with open(path, 'rb') as f, executor:
+            if format == 'csv':
+                rows = _read_csv(f, offset, transform, delimiter)
+            else:
+                rows = _read_ndjson(f, offset, transform)
+
+            for end, size, batch in _batches(rows, batch_rows, batch_bytes, scheduler):
+                # backpressure: wait for a batch to finish before reading any further
+                while len(pending) >= (min(scheduler.concurrency, workers) if scheduler is not None else workers * 2):
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(future)
+                entry = [end, len(batch), False, time.monotonic(), size, scheduler.generation if scheduler is not None else None]
+                order.append(entry)
+                pending[executor.submit(_write_batch, table, batch, retries)] = entry
+
+                if progress and time.monotonic() - last_report >= report_every:
+                    progress(stats)
+                    last_report = time.monotonic()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(future)
+    finally:
+        for worker_connection in connections:
+            worker_connection.close()
+
+    if progress:
+        progress(stats)
+    return stats
@@ -0,0 +1,99 @@
+import argparse
+
+
+def _add_connection_arguments(parser):
+    parser.add_argument('--connection', help='A connection name from pysurrealdb.json. Defaults to the default connection.')
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--user')
+    parser.add_argument('--password')
+    parser.add_argument('--namespace')
+    parser.add_argument('--database')
+    parser.add_argument('--client', help="'http' or 'ws'")
+
+def _connection_from_args(args):
+    """Return connection settings if any were given on the command line, otherwise the connection name."""
+    settings = {k: getattr(args, k) for k in ['host', 'port', 'user', 'password', 'namespace', 'database', 'client']}
+    settings = {k: v for k, v in settings.items() if v is not None}
+    if settings:
+        return settings
+    return args.connection
+
+
+def load(args):
+    from .bulk import bulk_load
+    stats = bulk_load(
+        args.path,
+        args.table,
+        connection=_connection_from_args(args),
+        format=args.format,
+        workers=args.workers,
+        batch_rows=args.batch_rows,
+        batch_bytes=args.batch_bytes,
+        processes=args.processes,
+        offset=args.offset,
+        checkpoint=args.checkpoint,
+        resume=args.resume,
+        retries=args.retries,
+        progress=print,
+        report_every=args.report_every,
+        delimiter=args.delimiter,
+        adaptive=args.adaptive,
+    )
+    for offset, error in stats.errors:
+        print(f'SurrealDB: Batch ending at offset {offset} failed: {error}')
+    return 1 if stats.failed_rows else 0
+
+
+def export(args):
+    from .exporter import export
+    count = export(
+        args.table,
+        args.path,
+        format=args.format,
+        connection=_connection_from_args(args),
+        page_size=args.page_size,
+        prefetch=not args.no_prefetch,
+    )
+    print(f'SurrealDB: Exported {count} rows to {args.path}')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='pysurrealdb', description='PySurrealDB command line tools.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    parser_load = commands.add_parser('load', help='Load an NDJSON or CSV file into a table.')
+    parser_load.add_argument('path')
+    parser_load.add_argument('table')
+    parser_load.add_argument('--format', choices=['ndjson', 'csv'], help='Defaults to the file extension.')
+    parser_load.add_argument('--workers', type=int, default=4)
+    parser_load.add_argument('--batch-rows', type=int, default=1000)
+    parser_load.add_argument('--batch-bytes', type=int, default=1000000)
+    parser_load.add_argument('--processes', action='store_true', help='Use worker processes instead of threads.')
+    parser_load.add_argument('--offset', type=int, default=0, help='Byte offset to start reading from.')
+    parser_load.add_argument('--checkpoint', help='File to store the offset of completed batches in.')
+    parser_load.add_argument('--resume', action='store_true', help='Resume from the offset in the checkpoint file.')
+    parser_load.add_argument('--retries', type=int, default=2)
+    parser_load.add_argument('--report-every', type=float, default=5.0)
+    parser_load.add_argument('--delimiter', default=',')
+    parser_load.add_argument('--adaptive', action='store_true', help='Tune the batch size and the number of batches in flight while loading. --workers is the most batches in flight.')
+    _add_connection_arguments(parser_load)
+    parser_load.set_defaults(func=load)
+
+    parser_export = commands.add_parser('export', help='Export a table to an NDJSON, CSV or Parquet file.')
+    parser_export.add_argument('table')
+    parser_export.add_argument('path')
+    parser_export.add_argument('--format', choices=['ndjson', 'csv', 'parquet'], help='Defaults to the file extension.')
+    parser_export.add_argument('--page-size', type=int, default=1000)
+    parser_export.add_argument('--no-prefetch', action='store_true', help="Don't fetch the next page while writing the current one.")
+    _add_connection_arguments(parser_export)
+    parser_export.set_defaults(func=export)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,125 @@
+"""
+CBOR encoding for the WebSocket RPC protocol, using SurrealDB's tags for its own types.
+
+cbor2 is imported when a client with format='cbor' is built, so it is only needed by people who use it.
+"""
+import datetime
+import decimal
+import json
+import uuid
+
+from ..utils import RecordID
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+# SurrealDB's CBOR tags
+TAG_NONE = 6
+TAG_TABLE = 7
+TAG_RECORD_ID = 8
+TAG_UUID_STRING = 9
+TAG_DECIMAL = 10
+TAG_DATETIME = 12
+TAG_DURATION_STRING = 13
+TAG_DURATION = 14
+
+_epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# RPC methods whose first parameter is a record or table. A 'table:id' string is sent as a record id, since CBOR strings are not parsed by the server.
+_thing_methods = {'select', 'create', 'update', 'merge', 'patch', 'delete'}
+
+
+def _check():
+    if cbor2 is None:
+        raise ImportError('The cbor format requires cbor2. Install it with "pip install cbor2".')
+
+
+def record_id(value):
+    """Build the record id tag for a 'table:id' string. Numeric ids are sent as numbers, like the server parses them."""
+    table, _, id = str(value).partition(':')
+    if id.startswith('⟨') and id.endswith('⟩'):
+        id = id[1:-1]
+    elif id.isdigit():
+        id = int(id)
+    return cbor2.CBORTag(TAG_RECORD_ID, [table, id])
+
+
+def _encode_datetime(encoder, value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    delta = value - _epoch
+    encoder.encode(cbor2.CBORTag(TAG_DATETIME, [delta.days * 86400 + delta.seconds, delta.microseconds * 1000]))
+
+
+def _encode_decimal(encoder, value):
+    encoder.encode(cbor2.CBORTag(TAG_DECIMAL, str(value)))
+
+
+def _encode_record_id(encoder, value):
+    encoder.encode(record_id(value))
+
+
+def _encode_date(encoder, value):
+    _encode_datetime(encoder, datetime.datetime(value.year, value.month, value.day))
+
+
+_encoders = {
+    datetime.datetime: _encode_datetime,
+    datetime.date: _encode_date,
+    decimal.Decimal: _encode_decimal,
+    RecordID: _encode_record_id,
+}
+
+
+def _decode_record_id(value):
+    table, id = value
+    if not isinstance(id, (str, int)):
+        id = json.dumps(id, default=str, ensure_ascii=False)
+    return str.__new__(RecordID, f'{table}:{id}')
+
+
+def _decode_datetime(value):
+    seconds, nanoseconds = (list(value) + [0, 0])[:2]
+    return _epoch + datetime.timedelta(seconds=seconds, microseconds=nanoseconds // 1000)
+
+
+def _decode_duration(value):
+    seconds, nanoseconds = (list(value) + [0, 0])[:2]
+    return datetime.timedelta(seconds=seconds, microseconds=nanoseconds // 1000)
+
+
+_decoders = {
+    TAG_NONE: lambda value: None,
+    TAG_TABLE: str,
+    TAG_RECORD_ID: _decode_record_id,
+    TAG_UUID_STRING: uuid.UUID,
+    TAG_DECIMAL: decimal.Decimal,
+    TAG_DATETIME: _decode_datetime,
+    TAG_DURATION_STRING: str,
+    TAG_DURATION: _decode_duration,
+}
+
+
+def _tag_hook(decoder, tag):
+    # cbor2 5 calls tag_hook(decoder, tag), cbor2 6 calls tag_hook(tag, immutable)
+    if not isinstance(tag, cbor2.CBORTag):
+        tag = decoder
+    decode = _decoders.get(tag.tag)
+    return tag if decode is None else decode(tag.value)
+
+
+def encode(request):
+    """Encode an RPC request as CBOR."""
+    _check()
+    params = request.get('params')
+    if request.get('method') in _thing_methods and params and isinstance(params[0], str) and ':' in params[0]:
+        request = {**request, 'params': [record_id(params[0]), *params[1:]]}
+    return cbor2.dumps(request, encoders=_encoders)
+
+
+def decode(data):
+    """Decode a CBOR RPC reply. Record ids become RecordID strings, and datetimes, UUIDs and decimals become their Python types."""
+    _check()
+    return cbor2.loads(data, tag_hook=_tag_hook)
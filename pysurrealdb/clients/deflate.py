@@ -0,0 +1,152 @@
+"""
+permessage-deflate (RFC 7692) for the WebSocket client.
+
+websocket-client doesn't support extensions, so the client offers the extension in the handshake headers itself,
+sends compressed frames with the rsv1 bit set, and reads frames with a frame buffer that inflates compressed messages.
+"""
+import threading
+import zlib
+
+from websocket import ABNF
+from websocket._abnf import frame_buffer
+
+EXTENSION = 'permessage-deflate'
+OFFER = f'Sec-WebSocket-Extensions: {EXTENSION}; client_max_window_bits'
+# Z_SYNC_FLUSH ends each message with this, and RFC 7692 leaves it out of the frame
+_tail = b'\x00\x00\xff\xff'
+
+
+def parse_agreement(headers):
+    """Return the permessage-deflate parameters the server agreed to in its handshake headers, as a dict, or None if it didn't agree."""
+    value = (headers or {}).get('sec-websocket-extensions')
+    if not value:
+        return None
+    for extension in value.split(','):
+        name, *params = [part.strip() for part in extension.split(';')]
+        if name != EXTENSION:
+            continue
+        agreed = {}
+        for param in params:
+            key, _, param_value = param.partition('=')
+            agreed[key.strip()] = param_value.strip().strip('"') or None
+        return agreed
+    return None
+
+
+def _window_bits(value):
+    # zlib can't make raw deflate streams with an 8 bit window, and 9 bits can read them
+    return max(9, min(15, int(value or 15)))
+
+
+class Deflate:
+    """
+    Compresses outgoing messages and inflates incoming ones for one socket, with the parameters agreed in the handshake.
+
+    Messages shorter than min_size bytes are sent uncompressed, since compressing them costs more CPU than it saves bandwidth.
+    Unless the server asked for no context takeover, each direction keeps one deflate stream for the life of the socket, so repeated keys and values are cheap after the first message.
+    """
+    def __init__(self, params, level=6, min_size=1024):
+        self.level = level
+        self.min_size = min_size
+        self.client_no_context_takeover = 'client_no_context_takeover' in params
+        self.server_no_context_takeover = 'server_no_context_takeover' in params
+        self.client_window_bits = _window_bits(params.get('client_max_window_bits'))
+        self.server_window_bits = _window_bits(params.get('server_max_window_bits'))
+
+        self.sent_messages = 0
+        self.sent_compressed = 0
+        self.sent_bytes = 0
+        self.sent_wire_bytes = 0
+        self.received_messages = 0
+        self.received_compressed = 0
+        self.received_bytes = 0
+        self.received_wire_bytes = 0
+
+        self._compressor = None
+        self._decompressor = None
+        self._lock = threading.Lock()
+
+    def frame(self, data, opcode=ABNF.OPCODE_TEXT):
+        """Return the frame to send for a message, compressed if it is at least min_size bytes."""
+        payload = data.encode('utf-8') if isinstance(data, str) else data
+        with self._lock:
+            self.sent_messages += 1
+            self.sent_bytes += len(payload)
+            if len(payload) < self.min_size:
+                self.sent_wire_bytes += len(payload)
+                return ABNF.create_frame(payload, opcode)
+            compressor = self._compressor or zlib.compressobj(self.level, zlib.DEFLATED, -self.client_window_bits)
+            compressed = compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._compressor = None if self.client_no_context_takeover else compressor
+            if compressed.endswith(_tail):
+                compressed = compressed[:-len(_tail)]
+            self.sent_compressed += 1
+            self.sent_wire_bytes += len(compressed)
+        frame = ABNF.create_frame(compressed, opcode)
+        frame.rsv1 = 1
+        return frame
+
+    def inflate(self, data, fin):
+        """Inflate one frame of a compressed message. The last frame of the message has fin set."""
+        with self._lock:
+            decompressor = self._decompressor or zlib.decompressobj(-self.server_window_bits)
+            inflated = decompressor.decompress(data)
+            if fin:
+                inflated += decompressor.decompress(_tail)
+            self._decompressor = None if fin and self.server_no_context_takeover else decompressor
+            self.received_wire_bytes += len(data)
+            self.received_bytes += len(inflated)
+        return inflated
+
+    def received_plain(self, length):
+        """Count a received frame of length bytes that was not compressed."""
+        with self._lock:
+            self.received_wire_bytes += length
+            self.received_bytes += length
+
+    def stats(self):
+        """Return the messages and bytes sent and received, before and after compression, and the bytes compression saved."""
+        with self._lock:
+            return {
+                'sent_messages': self.sent_messages,
+                'sent_compressed': self.sent_compressed,
+                'sent_bytes': self.sent_bytes,
+                'sent_wire_bytes': self.sent_wire_bytes,
+                'received_messages': self.received_messages,
+                'received_compressed': self.received_compressed,
+                'received_bytes': self.received_bytes,
+                'received_wire_bytes': self.received_wire_bytes,
+                'bytes_saved': self.sent_bytes - self.sent_wire_bytes + self.received_bytes - self.received_wire_bytes,
+            }
+
+
+class DeflateFrameBuffer(frame_buffer):
+    """A websocket-client frame buffer that accepts frames with the rsv1 bit set, and inflates the messages they start."""
+    def __init__(self, recv_fn, deflate: Deflate, skip_utf8_validation=False):
+        super().__init__(recv_fn, skip_utf8_validation)
+        self.deflate = deflate
+        self._rsv1 = 0
+        self._inflating = False
+
+    def recv_header(self):
+        super().recv_header()
+        fin, rsv1, rsv2, rsv3, opcode, has_mask, length_bits = self.header
+        # frame validation rejects any rsv bit, so the bit is kept here instead of in the frame
+        self._rsv1 = rsv1
+        self.header = (fin, 0, rsv2, rsv3, opcode, has_mask, length_bits)
+
+    def recv_frame(self):
+        frame = super().recv_frame()
+        if frame.opcode in (ABNF.OPCODE_TEXT, ABNF.OPCODE_BINARY):
+            # only the first frame of a message is marked, and continuation frames follow it
+            self._inflating = bool(self._rsv1)
+            with self.deflate._lock:
+                self.deflate.received_messages += 1
+                self.deflate.received_compressed += self._inflating
+        elif frame.opcode != ABNF.OPCODE_CONT:
+            return frame
+        if self._inflating:
+            frame.data = self.deflate.inflate(frame.data, frame.fin)
+        else:
+            self.deflate.received_plain(len(frame.data))
+        return frame
@@ -1,7 +1,8 @@
-import requests, json, sys
+import requests, json, sys, time, threading, base64
 from requests.auth import HTTPBasicAuth
 from ..config import config
-from ..err import QueryError, SurrealDBError
+from ..err import QueryError, QueryTimeoutError, SurrealDBError
+from ..utils import check_raw_result
 
 class HttpClient:
     """
@@ -10,15 +11,39 @@ class HttpClient:
     You should not need to use this class directly. Instead, use the Connection class via the connect() method.
     """
     request_size_limit = 14000
-    def __init__(self, host=None, port=None, user=None, password=None, database=None, namespace=None):
+    client_type = 'http'
+    def __init__(self, host=None, port=None, user=None, password=None, database=None, namespace=None, timeout=None, request_size_limit=None, auth=None, auth_level='root', scope=None, signin_params=None):
+        """
+        Args:
+            auth: 'basic' sends the user and password with every request. 'token' signs in once through /signin and sends the token with each request, refreshing it before it expires.
+                Defaults to 'token' if a scope is given, since scope users can only sign in, and to 'basic' otherwise.
+            auth_level: 'root', 'namespace' or 'database'. The level the user is defined at, for token auth.
+            scope: Sign in to this scope of the namespace and database, with token auth.
+            signin_params: Extra sign in fields, like the variables a scope's SIGNIN clause uses.
+        """
+        if auth is None:
+            auth = 'token' if scope else 'basic'
+        if auth not in ('token', 'basic'):
+            raise ValueError(f'Unknown auth "{auth}". Use "token" or "basic".')
         self.host = host
         self.port = port
         self.user = user
         self.password = password
         self.database = database
         self.namespace = namespace
+        self.timeout = timeout # default timeout in seconds for each request. None waits forever.
+        if request_size_limit:
+            # records larger than this are written with a query instead of the key endpoints, which have a 16kb limit
+            self.request_size_limit = request_size_limit
         self.session = requests.Session()
-        self.auth = HTTPBasicAuth(user, password)
+        self.auth_type = auth
+        self.auth_level = auth_level
+        self.scope = scope
+        self.signin_params = signin_params
+        self.auth = HTTPBasicAuth(user, password) if auth == 'basic' else None
+        self._token = None
+        self._token_expires = None
+        self._token_lock = threading.Lock()
 
         if host:
             if 'http:' not in self.host and 'https:' not in self.host:
@@ -41,6 +66,96 @@ class HttpClient:
 
         self._set_headers()
 
+    def settings(self):
+        """Return the settings needed to build another client for the same server."""
+        return {
+            'host': self.host,
+            'port': self.port,
+            'user': self.user,
+            'password': self.password,
+            'database': self.database,
+            'namespace': self.namespace,
+            'timeout': self.timeout,
+            'request_size_limit': self.request_size_limit,
+            'auth': self.auth_type,
+            'auth_level': self.auth_level,
+            'scope': self.scope,
+            'signin_params': self.signin_params,
+        }
+
+    def copy(self):
+        """Return a new client with the same settings. The copy does not share a session with this client, but starts with the same token."""
+        client = self.__class__(**self.settings())
+        if self._token:
+            client._set_token(self._token, self._token_expires)
+        return client
+
+    def _signin_data(self):
+        if self.scope:
+            data = {'ns': self.namespace, 'db': self.database, 'sc': self.scope}
+            if self.user is not None:
+                data.update({'user': self.user, 'pass': self.password})
+        elif self.auth_level == 'database':
+            data = {'ns': self.namespace, 'db': self.database, 'user': self.user, 'pass': self.password}
+        elif self.auth_level == 'namespace':
+            data = {'ns': self.namespace, 'user': self.user, 'pass': self.password}
+        else:
+            data = {'user': self.user, 'pass': self.password}
+        data.update(self.signin_params or {})
+        return data
+
+    def _set_token(self, token, expires=None):
+        self._token = token
+        self._token_expires = expires
+        self.session.headers['Authorization'] = f'Bearer {token}'
+
+    @staticmethod
+    def _token_expiry(token):
+        """Read the expiry time from a JWT, without checking its signature. Return None if it has none."""
+        try:
+            payload = token.split('.')[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+            return float(claims['exp'])
+        except Exception:
+            return None
+
+    def signin(self):
+        """
+        Sign in through /signin and use the returned token for later requests.
+        If the server doesn't return a token (older versions don't for root users), the client falls back to basic auth.
+        """
+        url = f"{self.host}:{self.port}/signin"
+        try:
+            response = self.session.post(url, data=json.dumps(self._signin_data()), headers={'Authorization': None}, timeout=self.timeout)
+        except requests.exceptions.Timeout as e:
+            raise QueryTimeoutError("Request to SurrealDB timed out.", url) from e
+        if not response.ok:
+            raise SurrealDBError("Sign in to SurrealDB failed.", response.content)
+        token = response.json().get('token')
+        if not token:
+            if config.warnings: print("SurrealDB: The server did not return a token. Using basic auth.")
+            self.auth_type = 'basic'
+            self.auth = HTTPBasicAuth(self.user, self.password)
+            return None
+        self._set_token(token, self._token_expiry(token))
+        return token
+
+    def _ensure_token(self, refresh=False, stale=None):
+        """
+        Sign in if there is no token yet, or if it expires in the next 30 seconds. With refresh, sign in again unless another thread already replaced the stale token.
+        """
+        if self.auth_type != 'token' or (self.user is None and not self.scope):
+            return
+        token, expires = self._token, self._token_expires
+        if token and not refresh and (expires is None or expires - time.time() > 30):
+            return
+        with self._token_lock:
+            if refresh and self._token != stale:
+                return
+            if not refresh and self._token and (self._token_expires is None or self._token_expires - time.time() > 30):
+                return
+            self.signin()
+
     def _set_headers(self, headers=None):
         if not headers:
             headers = {
@@ -58,20 +173,9 @@ class HttpClient:
     def __exit__(self, *args, **kwargs):
         self.close()
 
-    def _send(self, data, method='POST', endpoint='sql'):
-        """Send a request to SurrealDB and return the response."""
-        url = f"{self.host}:{self.port}/{endpoint}"
-
-        if not isinstance(data, str):
-            data = json.dumps(data, default=str, ensure_ascii=False)
-        
-        data = data.encode('utf-8')
-        response = self.session.request(method, url, data=data, auth=self.auth)
-        
-        if not response.ok:
-            raise SurrealDBError("Request to SurrealDB failed.", response.content)
-        
-        r = response.json()
+    def _send(self, data, method='POST', endpoint='sql', timeout=None):
+        """Send a request to SurrealDB and return the response. If timeout is not given, the client's default timeout is used."""
+        r = self._request(data, method, endpoint, timeout).json()
         if len(r) > 1:
             results = []
             for row in r:
@@ -84,6 +188,30 @@ class HttpClient:
             raise QueryError("Query failed.", r[0])
         return r[0]['result']
 
+    def _request(self, data, method='POST', endpoint='sql', timeout=None):
+        """Send a request to SurrealDB and return the undecoded response, raising SurrealDBError if the request failed."""
+        url = f"{self.host}:{self.port}/{endpoint}"
+
+        if not isinstance(data, str):
+            data = json.dumps(data, default=str, ensure_ascii=False)
+        
+        data = data.encode('utf-8')
+        self._ensure_token()
+        token = self._token
+        try:
+            response = self.session.request(method, url, data=data, auth=self.auth, timeout=timeout if timeout is not None else self.timeout)
+            if response.status_code == 401 and token:
+                # the token expired or was revoked. Sign in again and retry once.
+                self._ensure_token(refresh=True, stale=token)
+                response = self.session.request(method, url, data=data, auth=self.auth, timeout=timeout if timeout is not None else self.timeout)
+        except requests.exceptions.Timeout as e:
+            # requests drops the timed out connection, so the session can still be used.
+            raise QueryTimeoutError("Request to SurrealDB timed out.", url) from e
+        
+        if not response.ok:
+            raise SurrealDBError("Request to SurrealDB failed.", response.content)
+        return response
+
     def _send_chunks(self, data, method='POST', endpoint='sql'):
         """Send a request to SurrealDB and return the response."""
         # Note: Not currently used, but may be useful in the future
@@ -112,6 +240,17 @@ class HttpClient:
         """Close the connection to SurrealDB."""
         self.session.close()
 
+    def ping(self, timeout=None):
+        """Check that the server is up. This also opens the session's connection, so the next query doesn't have to."""
+        url = f"{self.host}:{self.port}/health"
+        try:
+            response = self.session.get(url, timeout=timeout if timeout is not None else self.timeout)
+        except requests.exceptions.Timeout as e:
+            raise QueryTimeoutError("Request to SurrealDB timed out.", url) from e
+        if not response.ok:
+            raise SurrealDBError("SurrealDB is not healthy.", response.content)
+        return True
+
     def select_db(self, database):
         """Select a database."""
         self.database = database
@@ -127,13 +266,20 @@ class HttpClient:
         self.select_namespace(ns)
         self.select_db(db)
 
-    def query(self, sql):
+    def query(self, sql, timeout=None):
         """Execute an SQL query and return the result."""
-        return self._send(sql)
+        return self._send(sql, timeout=timeout)
 
-    def select(self, sql):
+    def select(self, sql, timeout=None):
         """Execute an SQL query and return the result."""
-        return self.query(sql)
+        return self.query(sql, timeout=timeout)
+
+    def query_raw(self, sql, timeout=None):
+        """
+        Execute an SQL query and return the server's reply as undecoded JSON bytes: a list with the status, time and result of each statement.
+        The reply is checked for failed statements without being decoded, so it can be passed on as is.
+        """
+        return check_raw_result(self._request(sql, timeout=timeout).content)
 
     def create(self, table, data):
         """Create one or many records in a SurrealDB table."""
@@ -145,6 +291,12 @@ class HttpClient:
         """Insert one or many records in a SurrealDB table."""
         return self.create(table, data)
 
+    def insert_batch(self, table, data):
+        """Insert many records with a single INSERT statement. Data may be a list of dicts or an already encoded JSON array."""
+        if not isinstance(data, str):
+            data = json.dumps(data, default=str, ensure_ascii=False)
+        return self.query(f"INSERT INTO {table} {data}")
+
     def create_large(self, table, data):
         """Create a record in a SurrealDB table that is larger than Surreal's request limit."""
         # we have to use query method for this, since it has a larger limit than they key endpoints.
@@ -221,13 +373,13 @@ class HttpClient:
         """Drop a SurrealDB table."""
         return self._send(None, method='DELETE', endpoint=f'key/{table}')
 
-    def get(self, table, id=None):
+    def get(self, table, id=None, timeout=None):
         """Get a record from a SurrealDB table."""
         if ':' in table:
             table, id = table.split(':')
         if not id:
-            return self._send(None, method='GET', endpoint=f'key/{table}')
-        results = self._send(None, method='GET', endpoint=f'key/{table}/{id}')
+            return self._send(None, method='GET', endpoint=f'key/{table}', timeout=timeout)
+        results = self._send(None, method='GET', endpoint=f'key/{table}/{id}', timeout=timeout)
         return results[0] if results else None
 
     def getsizeof(self, data):
@@ -0,0 +1,905 @@
+import json
+import math
+import random
+import string
+import threading
+import time
+import uuid
+
+from ..err import QueryError
+from ..utils import verify_table_and_id
+from .surrealql import parse
+
+
+class MemoryStore:
+    """
+    The data of an in-memory server. Records are kept per namespace, database and table, in dicts keyed by record id.
+    Queries hold the store's lock while they run, so each query sees and leaves a consistent state.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.namespaces = {}
+        self.indexes = {}
+
+    def tables(self, namespace, database):
+        return self.namespaces.setdefault(namespace, {}).setdefault(database, {})
+
+    def table_indexes(self, namespace, database):
+        return self.indexes.setdefault(namespace, {}).setdefault(database, {})
+
+
+_id_characters = string.ascii_lowercase + string.digits
+
+
+def _new_id():
+    return ''.join(random.choices(_id_characters, k=20))
+
+
+def _copy(value):
+    """Copy a JSON-like value, so records handed out can't change the store."""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _normalize(value):
+    """Store values the way a server would return them: JSON types only."""
+    return json.loads(json.dumps(value, default=str, ensure_ascii=False))
+
+
+# Values of different types sort in this order, as they do in SurrealDB
+def _sort_key(value):
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    if isinstance(value, list):
+        return (4, tuple(_sort_key(v) for v in value))
+    return (5, json.dumps(value, sort_keys=True, default=str))
+
+
+def _contains(container, value):
+    if isinstance(container, list):
+        return value in container
+    if isinstance(container, str) and isinstance(value, str):
+        return value in container
+    if isinstance(container, dict):
+        return value in container.values()
+    return False
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _compare(operator, left, right):
+    if operator == '=':
+        return left == right
+    if operator == '!=':
+        return left != right
+    if operator == 'CONTAINS':
+        return _contains(left, right)
+    if operator == 'CONTAINSNOT':
+        return not _contains(left, right)
+    if operator == 'CONTAINSALL':
+        return all(_contains(left, v) for v in _as_list(right))
+    if operator == 'CONTAINSANY':
+        return any(_contains(left, v) for v in _as_list(right))
+    if operator == 'CONTAINSNONE':
+        return not any(_contains(left, v) for v in _as_list(right))
+    if operator == 'INSIDE':
+        return _contains(right, left)
+    if operator == 'NOTINSIDE':
+        return not _contains(right, left)
+    if operator == 'ALLINSIDE':
+        return all(_contains(right, v) for v in _as_list(left))
+    if operator == 'ANYINSIDE':
+        return any(_contains(right, v) for v in _as_list(left))
+    if operator == 'NONEINSIDE':
+        return not any(_contains(right, v) for v in _as_list(left))
+    left, right = _sort_key(left), _sort_key(right)
+    if operator == '<':
+        return left < right
+    if operator == '<=':
+        return left <= right
+    if operator == '>':
+        return left > right
+    if operator == '>=':
+        return left >= right
+    raise QueryError('Query failed.', f'Unsupported operator {operator}')
+
+
+def _arithmetic(operator, left, right):
+    if operator == '??':
+        return left if left is not None else right
+    try:
+        if operator == '+':
+            if left is None:
+                return right
+            if right is None:
+                return left
+            return left + right
+        if operator == '-':
+            return (left or 0) - (right or 0)
+        if operator == '*':
+            return left * right
+        if operator == '/':
+            return left / right if right else math.nan
+    except TypeError:
+        return None
+
+
+def _numbers(values):
+    return [v for v in _as_list(values) if isinstance(v, (int, float)) and not isinstance(v, bool)]
+
+
+def _mean(values):
+    numbers = _numbers(values)
+    return sum(numbers) / len(numbers) if numbers else math.nan
+
+
+def _median(values):
+    numbers = sorted(_numbers(values))
+    if not numbers:
+        return None
+    middle = len(numbers) // 2
+    return numbers[middle] if len(numbers) % 2 else (numbers[middle - 1] + numbers[middle]) / 2
+
+
+def _distinct(values):
+    result = []
+    for value in _as_list(values):
+        if value not in result:
+            result.append(value)
+    return result
+
+
+def _thing(table, id=None):
+    if id is None:
+        return str(table)
+    return f'{table}:{id}'
+
+
+# Functions that can be called in queries. Each takes the evaluated arguments.
+_functions = {
+    'math::sum': lambda values: sum(_numbers(values)),
+    'math::mean': _mean,
+    'math::min': lambda values: min(_numbers(values), default=None),
+    'math::max': lambda values: max(_numbers(values), default=None),
+    'math::median': _median,
+    'math::abs': abs,
+    'math::ceil': math.ceil,
+    'math::floor': math.floor,
+    'math::round': round,
+    'math::sqrt': math.sqrt,
+    'array::len': lambda values: len(_as_list(values)),
+    'array::distinct': _distinct,
+    'array::group': lambda values: _distinct([v for value in _as_list(values) for v in _as_list(value)]),
+    'array::flatten': lambda values: [v for value in _as_list(values) for v in _as_list(value)],
+    'array::sort': lambda values: sorted(_as_list(values), key=_sort_key),
+    'string::lowercase': lambda value: str(value).lower(),
+    'string::uppercase': lambda value: str(value).upper(),
+    'string::len': lambda value: len(str(value)),
+    'string::trim': lambda value: str(value).strip(),
+    'string::concat': lambda *values: ''.join('' if v is None else str(v) for v in values),
+    'string::startswith': lambda value, prefix: str(value).startswith(prefix),
+    'string::endswith': lambda value, suffix: str(value).endswith(suffix),
+    'string::contains': lambda value, part: part in str(value),
+    'time::now': lambda: time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime()) + f'.{time.time_ns() % 1000000000:09d}Z',
+    'time::unix': lambda *args: int(time.time()),
+    'rand::uuid': lambda: str(uuid.uuid4()),
+    'rand::uuid::v4': lambda: str(uuid.uuid4()),
+    'rand': random.random,
+    'type::thing': _thing,
+    'type::string': lambda value: str(value),
+    'type::int': lambda value: int(value),
+    'type::float': lambda value: float(value),
+    'type::bool': lambda value: bool(value),
+    'type::is::number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    'meta::id': lambda value: str(value).split(':', 1)[-1],
+    'meta::tb': lambda value: str(value).split(':', 1)[0],
+    'record::id': lambda value: str(value).split(':', 1)[-1],
+    'record::tb': lambda value: str(value).split(':', 1)[0],
+}
+
+# Functions that combine values from every row of a group
+_aggregates = {'count', 'math::sum', 'math::mean', 'math::min', 'math::max', 'math::median', 'array::group', 'array::distinct', 'array::len'}
+
+
+def _get_path(value, path):
+    for key in path:
+        if isinstance(value, dict):
+            value = value.get(key)
+        elif isinstance(value, list):
+            value = [v.get(key) if isinstance(v, dict) else None for v in value]
+        else:
+            return None
+    return value
+
+
+def _set_path(document, path, value):
+    for key in path[:-1]:
+        if not isinstance(document.get(key), dict):
+            document[key] = {}
+        document = document[key]
+    document[path[-1]] = value
+
+
+def _merge(document, data):
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(document.get(key), dict):
+            _merge(document[key], value)
+        else:
+            document[key] = value
+    return document
+
+
+class _Query:
+    """Runs the statements of one query against a store."""
+    def __init__(self, client: 'MemoryClient'):
+        self.client = client
+        self.store = client.store
+        self.params = client.params
+        self.snapshot = None
+
+    @property
+    def tables(self):
+        return self.store.tables(self.client.namespace, self.client.database)
+
+    # evaluation
+
+    def evaluate(self, node, row=None):
+        kind = node[0]
+        if kind == 'literal':
+            return node[1]
+        if kind == 'field':
+            if node[1] == ['id'] and isinstance(row, dict):
+                return row.get('id')
+            return _get_path(row, node[1])
+        if kind == 'thing':
+            return node[1]
+        if kind == 'binary':
+            operator = node[1]
+            if operator == 'AND':
+                return bool(self.truthy(self.evaluate(node[2], row)) and self.truthy(self.evaluate(node[3], row)))
+            if operator == 'OR':
+                return bool(self.truthy(self.evaluate(node[2], row)) or self.truthy(self.evaluate(node[3], row)))
+            left, right = self.evaluate(node[2], row), self.evaluate(node[3], row)
+            if operator in ('+', '-', '*', '/', '??'):
+                return _arithmetic(operator, left, right)
+            return _compare(operator, left, right)
+        if kind == 'not':
+            return not self.truthy(self.evaluate(node[1], row))
+        if kind == 'negate':
+            value = self.evaluate(node[1], row)
+            return -value if isinstance(value, (int, float)) else None
+        if kind == 'array':
+            return [self.evaluate(item, row) for item in node[1]]
+        if kind == 'object':
+            return {key: self.evaluate(item, row) for key, item in node[1]}
+        if kind == 'param':
+            if node[1] == 'this':
+                return row
+            return self.params.get(node[1])
+        if kind == 'call':
+            return self.call(node[1], [self.evaluate(arg, row) for arg in node[2]])
+        if kind == 'index':
+            value, index = self.evaluate(node[1], row), self.evaluate(node[2], row)
+            if isinstance(value, dict):
+                return value.get(index)
+            if isinstance(value, list) and isinstance(index, int) and -len(value) <= index < len(value):
+                return value[index]
+            return None
+        if kind == 'subquery':
+            return self.execute(node[1])
+        if kind == 'cast':
+            return self.cast(node[1], self.evaluate(node[2], row))
+        raise QueryError('Query failed.', f'Cannot evaluate {kind}')
+
+    def cast(self, type_name, value):
+        """Convert a value to a type. Datetimes, durations and record ids are kept as strings, the way the HTTP API returns them."""
+        if value is None:
+            return None
+        try:
+            if type_name == 'int':
+                return int(float(value))
+            if type_name in ('float', 'number', 'decimal'):
+                return float(value)
+            if type_name == 'bool':
+                return value if isinstance(value, bool) else str(value).lower() == 'true'
+            if type_name == 'string':
+                return value if isinstance(value, str) else json.dumps(value)
+        except (TypeError, ValueError):
+            raise QueryError('Query failed.', f'Expected a {type_name} but cannot convert {value!r} into a {type_name}')
+        return value
+
+    def truthy(self, value):
+        if isinstance(value, (list, dict, str)):
+            return len(value) > 0
+        return bool(value)
+
+    def call(self, name, args):
+        if name == 'count':
+            if not args:
+                return 1
+            if isinstance(args[0], list):
+                return sum(1 for v in args[0] if self.truthy(v))
+            return 1 if self.truthy(args[0]) else 0
+        function = _functions.get(name)
+        if function is None:
+            raise QueryError('Query failed.', f'The function {name}() is not supported by the memory client.')
+        try:
+            return function(*args)
+        except QueryError:
+            raise
+        except Exception as e:
+            raise QueryError('Query failed.', f'{name}(): {e}')
+
+    def evaluate_group(self, node, rows):
+        """Evaluate an expression over the rows of a group. Aggregate functions see every row, and plain fields come from the first row."""
+        kind = node[0]
+        if kind == 'call' and node[1] in _aggregates:
+            if node[1] == 'count' and not node[2]:
+                return len(rows)
+            values = [self.evaluate(node[2][0], row) for row in rows] if node[2] else []
+            if node[1] == 'count':
+                return sum(1 for v in values if self.truthy(v))
+            if node[1] == 'array::len':
+                return len(values)
+            return self.call(node[1], [values])
+        if kind == 'call':
+            return self.call(node[1], [self.evaluate_group(arg, rows) for arg in node[2]])
+        if kind == 'binary' and node[1] not in ('AND', 'OR'):
+            left, right = self.evaluate_group(node[2], rows), self.evaluate_group(node[3], rows)
+            if node[1] in ('+', '-', '*', '/', '??'):
+                return _arithmetic(node[1], left, right)
+            return _compare(node[1], left, right)
+        return self.evaluate(node, rows[0] if rows else None)
+
+    # reading
+
+    def record_id(self, table, id):
+        """Return the full id for a record in table, from an id with or without the table."""
+        if id is None:
+            return None
+        id = str(id)
+        if ':' in id:
+            id_table, _, _ = id.partition(':')
+            if id_table != table:
+                raise QueryError('Query failed.', f'The record id {id} does not belong to the table {table}.')
+            return id
+        return f'{table}:{id}'
+
+    def source(self, target, where=None):
+        """Return the records (or values) a target refers to. A table filtered on id = value is read through the table's id hash instead of scanned."""
+        if target[0] == 'table':
+            records = self.tables.get(target[1], {})
+            if where is not None and where[0] == 'binary' and where[1] == '=' and where[2] == ('field', ['id']) and where[3][0] in ('literal', 'thing', 'param'):
+                id = self.evaluate(where[3])
+                if isinstance(id, str) and ':' in id:
+                    record = records.get(id)
+                    return [record] if record is not None else []
+            return list(records.values())
+        value = self.evaluate(target)
+        values = []
+        for item in _as_list(value):
+            if isinstance(item, str) and ':' in item and target[0] in ('thing', 'param', 'array'):
+                table = item.split(':', 1)[0]
+                record = self.tables.get(table, {}).get(item)
+                if record is not None:
+                    values.append(record)
+            else:
+                values.append(item)
+        return values
+
+    def select(self, statement):
+        _, fields, targets, where, group, order, limit, start, fetch, explain = statement
+        rows = [row for target in targets for row in self.source(target, where)]
+        if explain:
+            return self.explain(targets, where, explain, rows)
+        if where is not None:
+            rows = [row for row in rows if self.truthy(self.evaluate(where, row))]
+
+        if group is not None:
+            groups = {}
+            for row in rows:
+                key = tuple(json.dumps(_get_path(row, path), sort_keys=True, default=str) for path in group)
+                groups.setdefault(key, []).append(row)
+            results = []
+            for key in sorted(groups, key=lambda k: [_sort_key(json.loads(v)) for v in k]):
+                results.append(self.project_group(fields, groups[key]))
+            pairs = [(result, result) for result in results]
+        else:
+            pairs = [(row, self.project(fields, row)) for row in rows]
+
+        if order:
+            for expression, direction in reversed(order):
+                if direction == 'RAND':
+                    random.shuffle(pairs)
+                    continue
+                pairs.sort(key=lambda pair: _sort_key(self.order_value(expression, *pair)), reverse=direction == 'DESC')
+        results = [result for _, result in pairs]
+        if start is not None:
+            results = results[int(self.evaluate(start)):]
+        if limit is not None:
+            results = results[:int(self.evaluate(limit))]
+        for path in fetch:
+            for result in results:
+                if isinstance(result, dict):
+                    self.fetch(result, path)
+        return _copy(results)
+
+    def order_value(self, expression, row, result):
+        """Return the value to sort a result by. Fields are looked up in the result first, so aliases can be ordered by, then in the source row."""
+        if expression[0] == 'field' and isinstance(result, dict) and expression[1][0] in result:
+            return self.evaluate(expression, result)
+        return self.evaluate(expression, row)
+
+    def project(self, fields, row):
+        if isinstance(fields, tuple):
+            return self.evaluate(fields[1], row)
+        if not isinstance(row, dict):
+            return row
+        result = {}
+        for expression, alias, text in fields:
+            if expression == '*':
+                result.update(row)
+                continue
+            value = self.evaluate(expression, row)
+            self.set_field(result, expression, alias, text, value)
+        return result
+
+    def project_group(self, fields, rows):
+        if isinstance(fields, tuple):
+            return self.evaluate_group(fields[1], rows)
+        result = {}
+        for expression, alias, text in fields:
+            if expression == '*':
+                result.update(rows[0])
+                continue
+            self.set_field(result, expression, alias, text, self.evaluate_group(expression, rows))
+        return result
+
+    def set_field(self, result, expression, alias, text, value):
+        if alias:
+            _set_path(result, alias, value)
+        elif expression[0] == 'field':
+            _set_path(result, expression[1], value)
+        elif expression[0] == 'call':
+            result[expression[1]] = value
+        else:
+            result[text] = value
+
+    def fetch(self, document, path):
+        value = _get_path(document, path)
+
+        def load(item):
+            if isinstance(item, str) and ':' in item:
+                record = self.tables.get(item.split(':', 1)[0], {}).get(item)
+                return _copy(record) if record is not None else item
+            return item
+
+        if isinstance(value, list):
+            _set_path(document, path, [load(item) for item in value])
+        elif value is not None:
+            _set_path(document, path, load(value))
+
+    def explain(self, targets, where, mode, rows):
+        """Describe how a select would read its rows. The memory client always iterates over the table."""
+        plan = []
+        for target in targets:
+            if target[0] == 'table':
+                plan.append({'detail': {'table': target[1]}, 'operation': 'Iterate Table'})
+            else:
+                plan.append({'detail': {'thing': self.evaluate(target)}, 'operation': 'Iterate Thing'})
+        if mode == 'FULL':
+            count = len([row for row in rows if where is None or self.truthy(self.evaluate(where, row))])
+            plan.append({'detail': {'count': count}, 'operation': 'Fetch'})
+        return plan
+
+    # writing
+
+    def content(self, data, document, row=None):
+        """Apply a CONTENT, MERGE or SET clause to a document and return it."""
+        if data is None:
+            return document
+        kind = data[0]
+        if kind == 'content':
+            value = self.evaluate(data[1], row)
+            if not isinstance(value, dict):
+                raise QueryError('Query failed.', 'CONTENT must be an object.')
+            return {'id': document.get('id'), **{k: v for k, v in _normalize(value).items() if k != 'id'}}
+        if kind == 'merge':
+            value = self.evaluate(data[1], row)
+            if not isinstance(value, dict):
+                raise QueryError('Query failed.', 'MERGE must be an object.')
+            return _merge(document, {k: v for k, v in _normalize(value).items() if k != 'id'})
+        for path, operator, expression in data[1]:
+            value = _normalize(self.evaluate(expression, document))
+            if operator != '=':
+                current = _get_path(document, path)
+                if isinstance(current, list):
+                    if operator == '+=':
+                        value = current + _as_list(value)
+                    else:
+                        value = [v for v in current if v not in _as_list(value)]
+                else:
+                    value = _arithmetic(operator[0], current, value)
+            if path == ['id']:
+                continue
+            _set_path(document, path, value)
+        return document
+
+    def check_unique(self, table, record):
+        for index in self.store.table_indexes(self.client.namespace, self.client.database).get(table, {}).values():
+            if not index['unique']:
+                continue
+            key = [_get_path(record, field.split('.')) for field in index['fields']]
+            for other in self.tables.get(table, {}).values():
+                if other['id'] != record['id'] and [_get_path(other, field.split('.')) for field in index['fields']] == key:
+                    raise QueryError('Query failed.', f"Database index `{index['name']}` already contains {json.dumps(key[0] if len(key) == 1 else key)}, with record `{other['id']}`")
+
+    def write(self, table, record):
+        self.check_unique(table, record)
+        self.tables.setdefault(table, {})[record['id']] = record
+        return _copy(record)
+
+    def create_record(self, table, id, document):
+        records = self.tables.setdefault(table, {})
+        id = self.record_id(table, id) if id is not None else f'{table}:{_new_id()}'
+        if id in records:
+            raise QueryError('Query failed.', f'Database record `{id}` already exists')
+        document = {k: v for k, v in document.items() if k != 'id'}
+        return self.write(table, {'id': id, **document})
+
+    def create(self, statement):
+        _, targets, data = statement
+        results = []
+        for target in targets:
+            if target[0] == 'table':
+                table, id = target[1], None
+            else:
+                value = self.evaluate(target)
+                table, _, id = str(value).partition(':')
+                id = id or None
+            document = self.content(data, {'id': None})
+            results.append(self.create_record(table, id if id is not None else document.get('id'), document))
+        return results
+
+    def insert(self, statement):
+        _, table, data = statement
+        results = []
+        for row in _as_list(self.evaluate(data)):
+            if not isinstance(row, dict):
+                raise QueryError('Query failed.', 'INSERT needs an object or an array of objects.')
+            row = _normalize(row)
+            results.append(self.create_record(table, row.get('id'), row))
+        return results
+
+    def targets(self, targets, where):
+        """Return (table, id, existing record) for each record a write targets. Record ids that don't exist yet have no existing record."""
+        found = []
+        for target in targets:
+            if target[0] == 'table':
+                for record in list(self.tables.get(target[1], {}).values()):
+                    found.append((target[1], record['id'], record))
+                continue
+            for item in _as_list(self.evaluate(target)):
+                item = item.get('id') if isinstance(item, dict) else item
+                table, _, id = str(item).partition(':')
+                record_id = f'{table}:{id}' if id else None
+                if record_id is None:
+                    for record in list(self.tables.get(table, {}).values()):
+                        found.append((table, record['id'], record))
+                else:
+                    found.append((table, record_id, self.tables.get(table, {}).get(record_id)))
+        if where is not None:
+            found = [f for f in found if f[2] is not None and self.truthy(self.evaluate(where, f[2]))]
+        return found
+
+    def update(self, statement):
+        _, targets, data, where = statement
+        results = []
+        for table, id, record in self.targets(targets, where):
+            document = _copy(record) if record is not None else {'id': id}
+            document = self.content(data, document, record)
+            document['id'] = id
+            results.append(self.write(table, document))
+        return results
+
+    def delete(self, statement):
+        _, targets, where = statement
+        for table, id, record in self.targets(targets, where):
+            self.tables.get(table, {}).pop(id, None)
+        return []
+
+    def relate(self, statement):
+        _, source, edge, target, data = statement
+        results = []
+        for left in _as_list(self.evaluate(source)):
+            for right in _as_list(self.evaluate(target)):
+                left_id = left.get('id') if isinstance(left, dict) else left
+                right_id = right.get('id') if isinstance(right, dict) else right
+                document = self.content(data, {'id': None})
+                id = document.get('id')
+                document.update({'in': left_id, 'out': right_id})
+                results.append(self.create_record(edge, id, document))
+        return results
+
+    def remove(self, statement):
+        _, kind, name, table = statement
+        if kind == 'TABLE':
+            self.tables.pop(name, None)
+            self.store.table_indexes(self.client.namespace, self.client.database).pop(name, None)
+        elif kind == 'INDEX':
+            indexes = self.store.table_indexes(self.client.namespace, self.client.database).get(table, {})
+            if name not in indexes:
+                raise QueryError('Query failed.', f'The index {name} does not exist')
+            del indexes[name]
+        return None
+
+    def define_index(self, statement):
+        _, name, table, fields, unique = statement
+        indexes = self.store.table_indexes(self.client.namespace, self.client.database).setdefault(table, {})
+        indexes[name] = {'name': name, 'fields': fields, 'unique': unique}
+        if unique:
+            for record in self.tables.get(table, {}).values():
+                self.check_unique(table, record)
+        return None
+
+    def info(self, statement):
+        _, kind, name = statement
+        if kind in ('TABLE', 'TB'):
+            indexes = self.store.table_indexes(self.client.namespace, self.client.database).get(name, {})
+            return {
+                'ev': {}, 'fd': {}, 'ft': {},
+                'ix': {index['name']: f"DEFINE INDEX {index['name']} ON {name} FIELDS {', '.join(index['fields'])}{' UNIQUE' if index['unique'] else ''}" for index in indexes.values()},
+            }
+        if kind in ('DB', 'DATABASE'):
+            return {'dl': {}, 'dt': {}, 'fc': {}, 'pa': {}, 'sc': {}, 'tb': {table: f'DEFINE TABLE {table} SCHEMALESS' for table in self.tables}}
+        if kind in ('NS', 'NAMESPACE'):
+            return {'db': {db: f'DEFINE DATABASE {db}' for db in self.store.namespaces.get(self.client.namespace, {})}, 'nl': {}, 'nt': {}}
+        return {'ns': {ns: f'DEFINE NAMESPACE {ns}' for ns in self.store.namespaces}}
+
+    # statements
+
+    def execute(self, statement):
+        kind = statement[0]
+        if kind == 'select':
+            return self.select(statement)
+        if kind == 'create':
+            return self.create(statement)
+        if kind == 'insert':
+            return self.insert(statement)
+        if kind == 'update':
+            return self.update(statement)
+        if kind == 'delete':
+            return self.delete(statement)
+        if kind == 'relate':
+            return self.relate(statement)
+        if kind == 'remove':
+            return self.remove(statement)
+        if kind == 'define_index':
+            return self.define_index(statement)
+        if kind == 'define_table':
+            self.tables.setdefault(statement[1], {})
+            return None
+        if kind == 'info':
+            return self.info(statement)
+        if kind == 'return':
+            return _copy(self.evaluate(statement[1]))
+        if kind == 'let':
+            self.params[statement[1]] = self.evaluate(statement[2])
+            return None
+        if kind == 'use':
+            if statement[1]:
+                self.client.namespace = statement[1]
+            if statement[2]:
+                self.client.database = statement[2]
+            return None
+        if kind == 'noop':
+            return None
+        raise QueryError('Query failed.', f'Unsupported statement {kind}')
+
+    def run(self, statements):
+        """Run statements and return their results. Statements between BEGIN and COMMIT are rolled back together if one fails or the transaction is cancelled."""
+        results = []
+        for statement in statements:
+            kind = statement[0]
+            if kind == 'begin':
+                self.snapshot = (self.client.namespace, self.client.database, _copy(self.store.namespaces), _copy(self.store.indexes))
+                continue
+            if kind in ('commit', 'cancel'):
+                if kind == 'cancel' and self.snapshot:
+                    self.rollback()
+                self.snapshot = None
+                continue
+            try:
+                results.append(self.execute(statement))
+            except QueryError:
+                if self.snapshot:
+                    self.rollback()
+                raise
+        return results
+
+    def rollback(self):
+        namespace, database, self.store.namespaces, self.store.indexes = self.snapshot
+        self.client.namespace, self.client.database = namespace, database
+        self.snapshot = None
+
+
+class MemoryClient:
+    """
+    An in-process stand-in for a SurrealDB server, for fast tests and local benchmarks. Select it with Connection(client='memory') or config.default_client = 'memory'.
+
+    It evaluates the SurrealQL that pysurrealdb produces: SELECT with WHERE, GROUP BY, ORDER BY, LIMIT, START and FETCH, CREATE, INSERT, UPDATE with CONTENT, MERGE or SET, DELETE, RELATE, transactions, and DEFINE/REMOVE INDEX.
+    Records are kept in dicts keyed by record id. Clients with the same host share their data, like clients of one server do, so copies see each other's writes.
+
+    You should not need to use this class directly. Instead, use the Connection class via the connect() method.
+    """
+    client_type = 'memory'
+    stores = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, host=None, port=None, user=None, password=None, database=None, namespace=None, **kwargs):
+        self.host = host or 'memory'
+        self.port = port
+        self.user = user
+        self.password = password
+        self.namespace = namespace or 'main'
+        self.database = database or 'main'
+        self.params = {}
+        with MemoryClient._stores_lock:
+            self.store = MemoryClient.stores.setdefault(self.host, MemoryStore())
+
+    @classmethod
+    def reset(cls, host=None):
+        """Throw away the data of one in-memory server, or of all of them."""
+        with cls._stores_lock:
+            if host is None:
+                cls.stores.clear()
+            else:
+                cls.stores.pop(host, None)
+
+    def settings(self):
+        """Return the settings needed to build another client for the same server."""
+        return {
+            'host': self.host,
+            'port': self.port,
+            'user': self.user,
+            'password': self.password,
+            'database': self.database,
+            'namespace': self.namespace,
+        }
+
+    def copy(self):
+        """Return a new client with the same settings. The copy shares this client's data."""
+        return self.__class__(**self.settings())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def close(self):
+        pass
+
+    def ping(self):
+        return True
+
+    def select_db(self, database):
+        """Select a database."""
+        self.database = database
+
+    def select_namespace(self, namespace):
+        """Select a namespace."""
+        self.namespace = namespace
+
+    def use(self, ns, db):
+        """Select a namespace and database."""
+        self.select_namespace(ns)
+        self.select_db(db)
+
+    def query(self, sql, timeout=None):
+        """Execute an SQL query and return the result."""
+        statements = parse(sql)
+        with self.store.lock:
+            results = _Query(self).run(statements)
+        if not results:
+            return None
+        if len(results) > 1:
+            return results
+        return results[0]
+
+    def select(self, sql, timeout=None):
+        """Execute an SQL query and return the result."""
+        return self.query(sql, timeout=timeout)
+
+    def query_raw(self, sql, timeout=None):
+        """Execute an SQL query and return the result as JSON bytes, shaped like the reply of a server: a list with the status, time and result of each statement."""
+        start = time.perf_counter()
+        statements = parse(sql)
+        with self.store.lock:
+            results = _Query(self).run(statements)
+        elapsed = f'{(time.perf_counter() - start) * 1000000:.1f}µs'
+        return json.dumps([{'result': result, 'status': 'OK', 'time': elapsed} for result in results], ensure_ascii=False).encode('utf-8')
+
+    def _table_id(self, table, id=None):
+        table, id = verify_table_and_id(table, None if id is None else str(id))
+        return table, id
+
+    def create(self, table, data):
+        """Create one or many records in a table."""
+        if isinstance(data, list):
+            return self.create_many(table, data)
+        return self.create_one(table, data)
+
+    def create_one(self, table, data):
+        """Create a new record in a table."""
+        table, id = self._table_id(table, data.get('id'))
+        with self.store.lock:
+            return [_Query(self).create_record(table, id, _normalize(data))]
+
+    def create_many(self, table, data):
+        """Create many records in a table."""
+        return [self.create_one(table, row) for row in data]
+
+    def insert(self, table, data):
+        """Insert one or many records in a table."""
+        return self.create(table, data)
+
+    def insert_batch(self, table, data):
+        """Insert many records at once. Data may be a list of dicts or an already encoded JSON array."""
+        if isinstance(data, str):
+            data = json.loads(data)
+        with self.store.lock:
+            query = _Query(self)
+            return [query.create_record(table, row.get('id'), _normalize(row)) for row in data]
+
+    def update(self, table, data=None):
+        """Replace the content of a record. The record is created if it doesn't exist."""
+        if data is None:
+            data = table
+            table = str(data['id'])
+        table, id = self._table_id(table, data.get('id'))
+        if not id:
+            raise ValueError("Cannot update a record without an ID.")
+        with self.store.lock:
+            query = _Query(self)
+            record = {**{k: v for k, v in _normalize(data).items() if k != 'id'}, 'id': query.record_id(table, id)}
+            return [query.write(table, record)]
+
+    def upsert(self, table, data, key=['id']):
+        raise DeprecationWarning("upsert from the client is deprecated. Please use connection object instead.")
+
+    def delete(self, table, id=None):
+        """Delete a record."""
+        table, id = self._table_id(table, id)
+        if not id:
+            raise ValueError("Cannot delete a record without an ID. If you meant to delete the entire table, use the drop() method.")
+        with self.store.lock:
+            self.store.tables(self.namespace, self.database).get(table, {}).pop(f'{table}:{id}', None)
+        return []
+
+    def drop(self, table):
+        """Delete every record in a table."""
+        with self.store.lock:
+            self.store.tables(self.namespace, self.database).pop(table, None)
+        return []
+
+    def get(self, table, id=None, timeout=None):
+        """Get a record, or every record in a table."""
+        table, id = self._table_id(table, id)
+        with self.store.lock:
+            records = self.store.tables(self.namespace, self.database).get(table, {})
+            if not id:
+                return _copy(list(records.values()))
+            record = records.get(f'{table}:{id}')
+            return _copy(record) if record is not None else None
@@ -0,0 +1,592 @@
+"""
+A parser for the subset of SurrealQL that pysurrealdb produces, used by the in-memory client.
+
+Statements are parsed into tuples. Expressions are tuples too, with the node type first:
+    ('literal', value), ('thing', 'table:id'), ('field', ['a', 'b']), ('param', name), ('array', [items]), ('object', [(key, item)]),
+    ('call', name, [args]), ('binary', operator, left, right), ('not', item), ('negate', item), ('index', item, index), ('subquery', statement), ('cast', type, item)
+"""
+import re
+
+from ..err import QueryError
+
+_token = re.compile(r"""
+    (?P<space>\s+|--[^\n]*|//[^\n]*|\#[^\n]*)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<number>\d+\.\d+(?:[eE][-+]?\d+)?(?![\w])|\d+(?:[eE][-+]?\d+)?(?![\w]))
+  | (?P<param>\$\w+)
+  | (?P<name>[A-Za-z_]\w*(?:::[A-Za-z_]\w*)*|\d+[A-Za-z_]\w*)
+  | (?P<operator>->|<-|<=|>=|!=|==|\+=|-=|&&|\|\||\?\?|[=<>+\-*/,;()\[\]{}.:!∋∌⊇⊃⊆⊂])
+""", re.VERBOSE)
+_record_id = re.compile(r':(\w+|⟨[^⟩]*⟩|`[^`]*`)')
+_escapes = re.compile(r'\\(.)', re.DOTALL)
+_escape_values = {'n': '\n', 'r': '\r', 't': '\t', '0': '\0', 'Z': '\032'}
+
+# Comparison operators, with the words and symbols SurrealQL accepts for each
+_comparisons = {
+    '=': '=', '==': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>=',
+    'IS': '=', 'CONTAINS': 'CONTAINS', '∋': 'CONTAINS', 'CONTAINSNOT': 'CONTAINSNOT', '∌': 'CONTAINSNOT',
+    'CONTAINSALL': 'CONTAINSALL', '⊇': 'CONTAINSALL', 'CONTAINSANY': 'CONTAINSANY', '⊃': 'CONTAINSANY', 'CONTAINSNONE': 'CONTAINSNONE',
+    'INSIDE': 'INSIDE', 'IN': 'INSIDE', '∈': 'INSIDE', 'NOTINSIDE': 'NOTINSIDE', '∉': 'NOTINSIDE',
+    'ALLINSIDE': 'ALLINSIDE', '⊆': 'ALLINSIDE', 'ANYINSIDE': 'ANYINSIDE', '⊂': 'ANYINSIDE', 'NONEINSIDE': 'NONEINSIDE',
+}
+
+
+def _unquote(text):
+    return _escapes.sub(lambda m: _escape_values.get(m.group(1), m.group(1)), text[1:-1])
+
+
+def _id_text(text):
+    if text[0] in '⟨`':
+        return text[1:-1]
+    return text
+
+
+def tokenize(sql):
+    """Split a query into (kind, value, position) tokens. A name directly followed by ':id' is a record id ('thing')."""
+    tokens = []
+    position = 0
+    while position < len(sql):
+        match = _token.match(sql, position)
+        if match is None:
+            raise QueryError('Query failed.', f'Could not parse the query at: {sql[position:position + 30]!r}')
+        kind = match.lastgroup
+        text = match.group()
+        start, position = position, match.end()
+        if kind == 'space':
+            continue
+        if kind == 'name' and sql.startswith(':', position) and not sql.startswith('::', position):
+            record = _record_id.match(sql, position)
+            if record:
+                position = record.end()
+                tokens.append(('thing', f'{text}:{_id_text(record.group(1))}', start))
+                continue
+        if kind == 'string':
+            tokens.append(('string', _unquote(text), start))
+        elif kind == 'number':
+            tokens.append(('number', float(text) if '.' in text or 'e' in text.lower() else int(text), start))
+        elif kind == 'param':
+            tokens.append(('param', text[1:], start))
+        else:
+            tokens.append((kind, text, start))
+    tokens.append(('end', None, len(sql)))
+    return tokens
+
+
+class Parser:
+    """A recursive descent parser for SurrealQL statements."""
+    def __init__(self, sql):
+        self.sql = sql
+        self.tokens = tokenize(sql)
+        self.position = 0
+
+    # token helpers
+
+    def peek(self, offset=0):
+        return self.tokens[min(self.position + offset, len(self.tokens) - 1)]
+
+    def next(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def is_word(self, *words, offset=0):
+        kind, value, _ = self.peek(offset)
+        return kind == 'name' and value.upper() in words
+
+    def is_operator(self, *operators, offset=0):
+        kind, value, _ = self.peek(offset)
+        return kind == 'operator' and value in operators
+
+    def accept_word(self, *words):
+        if self.is_word(*words):
+            return self.next()[1].upper()
+        return None
+
+    def accept_operator(self, *operators):
+        if self.is_operator(*operators):
+            return self.next()[1]
+        return None
+
+    def expect_word(self, *words):
+        word = self.accept_word(*words)
+        if word is None:
+            self.error(f'Expected {" or ".join(words)}')
+        return word
+
+    def expect_operator(self, operator):
+        if self.accept_operator(operator) is None:
+            self.error(f'Expected "{operator}"')
+
+    def error(self, message):
+        _, _, position = self.peek()
+        raise QueryError('Query failed.', f'{message} at: {self.sql[position:position + 30]!r}')
+
+    def name(self):
+        kind, value, _ = self.next()
+        if kind != 'name':
+            self.position -= 1
+            self.error('Expected a name')
+        return value
+
+    # statements
+
+    def statements(self):
+        statements = []
+        while self.peek()[0] != 'end':
+            if self.accept_operator(';'):
+                continue
+            statements.append(self.statement())
+            if self.peek()[0] != 'end' and not self.is_operator(';'):
+                self.error('Expected the end of the statement')
+        return statements
+
+    def statement(self):
+        kind, value, _ = self.peek()
+        if kind == 'operator' and value == '(':
+            return ('return', self.expression())
+        if kind != 'name':
+            self.error('Expected a statement')
+        word = value.upper()
+        method = getattr(self, f'statement_{word.lower()}', None)
+        if method is None:
+            self.error(f'Unsupported statement {word}')
+        self.next()
+        return method()
+
+    def statement_select(self):
+        fields = []
+        if self.accept_word('VALUE'):
+            fields = ('value', self.expression())
+        else:
+            while True:
+                if self.accept_operator('*'):
+                    fields.append(('*', None, None))
+                else:
+                    start = self.peek()[2]
+                    expression = self.expression()
+                    text = self.sql[start:self.peek()[2]].strip()
+                    alias = None
+                    if self.accept_word('AS'):
+                        alias = self.field_path()
+                    fields.append((expression, alias, text))
+                if not self.accept_operator(','):
+                    break
+        self.expect_word('FROM')
+        self.accept_word('ONLY')
+        targets = self.targets()
+        where = group = order = limit = start = None
+        fetch = []
+        explain = None
+        while True:
+            if self.accept_word('WHERE'):
+                where = self.expression()
+            elif self.accept_word('SPLIT'):
+                self.accept_word('ON')
+                self.field_path()
+            elif self.accept_word('GROUP'):
+                self.accept_word('BY')
+                if self.accept_word('ALL'):
+                    group = []
+                else:
+                    group = [self.field_path()]
+                    while self.accept_operator(','):
+                        group.append(self.field_path())
+            elif self.accept_word('ORDER'):
+                self.accept_word('BY')
+                order = []
+                while True:
+                    if self.is_word('RAND') and self.is_operator('(', offset=1):
+                        self.next(), self.next(), self.expect_operator(')')
+                        order.append((('call', 'rand', []), 'RAND'))
+                    else:
+                        expression = ('field', self.field_path())
+                        self.accept_word('COLLATE', 'NUMERIC')
+                        direction = self.accept_word('ASC', 'DESC') or 'ASC'
+                        order.append((expression, direction))
+                    if not self.accept_operator(','):
+                        break
+            elif self.accept_word('LIMIT'):
+                self.accept_word('BY')
+                limit = self.expression()
+            elif self.accept_word('START'):
+                self.accept_word('AT')
+                start = self.expression()
+            elif self.accept_word('FETCH'):
+                fetch.append(self.field_path())
+                while self.accept_operator(','):
+                    fetch.append(self.field_path())
+            elif self.accept_word('TIMEOUT'):
+                self.next()
+            elif self.accept_word('PARALLEL'):
+                pass
+            elif self.accept_word('EXPLAIN'):
+                explain = 'FULL' if self.accept_word('FULL') else 'PLAN'
+            else:
+                break
+        return ('select', fields, targets, where, group, order, limit, start, fetch, explain)
+
+    def targets(self):
+        targets = [self.target()]
+        while self.accept_operator(','):
+            targets.append(self.target())
+        return targets
+
+    def target(self):
+        """A table name, record id, or any other expression to read from."""
+        kind, value, _ = self.peek()
+        if kind == 'name' and not self.is_operator('(', offset=1):
+            self.next()
+            return ('table', value)
+        return self.expression()
+
+    def data(self):
+        """Parse a CONTENT, MERGE or SET clause, if there is one."""
+        if self.accept_word('CONTENT'):
+            return ('content', self.expression())
+        if self.accept_word('MERGE'):
+            return ('merge', self.expression())
+        if self.accept_word('SET'):
+            assignments = []
+            while True:
+                path = self.field_path()
+                operator = self.accept_operator('=', '+=', '-=')
+                if operator is None:
+                    self.error('Expected "=", "+=" or "-="')
+                assignments.append((path, operator, self.expression()))
+                if not self.accept_operator(','):
+                    break
+            return ('set', assignments)
+        return None
+
+    def skip_return(self):
+        if self.accept_word('RETURN'):
+            self.return_clause = self.accept_word('NONE', 'BEFORE', 'AFTER', 'DIFF')
+            if self.return_clause is None:
+                self.expression()
+                while self.accept_operator(','):
+                    self.expression()
+        for word in ('TIMEOUT',):
+            if self.accept_word(word):
+                self.next()
+        self.accept_word('PARALLEL')
+
+    def statement_create(self):
+        self.accept_word('ONLY')
+        targets = self.targets()
+        data = self.data()
+        self.skip_return()
+        return ('create', targets, data)
+
+    def statement_update(self):
+        self.accept_word('ONLY')
+        targets = self.targets()
+        data = self.data()
+        where = self.expression() if self.accept_word('WHERE') else None
+        self.skip_return()
+        return ('update', targets, data, where)
+
+    def statement_upsert(self):
+        return self.statement_update()
+
+    def statement_delete(self):
+        self.accept_word('FROM')
+        self.accept_word('ONLY')
+        targets = self.targets()
+        where = self.expression() if self.accept_word('WHERE') else None
+        self.skip_return()
+        return ('delete', targets, where)
+
+    def statement_insert(self):
+        self.accept_word('IGNORE')
+        self.expect_word('INTO')
+        table = self.name()
+        if self.is_operator('(') and self.peek(1)[0] == 'name' and self.is_operator(',', ')', offset=2):
+            self.next()
+            columns = [self.field_path()]
+            while self.accept_operator(','):
+                columns.append(self.field_path())
+            self.expect_operator(')')
+            self.expect_word('VALUES')
+            rows = []
+            while True:
+                self.expect_operator('(')
+                values = [self.expression()]
+                while self.accept_operator(','):
+                    values.append(self.expression())
+                self.expect_operator(')')
+                rows.append(('object', list(zip(['.'.join(c) for c in columns], values))))
+                if not self.accept_operator(','):
+                    break
+            data = ('array', rows)
+        else:
+            data = self.expression()
+        if self.accept_word('ON'):
+            self.expect_word('DUPLICATE')
+            self.expect_word('KEY')
+            self.expect_word('UPDATE')
+            self.error('ON DUPLICATE KEY UPDATE is not supported')
+        self.skip_return()
+        return ('insert', table, data)
+
+    def statement_relate(self):
+        self.accept_word('ONLY')
+        source = self.relate_part()
+        self.expect_operator('->')
+        edge = self.name()
+        self.expect_operator('->')
+        target = self.relate_part()
+        data = self.data()
+        self.skip_return()
+        return ('relate', source, edge, target, data)
+
+    def relate_part(self):
+        kind, value, _ = self.peek()
+        if kind == 'thing':
+            self.next()
+            return ('thing', value)
+        return self.primary()
+
+    def statement_remove(self):
+        kind = self.expect_word('TABLE', 'INDEX', 'FIELD', 'EVENT')
+        name = self.name()
+        table = None
+        if self.accept_word('ON'):
+            self.accept_word('TABLE')
+            table = self.name()
+        return ('remove', kind, name, table)
+
+    def statement_define(self):
+        if self.accept_word('INDEX'):
+            name = self.name()
+            self.expect_word('ON')
+            self.accept_word('TABLE')
+            table = self.name()
+            self.expect_word('FIELDS', 'COLUMNS')
+            fields = [self.field_path()]
+            while self.accept_operator(','):
+                fields.append(self.field_path())
+            unique = bool(self.accept_word('UNIQUE'))
+            self.skip_to_end()
+            return ('define_index', name, table, ['.'.join(f) for f in fields], unique)
+        if self.accept_word('TABLE'):
+            name = self.name()
+            self.skip_to_end()
+            return ('define_table', name)
+        # other definitions (fields, events, scopes...) don't change how records are stored here
+        self.skip_to_end()
+        return ('noop',)
+
+    def skip_to_end(self):
+        while self.peek()[0] != 'end' and not self.is_operator(';'):
+            self.next()
+
+    def statement_info(self):
+        self.expect_word('FOR')
+        kind = self.expect_word('KV', 'ROOT', 'NS', 'NAMESPACE', 'DB', 'DATABASE', 'TABLE', 'TB', 'SCOPE', 'SC')
+        name = self.name() if kind in ('TABLE', 'TB', 'SCOPE', 'SC') else None
+        return ('info', kind, name)
+
+    def statement_begin(self):
+        self.accept_word('TRANSACTION')
+        return ('begin',)
+
+    def statement_commit(self):
+        self.accept_word('TRANSACTION')
+        return ('commit',)
+
+    def statement_cancel(self):
+        self.accept_word('TRANSACTION')
+        return ('cancel',)
+
+    def statement_return(self):
+        return ('return', self.expression())
+
+    def statement_let(self):
+        kind, name, _ = self.next()
+        if kind != 'param':
+            self.position -= 1
+            self.error('Expected a $parameter')
+        self.expect_operator('=')
+        return ('let', name, self.expression())
+
+    def statement_use(self):
+        namespace = database = None
+        while True:
+            if self.accept_word('NS', 'NAMESPACE'):
+                namespace = self.name()
+            elif self.accept_word('DB', 'DATABASE'):
+                database = self.name()
+            else:
+                break
+        return ('use', namespace, database)
+
+    def statement_sleep(self):
+        self.next()
+        return ('noop',)
+
+    # expressions
+
+    def field_path(self):
+        path = [self.name()]
+        while self.accept_operator('.'):
+            path.append(self.name())
+        return path
+
+    def expression(self):
+        return self.or_expression()
+
+    def or_expression(self):
+        left = self.and_expression()
+        while self.accept_word('OR') or self.accept_operator('||'):
+            left = ('binary', 'OR', left, self.and_expression())
+        return left
+
+    def and_expression(self):
+        left = self.not_expression()
+        while self.accept_word('AND') or self.accept_operator('&&'):
+            left = ('binary', 'AND', left, self.not_expression())
+        return left
+
+    def not_expression(self):
+        if self.accept_word('NOT') or self.accept_operator('!'):
+            return ('not', self.not_expression())
+        return self.comparison()
+
+    def comparison(self):
+        left = self.additive()
+        while True:
+            kind, value, _ = self.peek()
+            operator = None
+            if kind == 'operator' and value in _comparisons:
+                self.next()
+                operator = _comparisons[value]
+            elif kind == 'name' and value.upper() in _comparisons:
+                self.next()
+                operator = _comparisons[value.upper()]
+                if value.upper() == 'IS' and self.accept_word('NOT'):
+                    operator = '!='
+            elif kind == 'name' and value.upper() == 'NOT' and self.is_word('IN', offset=1):
+                self.next(), self.next()
+                operator = 'NOTINSIDE'
+            if operator is None:
+                return left
+            left = ('binary', operator, left, self.additive())
+
+    def additive(self):
+        left = self.multiplicative()
+        while True:
+            operator = self.accept_operator('+', '-', '??')
+            if operator is None:
+                return left
+            left = ('binary', operator, left, self.multiplicative())
+
+    def multiplicative(self):
+        left = self.unary()
+        while True:
+            operator = self.accept_operator('*', '/')
+            if operator is None:
+                return left
+            left = ('binary', operator, left, self.unary())
+
+    def unary(self):
+        if self.accept_operator('-'):
+            return ('negate', self.unary())
+        return self.postfix(self.primary())
+
+    def postfix(self, item):
+        while True:
+            if self.accept_operator('.'):
+                if self.accept_operator('*'):
+                    continue
+                key = self.name()
+                item = ('field', item[1] + [key]) if item[0] == 'field' else ('index', item, ('literal', key))
+            elif self.is_operator('['):
+                self.next()
+                if self.accept_operator('*'):
+                    self.expect_operator(']')
+                    continue
+                index = self.expression()
+                self.expect_operator(']')
+                item = ('index', item, index)
+            else:
+                return item
+
+    def primary(self):
+        kind, value, _ = self.next()
+        if kind in ('string', 'number'):
+            return ('literal', value)
+        if kind == 'thing':
+            return ('thing', value)
+        if kind == 'param':
+            return ('param', value)
+        if kind == 'operator':
+            if value == '(':
+                if self.is_word('SELECT', 'CREATE', 'UPDATE', 'DELETE', 'INSERT', 'RELATE'):
+                    statement = self.statement()
+                    self.expect_operator(')')
+                    return ('subquery', statement)
+                item = self.expression()
+                self.expect_operator(')')
+                return item
+            if value == '[':
+                items = []
+                while not self.accept_operator(']'):
+                    items.append(self.expression())
+                    if not self.accept_operator(','):
+                        self.expect_operator(']')
+                        break
+                return ('array', items)
+            if value == '{':
+                return self.object()
+            if value == '<':
+                # a cast, like <datetime> '2024-01-01T00:00:00Z'
+                type_name = self.name().lower()
+                self.expect_operator('>')
+                return ('cast', type_name, self.unary())
+        if kind == 'name':
+            word = value.upper()
+            if self.is_operator('('):
+                self.next()
+                args = []
+                while not self.accept_operator(')'):
+                    if self.accept_operator('*'):
+                        continue
+                    args.append(self.expression())
+                    if not self.accept_operator(','):
+                        self.expect_operator(')')
+                        break
+                return ('call', value.lower(), args)
+            if word in ('NONE', 'NULL'):
+                return ('literal', None)
+            if word == 'TRUE':
+                return ('literal', True)
+            if word == 'FALSE':
+                return ('literal', False)
+            return ('field', [value])
+        self.position -= 1
+        self.error('Unexpected token')
+
+    def object(self):
+        items = []
+        while not self.accept_operator('}'):
+            kind, value, _ = self.next()
+            if kind == 'thing':
+                # {key:value} without spaces looks like a record id
+                key, _, raw = value.partition(':')
+                items.append((key, ('literal', int(raw) if raw.isdigit() else raw)))
+            else:
+                if kind not in ('string', 'name', 'number'):
+                    self.position -= 1
+                    self.error('Expected an object key')
+                key = str(value)
+                self.expect_operator(':')
+                items.append((key, self.expression()))
+            if not self.accept_operator(','):
+                self.expect_operator('}')
+                break
+        return ('object', items)
+
+
+def parse(sql):
+    """Parse a query into a list of statements."""
+    return Parser(sql).statements()
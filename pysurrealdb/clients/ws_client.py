@@ -1,11 +1,25 @@
 import json
+import re
 import websocket
 import time
 import random
+from collections import deque
 
 from ..config import config
-from ..err import QueryError, SurrealDBError
-from ..utils import verify_table_and_id
+from ..err import QueryError, QueryTimeoutError, SurrealDBError
+from ..utils import verify_table_and_id, check_raw_result
+
+def _notification(r):
+    """Return the notification in a message, or None if it is not a live query notification."""
+    # newer servers send {"result": {"action": ..., "result": ...}}, older ones {"method": "notify", "params": [...]}
+    if isinstance(r.get('result'), dict) and 'action' in r['result']:
+        return r['result']
+    if r.get('method') == 'notify' and r.get('params'):
+        return r['params'][0]
+    return None
+
+# The start of a JSON reply to a request. The server writes the id first and the result last, so the result runs from here to the closing brace.
+_reply_head = re.compile(rb'\s*\{\s*"id"\s*:\s*"((?:[^"\\]|\\.)*)"\s*,\s*"result"\s*:')
 
 class WSClient:
     """
@@ -14,6 +28,7 @@ class WSClient:
     You should not need to use this class directly. Instead, use the Connection class via the connect() method.
     """
     sock = None
+    client_type = 'ws'
 
     def __init__(self, host=None, port=None, user=None, password=None, database=None, namespace=None, **kwargs):
         self.host = host
@@ -23,6 +38,23 @@ class WSClient:
         self._database = database
         self._namespace = namespace
         self._write_timeout = kwargs.get('write_timeout', 5)
+        # default time in seconds to wait for a reply. None waits forever.
+        self._timeout = kwargs.get('timeout', self._write_timeout)
+        # 'json' sends text frames. 'cbor' sends binary frames, with datetimes, UUIDs, decimals and record ids as native types.
+        self._format = kwargs.get('format', 'json')
+        if self._format not in ('json', 'cbor'):
+            raise ValueError(f'Unknown format "{self._format}". Use "json" or "cbor".')
+        if self._format == 'cbor':
+            from . import cbor
+            cbor._check()
+            self._cbor = cbor
+        # offer permessage-deflate. Messages of at least compression_min_size bytes are compressed if the server agrees.
+        self._compress = kwargs.get('compress', False)
+        self._compression_level = kwargs.get('compression_level', 6)
+        self._compression_min_size = kwargs.get('compression_min_size', 1024)
+        self._deflate = None
+        # live query notifications received while waiting for a reply, returned by notification()
+        self._notifications = deque()
 
         if not self.host:
             self.host = 'ws://localhost'
@@ -37,6 +69,27 @@ class WSClient:
             self._namespace = 'main'
             if config.warnings: print('SurrealDB: No namespace specified. Using "main"')
         
+    def settings(self):
+        """Return the settings needed to build another client for the same server."""
+        return {
+            'host': self.host,
+            'port': self.port,
+            'user': self._user,
+            'password': self._password,
+            'database': self._database,
+            'namespace': self._namespace,
+            'write_timeout': self._write_timeout,
+            'timeout': self._timeout,
+            'format': self._format,
+            'compress': self._compress,
+            'compression_level': self._compression_level,
+            'compression_min_size': self._compression_min_size,
+        }
+
+    def copy(self):
+        """Return a new client with the same settings. The copy opens its own socket."""
+        return self.__class__(**self.settings())
+
     def __enter__(self):
         self.connect()
         return self
@@ -47,7 +100,16 @@ class WSClient:
     def connect(self):
         #Include headers and auth
         url = self._get_url()
-        self.sock = websocket.create_connection(url)
+        options = {}
+        if self._format == 'cbor':
+            options['subprotocols'] = ['cbor']
+        if self._compress:
+            from .deflate import OFFER
+            options['header'] = [OFFER]
+        self.sock = websocket.create_connection(url, **options)
+        self._deflate = None
+        if self._compress:
+            self._start_deflate()
 
         if self._namespace and self._database:
             self.use(self._namespace, self._database)
@@ -58,8 +120,27 @@ class WSClient:
             if config.warnings: print('SurrealDB: No user or password specified. Use .login(user, pass) to login.')
         print('SurrealDB Connected')
 
+    def _start_deflate(self):
+        from .deflate import Deflate, DeflateFrameBuffer, parse_agreement
+        params = parse_agreement(self.sock.getheaders())
+        if params is None:
+            if config.warnings: print('SurrealDB: The server did not accept compression. Messages are sent uncompressed.')
+            return
+        self._deflate = Deflate(params, self._compression_level, self._compression_min_size)
+        self.sock.frame_buffer = DeflateFrameBuffer(self.sock._recv, self._deflate)
+
+    def stats(self):
+        """
+        Return compression stats for the current socket: messages and bytes sent and received, before (bytes) and after (wire_bytes) compression, and bytes_saved.
+        compressed is False if compression is off or the server did not accept it.
+        """
+        if self._deflate is None:
+            return {'compressed': False}
+        return {'compressed': True, **self._deflate.stats()}
+
     def close(self):
-        self.sock.close()
+        if self.sock:
+            self.sock.close()
 
     def _get_url(self):
         # convert to ws or wss
@@ -76,12 +157,13 @@ class WSClient:
         return f'{self.host}:{self.port}/rpc'
 
 
-    def _send_receive(self, method, *params):
-        self._send(method, *params)
-        r = self._recv()
+    def _send_receive(self, method, *params, timeout=None):
+        request_id = self._send(method, *params)
+        r = self._recv(request_id, timeout)
         return r
 
     def _send(self, method, *params):
+        """Send a request and return its id."""
         if not self.sock:
             self.connect()
         self.sock.settimeout(self._write_timeout)
@@ -91,19 +173,65 @@ class WSClient:
             'params': params,
         }
         # print('sending', data)
-        self.sock.send(json.dumps(data, ensure_ascii=False, default=str))
+        if self._format == 'cbor':
+            message, opcode = self._cbor.encode(data), websocket.ABNF.OPCODE_BINARY
+        else:
+            message, opcode = json.dumps(data, ensure_ascii=False, default=str), websocket.ABNF.OPCODE_TEXT
+        if self._deflate is not None:
+            self.sock.send_frame(self._deflate.frame(message, opcode))
+        else:
+            self.sock.send(message, opcode)
+        return data['id']
+
+    def _decode(self, message):
+        if self._format == 'cbor':
+            return self._cbor.decode(message)
+        return json.loads(message)
 
     def _generate_id(self):
         # generate a unique id string
         return f'{time.time()}-{random.randint(0, 1000000)}'
 
-    def _recv(self):
-        # receive any data from the socket
-        r = self.sock.recv()
-        r = json.loads(r)
-        if 'error' in r:
-            raise Exception(r['error'])
-        return r['result']
+    def _recv(self, request_id=None, timeout=None, raw=False):
+        """
+        Receive the reply to a request. If timeout is not given, the client's default timeout is used.
+        With raw, the result is returned as JSON bytes. For JSON replies these are cut out of the message without decoding it.
+
+        Replies to other requests are skipped. These are left over from requests that timed out, so skipping them keeps the socket usable after a timeout.
+        Live query notifications are kept for notification().
+        """
+        timeout = timeout if timeout is not None else self._timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise QueryTimeoutError('SurrealDB did not reply in time.', request_id)
+                self.sock.settimeout(remaining)
+            else:
+                self.sock.settimeout(None)
+            try:
+                r = self.sock.recv_data()[1] if raw else self.sock.recv()
+            except websocket.WebSocketTimeoutException as e:
+                raise QueryTimeoutError('SurrealDB did not reply in time.', request_id) from e
+            if raw and self._format == 'json':
+                head = _reply_head.match(r)
+                end = r.rfind(b'}')
+                if head and end > head.end():
+                    if request_id is not None and head.group(1).decode() != request_id:
+                        continue
+                    return r[head.end():end].strip()
+            r = self._decode(r)
+            if request_id is not None and r.get('id') != request_id:
+                notification = _notification(r)
+                if notification is not None:
+                    self._notifications.append(notification)
+                continue
+            if 'error' in r:
+                raise Exception(r['error'])
+            if raw:
+                return json.dumps(r['result'], ensure_ascii=False, default=str).encode('utf-8')
+            return r['result']
 
 
     def _split_table(self, table, id=None):
@@ -113,10 +241,10 @@ class WSClient:
         
 
     def use(self, namespace, database):
-        self._send('use', namespace, database)
+        request_id = self._send('use', namespace, database)
         self._namespace = namespace
         self._database = database
-        return self._recv()
+        return self._recv(request_id)
 
     def login(self, user, password):
         return self._send_receive('signin', {'user': user, 'pass': password})
@@ -124,9 +252,32 @@ class WSClient:
     def ping(self):
         return self._send_receive('ping')
 
-    def query(self, query):
+    def live(self, table):
+        """Start a live query on a table and return its id. Use a client that does nothing else, since notifications arrive on the same socket as replies."""
+        return self._send_receive('live', table)
+
+    def kill(self, query_id):
+        """End a live query."""
+        return self._send_receive('kill', query_id)
+
+    def notification(self, timeout=None):
+        """
+        Wait for a live query notification and return it as a dict with 'action' and 'result' keys. Return None if none arrives before the timeout.
+        """
+        if self._notifications:
+            return self._notifications.popleft()
+        if not self.sock:
+            self.connect()
+        self.sock.settimeout(timeout)
+        try:
+            r = self._decode(self.sock.recv())
+        except websocket.WebSocketTimeoutException:
+            return None
+        return _notification(r)
+
+    def query(self, query, timeout=None):
         """Run a query on the current database"""
-        r = self._send_receive('query', query)
+        r = self._send_receive('query', query, timeout=timeout)
         if len(r) > 1:
             results = []
             for row in r:
@@ -139,6 +290,14 @@ class WSClient:
             raise QueryError("Query failed.", r[0])
         return r[0]['result']
 
+    def query_raw(self, query, timeout=None):
+        """
+        Run a query and return the result as undecoded JSON bytes: a list with the status, time and result of each statement.
+        The reply is checked for failed statements without being decoded, so it can be passed on as is. With the cbor format, the reply has to be decoded and encoded as JSON instead.
+        """
+        request_id = self._send('query', query)
+        return check_raw_result(self._recv(request_id, timeout, raw=True))
+
     def create(self, table, data=None):
         """Create one or many records in a SurrealDB table."""
         if isinstance(data, list):
@@ -169,6 +328,12 @@ class WSClient:
         """Create a new record in the specified table"""
         return self.create(table, data)
 
+    def insert_batch(self, table, data):
+        """Insert many records with a single INSERT statement. Data may be a list of dicts or an already encoded JSON array."""
+        if not isinstance(data, str):
+            data = json.dumps(data, default=str, ensure_ascii=False)
+        return self.query(f'INSERT INTO {table} {data}')
+
     def update(self, table, data=None):
         """Update a record in the specified table"""
         if not data:
@@ -179,12 +344,12 @@ class WSClient:
             raise Exception('Cannot update a record without an id')
         return self._send_receive('update', f'{table}:{id}', data)
 
-    def get(self, table, id=None):
+    def get(self, table, id=None, timeout=None):
         """Get a record from the specified table"""
         table, id = verify_table_and_id(table, id)
         if not id:
-            return self._send_receive('select', table)
-        result = self._send_receive('select', table + ':' + id)
+            return self._send_receive('select', table, timeout=timeout)
+        result = self._send_receive('select', table + ':' + id, timeout=timeout)
         if not result:
             return None
         return result[0]
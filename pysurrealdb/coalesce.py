@@ -0,0 +1,67 @@
+import re
+import threading
+
+from .err import QueryTimeoutError
+
+# Statements that change data or session state. A query containing any of these words is never coalesced, even if the word is inside a string.
+_write_keywords = re.compile(r'\b(CREATE|UPDATE|UPSERT|DELETE|INSERT|RELATE|DEFINE|REMOVE|LET|USE|BEGIN|COMMIT|CANCEL|KILL|LIVE|SLEEP|THROW)\b', re.IGNORECASE)
+_read_statement = re.compile(r'^\s*(SELECT|INFO)\b', re.IGNORECASE)
+
+
+def is_read_query(sql):
+    """
+    Return True if the query only reads data. When in doubt, the query is treated as a write.
+    """
+    if not isinstance(sql, str):
+        return False
+    return bool(_read_statement.match(sql)) and not _write_keywords.search(sql)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Shares one call between threads that make the same call at the same time.
+
+    The first thread to ask for a key runs the call. Threads that ask for the same key while it is running wait for it, and get the same result or exception.
+    The result object is shared between all of the waiting threads, so it should not be modified in place.
+    A waiting thread gives up with QueryTimeoutError after wait_timeout seconds.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, wait_timeout=None, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            if not call.event.wait(wait_timeout):
+                raise QueryTimeoutError('Timed out waiting for a shared read.', key)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
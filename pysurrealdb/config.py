@@ -35,4 +35,25 @@ def get_config_from_file() -> dict:
 
     return config
 
-config = Config(**get_config_from_file())
\ No newline at end of file
+class LazyConfig:
+    """
+    Stands in for the Config object. The config file is read the first time a setting is used, rather than when pysurrealdb is imported.
+    """
+    def __init__(self):
+        object.__setattr__(self, '_config', None)
+
+    def load(self) -> Config:
+        if self._config is None:
+            object.__setattr__(self, '_config', Config(**get_config_from_file()))
+        return self._config
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
+
+    def __repr__(self):
+        return repr(self.load())
+
+config = LazyConfig()
\ No newline at end of file
@@ -1,10 +1,37 @@
-from .clients.http_client import HttpClient
-from .clients.ws_client import WSClient
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from functools import partial
+from typing import TYPE_CHECKING
+
+from .coalesce import SingleFlight, is_read_query
 from .cursor import Cursor
 from .query_builder import QueryBuilder
 from .config import config
+from .err import QueryError
+from .transaction import Transaction
 from .utils import verify_table_and_id
 
+if TYPE_CHECKING:
+    from .clients.http_client import HttpClient
+
+
+def get_client_class(client_type):
+    """
+    Return the client class for a client type.
+    Client modules are imported here rather than at the top of the file, so their dependencies (requests, websocket) are only loaded when a client of that type is built.
+    """
+    if client_type.lower() in ['http', 'https']:
+        from .clients.http_client import HttpClient
+        return HttpClient
+    if client_type.lower() == 'memory':
+        from .clients.memory_client import MemoryClient
+        return MemoryClient
+    from .clients.ws_client import WSClient
+    return WSClient
+
+
 class Connection:
     """
     This is the main object that users will interact with. 
@@ -13,8 +40,20 @@ class Connection:
     Includes methods to emulate a pymysql connection object. This allows the use of libraries like pandas. 
     """
     connections = {}
-    client: HttpClient = None
-    _cursor = None
+    _registry_lock = threading.RLock()
+    _instances = weakref.WeakSet()
+    _client: 'HttpClient' = None
+    _pid = None
+    _local = None
+    _thread_clients = None
+    _hedge_settings = None
+    _mirrors = None
+    _builder_hooks = None
+    _index_advisor = None
+    _plan_watcher = None
+    _single_flight = None
+    _hedged_reader = None
+    _transaction = None
     def __init__(self, **kwargs):
         """
             Attempt to build a connection. If a client is passed, use that. 
@@ -27,39 +66,334 @@ class Connection:
                 password: The password to login with. 
                 database: The database to use. 
                 namespace: The namespace to use.
+                timeout: The default time in seconds to wait for the server to reply. Can be overridden per call.
+                coalesce: If True, identical reads made at the same time from different threads share one request. Writes are never coalesced.
+                hedge: True, or a dict of arguments for enable_hedging().
+                thread_local: If True, each thread gets its own copy of the client, so threads never share a session or socket.
         """
         client = kwargs.pop('client', None)
-        
-        # Set client type based on config.
-        Client = HttpClient if config.default_client.lower() in ['http', 'https'] else WSClient
-        # If they specify a client type explicitly, use that instead.
-        if isinstance(client, str):
-            Client = HttpClient if client.lower() in ['http', 'https'] else WSClient
+        hedge = kwargs.pop('hedge', None)
+        if kwargs.pop('coalesce', False):
+            self._single_flight = SingleFlight()
+        if kwargs.pop('thread_local', False):
+            self._local = threading.local()
+            self._thread_clients = weakref.WeakSet()
+        self._pid = os.getpid()
+        Connection._instances.add(self)
 
         # If they pass a client object, use that. Otherwise, create a new client.
-        if isinstance(client, HttpClient) or isinstance(client, WSClient):
+        if getattr(client, 'client_type', None):
             self.client = client
-        elif kwargs:
-            self.client = Client(**kwargs)
         else:
-            self.client = Client()
+            # Set client type based on config. If they specify a client type explicitly, use that instead.
+            Client = get_client_class(client if isinstance(client, str) else config.default_client)
+            self.client = Client(**kwargs)
 
+        if hedge:
+            self.enable_hedging(**(hedge if isinstance(hedge, dict) else {}))
+
+    @property
+    def client(self) -> 'HttpClient':
+        """
+        The client used by this connection. With thread_local=True, this is the calling thread's own copy.
+        If the process has forked since the client was built, it is rebuilt first, so a child process never uses its parent's sockets.
+        """
+        if self._pid != os.getpid():
+            self._after_fork()
+        if self._local is None:
+            return self._client
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._client.copy()
+            self._thread_clients.add(client)
+        return client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def _after_fork(self):
+        """
+        Replace the clients inherited from the parent process with new ones.
+        The old clients are dropped without being closed, since closing them would also close the parent's connections.
+        """
+        self._pid = os.getpid()
+        if hasattr(self._client, 'copy'):
+            self._client = self._client.copy()
+        if self._local is not None:
+            self._local = threading.local()
+            self._thread_clients = weakref.WeakSet()
+        if self._single_flight is not None:
+            self._single_flight = SingleFlight()
+        # the hedging threads don't exist in the child, so build a new reader with the same settings.
+        self._hedged_reader = None
+        if self._hedge_settings is not None:
+            self.enable_hedging(**self._hedge_settings)
+        self._transaction = None
+
+    def use(self, namespace, database):
+        """
+        Select a namespace and database.
+        Clients copied from this connection's client, the per-thread clients and the hedging pool, are rebuilt from it, so every read goes to the new database.
+        """
+        result = self._client.use(namespace, database)
+        if self._local is not None:
+            # the old per-thread clients stay in _thread_clients, so close() still closes them
+            self._local = threading.local()
+        if self._hedged_reader is not None:
+            self._hedged_reader.close()
+            self.enable_hedging(**self._hedge_settings)
+        return result
+
+    def ping(self):
+        """Check that the server is reachable and open the client's connection to it, if it isn't open yet."""
+        return self.client.ping()
+
+    def close(self):
+        """Close the client, and every per-thread client if thread_local is set."""
+        for client in list(self._thread_clients or []):
+            client.close()
+        if self._hedged_reader is not None:
+            self._hedged_reader.close()
+        self._client.close()
 
     def cursor(self) -> Cursor:
-        if not self._cursor:
-            self._cursor = Cursor(self.client)
-        return self._cursor
+        return Cursor(self)
+
+    def begin(self):
+        """
+        Start a transaction. Writes made through this connection and its query builders are held until commit() sends them all in one request, or rollback() discards them.
+        Reads are still sent straight away. A transaction belongs to the connection, so don't share the connection between threads while one is open.
+        """
+        if self._transaction is not None:
+            raise QueryError("A transaction is already in progress.")
+        self._transaction = Transaction(self.client)
 
     def commit(self):
-        pass
+        """Send the writes held since begin() as one transaction, and return their results. Does nothing if no transaction is in progress."""
+        if self._transaction is None:
+            return None
+        transaction, self._transaction = self._transaction, None
+        return transaction.commit()
+
+    def rollback(self):
+        """Discard the writes held since begin()."""
+        self._transaction = None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a block of writes as one transaction. The writes are committed when the block ends, or discarded if it raises an exception.
+
+            with conn.transaction():
+                conn.create('account', {'id': 'a', 'balance': 90})
+                conn.table('account').where('id', 'account:b').update({'balance': 110})
+        """
+        self.begin()
+        try:
+            yield self._transaction
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
 
     # allow entry into query builder.
     def table(self, table) -> QueryBuilder:
-        return QueryBuilder(self.client).table(table)
+        if self._mirrors and table in self._mirrors:
+            return self._mirrors[table].query()
+        return QueryBuilder(self).table(table)
 
     def relate(self, noun1, verb, noun2, data=None):
         """Create a relationship between two records."""
-        return QueryBuilder(self.client).relate(noun1, verb, noun2, data)
+        return QueryBuilder(self).relate(noun1, verb, noun2, data)
+
+    def buffered_writer(self, table, max_rows=1000, max_bytes=1000000, flush_interval=1.0, max_buffer_bytes=None, on_error=None):
+        """
+        Return a BufferedWriter that inserts records into a table in batches from a background thread.
+
+        Args:
+            table: The table to insert into.
+            max_rows: The most rows to send in one batch.
+            max_bytes: The most encoded bytes to send in one batch.
+            flush_interval: The longest time in seconds a record waits in the buffer.
+            max_buffer_bytes: write() blocks once this many bytes are buffered or being sent. Defaults to 10 times max_bytes.
+            on_error: Called with the exception and the records of a batch that failed to insert.
+
+        The writer has its own client, so it doesn't share a session or socket with this connection.
+        Call flush() to wait for buffered records to be written, and close() when finished. Records still buffered at exit are flushed.
+        """
+        from .writer import BufferedWriter
+        return BufferedWriter(Connection(client=self.client.copy()), table, max_rows, max_bytes, flush_interval, max_buffer_bytes, on_error)
+
+    def rollup_writer(self, table, bucket='1m', group_by=(), aggregates=None, time_column='time', max_groups=10000, flush_interval=10.0, on_error=None):
+        """
+        Return a RollupWriter that aggregates samples per time bucket and group in memory, and writes one merged record per bucket and group.
+
+        Args:
+            table: The table to write the rollups to.
+            bucket: The bucket length, like '10s', '1m' or '1h', or a number of seconds.
+            group_by: A column or list of columns to aggregate separately, like ['host', 'metric'].
+            aggregates: A dict of column to the aggregates to keep for it: count, sum, min, max and mean. {'latency': ['mean', 'max']} stores latency_count, latency_sum, latency_mean and latency_max.
+            time_column: The column holding each sample's time, as a datetime, epoch seconds or an ISO 8601 string. Samples without one use the current time. The bucket start is stored in the same column.
+            max_groups: Flush as soon as this many buckets and groups are held.
+            flush_interval: The longest time in seconds a sample waits before it is written.
+            on_error: Called with the exception and the statements of a request that failed.
+
+        Every record also gets a count of its samples. The writer has its own client. Call close() when finished.
+            with conn.rollup_writer('metric_1m', group_by='host', aggregates={'cpu': ['mean', 'max']}) as rollup:
+                rollup.write({'time': time.time(), 'host': 'web1', 'cpu': 0.42})
+        """
+        from .rollup import RollupWriter
+        return RollupWriter(Connection(client=self.client.copy()), table, bucket, group_by, aggregates, time_column, max_groups, flush_interval, on_error=on_error)
+
+    def mirror(self, table, indexes=(), updated_column=None, refresh_interval=None, live=False):
+        """
+        Keep an in-memory copy of a small, often read table, and answer simple reads from it.
+
+        After this, conn.table(table) selects with only equality where clauses (and optionally order by, limit and plain columns) are answered from memory, as is conn.get(table, id). Other queries go to the server.
+
+        Args:
+            table: The table to mirror.
+            indexes: Columns to build hash indexes on. Lookups by id are always indexed.
+            updated_column: A column holding each row's last update time. If set, refreshes only read rows changed since the last refresh.
+            refresh_interval: Refresh the mirror in the background every this many seconds.
+            live: Keep the mirror up to date with a live query. Needs a WebSocket connection.
+
+        Writes made through this connection are not applied to the mirror until the next refresh, unless live is set. Call close() on the mirror to stop using it.
+        """
+        from .mirror import TableMirror
+        if self._mirrors is None:
+            self._mirrors = {}
+        if table in self._mirrors:
+            self._mirrors[table].close()
+        mirror = TableMirror(self, table, indexes, updated_column, refresh_interval, live)
+        self._mirrors[table] = mirror
+        return mirror
+
+    def define_index(self, table, columns, name=None, unique=False):
+        """
+        Define an index on one or more columns of a table.
+
+        Args:
+            table: The table to index.
+            columns: A column, or a list of columns. Nested columns use dot notation, like 'address.city'.
+            name: The name of the index. Defaults to the table and column names, like 'person_email_idx'.
+            unique: Reject records that have the same values as another record in these columns.
+        """
+        from .indexes import index_name
+        if isinstance(columns, str):
+            columns = [columns]
+        name = name or index_name(table, columns)
+        return self.query(f"DEFINE INDEX {name} ON TABLE {table} FIELDS {', '.join(columns)}{' UNIQUE' if unique else ''}")
+
+    def list_indexes(self, table):
+        """Return the indexes of a table, as a list of dicts with name, fields, unique and definition keys."""
+        from .indexes import parse_indexes
+        return parse_indexes(self.query(f'INFO FOR TABLE {table}'))
+
+    def drop_index(self, table, name):
+        """Remove an index from a table."""
+        return self.query(f'REMOVE INDEX {name} ON TABLE {table}')
+
+    def enable_index_advisor(self, sample_rate=1.0, min_latency=0.0):
+        """
+        Start recording the columns that query builder selects on this connection filter and sort on, with their latency, and return an IndexAdvisor.
+        Call suggestions() on it for the indexes that would save the most time.
+
+        Args:
+            sample_rate: The share of selects to record.
+            min_latency: Ignore selects faster than this many seconds.
+        """
+        from .indexes import IndexAdvisor
+        if self._index_advisor is not None:
+            self._builder_hooks = [hook for hook in self._builder_hooks if hook != self._index_advisor.record]
+        self._index_advisor = IndexAdvisor(self, sample_rate, min_latency)
+        self._builder_hooks = (self._builder_hooks or []) + [self._index_advisor.record]
+        return self._index_advisor
+
+    def disable_index_advisor(self):
+        """Stop recording selects for the index advisor."""
+        if self._index_advisor is not None:
+            self._builder_hooks = [hook for hook in self._builder_hooks if hook != self._index_advisor.record] or None
+            self._index_advisor = None
+
+    def enable_plan_warnings(self, sample_rate=0.01, min_rows=10000, callback=None, size_ttl=300.0, warn_interval=300.0):
+        """
+        Sample the selects that query builders run on this connection, fetch their plans with EXPLAIN, and warn when one scans a whole table of at least min_rows records. Returns the PlanWatcher.
+
+        Args:
+            sample_rate: The share of selects to check. Each check sends an EXPLAIN, and sometimes a count of the table.
+            min_rows: Only warn about full scans of tables with at least this many records.
+            callback: Called with the plan, the builder and the latency instead of printing a warning.
+            size_ttl: Seconds to keep a table's record count before counting again.
+            warn_interval: Seconds between warnings about the same table and columns.
+
+        The plans checked are kept in the watcher's plans attribute.
+        """
+        from .plans import PlanWatcher
+        if self._plan_watcher is not None:
+            self._builder_hooks = [hook for hook in self._builder_hooks if hook != self._plan_watcher.record]
+        self._plan_watcher = PlanWatcher(self, sample_rate, min_rows, size_ttl, warn_interval, callback)
+        self._builder_hooks = (self._builder_hooks or []) + [self._plan_watcher.record]
+        return self._plan_watcher
+
+    def disable_plan_warnings(self):
+        """Stop checking the plans of selects."""
+        if self._plan_watcher is not None:
+            self._builder_hooks = [hook for hook in self._builder_hooks if hook != self._plan_watcher.record] or None
+            self._plan_watcher = None
+
+    def fan_out(self, query, targets, concurrency=8, timeout=None):
+        """
+        Run the same query on many namespaces and databases in parallel, and yield a FanOutResult for each as it completes.
+
+        Args:
+            query: SurrealQL, or a QueryBuilder.
+            targets: (namespace, database) pairs, or dicts with namespace and database keys.
+            concurrency: The most queries in flight at once. Each one runs on its own copy of this connection's client.
+            timeout: The timeout for each query.
+
+        A failed query doesn't stop the others. Its FanOutResult has the exception in error instead of a result.
+            for tenant in conn.fan_out('SELECT count() FROM order GROUP ALL', [('acme', 'app'), ('globex', 'app')]):
+                print(tenant.namespace, tenant.result if tenant.ok else tenant.error)
+        """
+        from .fanout import fan_out
+        return fan_out(self, query, targets, concurrency, timeout)
+
+    def enable_hedging(self, endpoints=None, pool_size=2, delay=None, percentile=0.95):
+        """
+        Send a duplicate of a read to another client when the first one is slow, and use whichever reply comes back first.
+
+        Args:
+            endpoints: A list of connection settings for other servers (replicas) to read from, like {'host': 'replica1'}. Missing settings are copied from this connection.
+            pool_size: The number of clients to this connection's server to include.
+            delay: How long to wait before sending the duplicate. Defaults to the latency percentile of recent reads.
+            percentile: The latency percentile to use when delay is not set.
+        """
+        from .hedging import HedgedReader
+        self._hedge_settings = {'endpoints': endpoints, 'pool_size': pool_size, 'delay': delay, 'percentile': percentile}
+        clients = [self.client.copy() for _ in range(pool_size)]
+        for endpoint in endpoints or []:
+            settings = {**self.client.settings(), **endpoint}
+            clients.append(get_client_class(settings.pop('client', self.client.client_type))(**settings))
+        self._hedged_reader = HedgedReader(clients, delay=delay, percentile=percentile)
+        return self._hedged_reader
+
+    def _read(self, method, *args, timeout=None):
+        """
+        Run a read on the client.
+        If hedging is enabled, the read is sent to a second client when the first is slow. If coalescing is enabled, identical reads that are already running are joined instead of sent again.
+        Reads are keyed by method, namespace, database and arguments.
+        """
+        if self._hedged_reader is not None:
+            run = partial(self._hedged_reader.read, method)
+        else:
+            run = getattr(self.client, method)
+        if self._single_flight is None:
+            return run(*args, timeout=timeout)
+        settings = self.client.settings()
+        key = (method, settings['namespace'], settings['database'], args)
+        return self._single_flight.do(key, run, *args, timeout=timeout, wait_timeout=timeout)
 
     def upsert(self, table, data=None, keys=['id']):
         """Update or create a record in the specified table"""
@@ -98,39 +432,98 @@ class Connection:
             return self.create(table, data)
 
     # These methods are just wrappers around the client methods. They are here for autocomplete. If anyone knows a better way to do this, please let me know.
-    def select(self, sql):
-        return self.client.select(sql)
+    def select(self, sql, timeout=None):
+        return self.query(sql, timeout=timeout)
 
-    def query(self, sql):
-        return self.client.query(sql)
+    def query(self, sql, timeout=None):
+        if self._transaction is not None and not is_read_query(sql):
+            return self._transaction.add(sql)
+        if (self._single_flight is not None or self._hedged_reader is not None) and is_read_query(sql):
+            return self._read('query', sql, timeout=timeout)
+        return self.client.query(sql, timeout=timeout)
 
-    def get(self, table, id=None):
-        return self.client.get(table, id)
+    def query_raw(self, sql, timeout=None):
+        """Run a query and return the server's reply as undecoded JSON bytes, for passing on without decoding and encoding it again."""
+        return self.client.query_raw(sql, timeout=timeout)
+
+    def get(self, table, id=None, timeout=None):
+        if self._mirrors:
+            name = table.split(':')[0]
+            if name in self._mirrors:
+                return self._mirrors[name].get(table if id is None and ':' in table else id)
+        return self._read('get', table, id, timeout=timeout)
 
     def insert(self, table, data):
+        if self._transaction is not None:
+            return self._transaction.create(table, data)
         return self.client.insert(table, data)
 
     def create(self, table, data):
+        if self._transaction is not None:
+            return self._transaction.create(table, data)
         return self.client.create(table, data)
 
+    def insert_batch(self, table, data):
+        if self._transaction is not None:
+            return self._transaction.insert_batch(table, data)
+        return self.client.insert_batch(table, data)
+
+    def insert_dataframe(self, table, df, id_column=None, chunk_rows=10000):
+        """
+        Insert the rows of a pandas DataFrame, with one request per chunk_rows rows. Returns the number of rows inserted.
+
+        Columns are converted to JSON a column at a time, without building a dict per row. Datetimes are stored in UTC, categories as their values, and missing values (NaN, NaT, None) are left out, so they are NONE.
+
+        Args:
+            table: The table to insert into.
+            df: The DataFrame. Its index is ignored.
+            id_column: A column to use as the record ids.
+            chunk_rows: The number of rows to send in each request.
+        """
+        from .dataframe import insert_dataframe
+        return insert_dataframe(self, table, df, id_column, chunk_rows)
+
     def update(self, table, data=None):
+        if self._transaction is not None:
+            return self._transaction.update(table, data)
         return self.client.update(table, data)
 
     def delete(self, table, id=None):
+        if self._transaction is not None:
+            return self._transaction.delete(table, id)
         return self.client.delete(table, id)
 
     def drop(self, table):
+        if self._transaction is not None:
+            return self._transaction.drop(table)
         return self.client.drop(table)
 
     # any other methods should just be passed to the client
     def __getattr__(self, name):
+        if name in ('client', '_client'):
+            raise AttributeError(name)
         return getattr(self.client, name)
 
-    
-    
 
+def _reset_after_fork():
+    """Runs in the child process after a fork. Every connection rebuilds its clients, so no socket is shared with the parent."""
+    Connection._registry_lock = threading.RLock()
+    for connection in list(Connection._instances):
+        connection._after_fork()
 
-    
 
-    
-    
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def resolve_connection(connection=None) -> Connection:
+    """
+    Return a Connection for a Connection object, a connection name from the config file, or a dict of connection settings.
+    If connection is None, the current connection is used.
+    """
+    if isinstance(connection, Connection):
+        return connection
+    if isinstance(connection, dict):
+        return Connection(**connection)
+    from . import connection as get_connection
+    return get_connection(connection)
@@ -1,17 +1,136 @@
-from .clients.http_client import HttpClient
+import json
+import re
+from typing import TYPE_CHECKING
+
+from .query_builder import Raw
+
+if TYPE_CHECKING:
+    from .connections import Connection
+
+# Quoted strings are matched first so that placeholders inside them are left alone.
+# A ? that is part of an operator (?=, ??, ?~, ?:) is not a placeholder.
+_tokens = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")|\$(\w+)|%\((\w+)\)s|((?<!\?)\?(?![=?~:])|%s)""")
+_insert_values = re.compile(r'^\s*(INSERT\s+INTO\s+.+?\bVALUES\s*)(\(.*\))\s*;?\s*$', re.IGNORECASE | re.DOTALL)
+
+
+def literal(value):
+    """Encode a Python value as a SurrealQL literal."""
+    if isinstance(value, Raw):
+        return str(value)
+    return json.dumps(value, default=str, ensure_ascii=False)
+
+
+def bind(sql, params=None):
+    """
+    Place parameters into a query as SurrealQL literals.
+
+    If params is a dict, $name and %(name)s placeholders are replaced. $variables that are not in params (like $auth or $parent) are left for the server.
+    If params is a sequence, ? and %s placeholders are replaced in order. A ? in an operator like ?= or ?? is left alone.
+    """
+    if params is None:
+        return sql
+    named = isinstance(params, dict)
+    positional = iter(()) if named else iter(params)
+
+    def replace(match):
+        string, variable, pyformat, placeholder = match.groups()
+        if string:
+            return string
+        name = variable or pyformat
+        if name:
+            if named and name in params:
+                return literal(params[name])
+            if pyformat:
+                raise KeyError(f'No value given for parameter "{name}".')
+            return match.group(0)
+        if named:
+            return match.group(0)
+        try:
+            return literal(next(positional))
+        except StopIteration:
+            raise ValueError('Not enough parameters for the query.')
+
+    return _tokens.sub(replace, sql)
+
+
+def count_statements(sql):
+    """Count the statements in a query, ignoring semicolons inside strings."""
+    sql = _tokens.sub(lambda m: "''" if m.group(1) else m.group(0), sql)
+    return len([s for s in sql.split(';') if s.strip()])
 
 
 class Cursor:
     """
     This is to simulate a pymysql Cursor object. This allows the use of libraries like pandas that expect a cursor object.
+    It follows DB-API 2.0 where it can. Rows are returned as dicts.
+
+    Parameters are bound on the client, either as a dict for $name placeholders (SurrealQL's own style) or as a sequence for ? placeholders.
 
     This is instantiated by the connection object. You should not need to instantiate this directly.
     """
-    def __init__(self, client: HttpClient):
+    arraysize = 1
+    executemany_batch_size = 500
+
+    def __init__(self, client: 'Connection'):
         self.client = client
+        self.data = []
+        self.rowcount = -1
+        self.lastrowid = None
+        self._position = 0
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _set_result(self, rows, rowcount=None):
+        self.data = rows if isinstance(rows, list) else []
+        self.rowcount = rowcount if rowcount is not None else (len(rows) if isinstance(rows, list) else -1)
+        self._position = 0
+
+    def execute(self, sql, params=None):
+        """
+        Execute a query. If the query has several statements, the rows of the last statement are kept.
+        """
+        result = self.client.query(bind(sql, params))
+        if isinstance(result, list) and count_statements(sql) > 1:
+            result = result[-1] if result else []
+        self._set_result(result)
+        return self.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        """
+        Execute a query once for each set of parameters.
 
-    def execute(self, sql):
-        self.data = self.client.query(sql)
+        INSERT ... VALUES (...) queries are merged into a single INSERT with many value lists. Other queries are sent executemany_batch_size statements per request.
+        """
+        seq_of_params = list(seq_of_params)
+        if not seq_of_params:
+            self._set_result([], 0)
+            return 0
+
+        insert = _insert_values.match(sql)
+        if insert:
+            head, values = insert.groups()
+            statements = [head + ', '.join(bind(values, params) for params in seq_of_params[i:i + self.executemany_batch_size]) for i in range(0, len(seq_of_params), self.executemany_batch_size)]
+            per_request = 1
+        else:
+            statements = [bind(sql, params).strip().rstrip(';') for params in seq_of_params]
+            per_request = self.executemany_batch_size
+
+        rows, rowcount = [], 0
+        for i in range(0, len(statements), per_request):
+            batch = statements[i:i + per_request]
+            result = self.client.query(';\n'.join(batch))
+            if not isinstance(result, list):
+                # the writes are being held by a transaction
+                rowcount = -1
+                continue
+            results = result if len(batch) > 1 else [result]
+            for r in results:
+                if isinstance(r, list):
+                    rowcount += len(r)
+                    rows = r
+        self._set_result(rows, rowcount)
+        return self.rowcount
 
     @property
     def description(self):
@@ -20,8 +139,31 @@ class Cursor:
             return [(key, None, None, None, None, None, None) for key in keys]
         return []
 
+    def fetchone(self):
+        if self._position >= len(self.data):
+            return None
+        row = self.data[self._position]
+        self._position += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        rows = self.data[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
     def fetchall(self):
-        return self.data
+        rows = self.data[self._position:]
+        self._position = len(self.data)
+        return rows
+
+    def setinputsizes(self, sizes):
+        pass
+
+    def setoutputsize(self, size, column=None):
+        pass
 
     def close(self):
-        self.client.close()
\ No newline at end of file
+        """Close the cursor. The connection stays open."""
+        self.data = []
+        self._position = 0
@@ -0,0 +1,102 @@
+"""
+Encoding of pandas DataFrames to JSON for inserts, a column at a time.
+
+pandas is imported when a DataFrame is encoded, so it is only needed by people who use it.
+"""
+import json
+
+
+def _pandas():
+    try:
+        import pandas
+    except ImportError:
+        raise ImportError('insert_dataframe requires pandas. Install it with "pip install pandas".')
+    return pandas
+
+
+def _default(value):
+    # NumPy scalars inside lists and dicts
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _encode_column(pd, series):
+    """
+    Return the JSON text of each value in a column as an object array, with None for missing values (NaN, NaT, None and pd.NA), which are left out of the row.
+    Numbers, booleans, datetimes and categories are converted for the whole column at once. Only other objects are encoded one by one.
+    """
+    import numpy as np
+    types = pd.api.types
+    dtype = series.dtype
+    missing = series.isna().to_numpy()
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = _encode_column(pd, pd.Series(dtype.categories))
+        codes = series.cat.codes.to_numpy()
+        encoded = np.empty(len(series), dtype=object)
+        present = codes >= 0
+        encoded[present] = categories.take(codes[present])
+        return encoded
+    if types.is_bool_dtype(dtype):
+        values = series.to_numpy(dtype=object, na_value=None)
+        encoded = np.where(values == True, 'true', 'false').astype(object)  # noqa: E712
+    elif types.is_integer_dtype(dtype):
+        # str() of Python ints and floats (from tolist(), in C) is faster than NumPy's astype(str)
+        # unsigned columns keep their own type, since uint64 values over 2**63 wrap around in int64
+        values = series.to_numpy(dtype=np.uint64 if types.is_unsigned_integer_dtype(dtype) else np.int64, na_value=0)
+        encoded = np.array(list(map(str, values.tolist())), dtype=object)
+    elif types.is_float_dtype(dtype):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        # inf isn't valid JSON, so it is stored as NONE like NaN
+        missing = missing | ~np.isfinite(values)
+        encoded = np.array(list(map(repr, values.tolist())), dtype=object)
+    elif types.is_datetime64_any_dtype(dtype):
+        if getattr(dtype, 'tz', None) is not None:
+            series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+        values = series.to_numpy().astype('datetime64[us]')
+        encoded = '"' + np.datetime_as_string(values, unit='us').astype(object) + 'Z"'
+    elif types.is_timedelta64_dtype(dtype):
+        # durations as SurrealDB writes them, like "1500000000ns"
+        nanoseconds = series.astype('timedelta64[ns]').to_numpy().view(np.int64)
+        encoded = '"' + nanoseconds.astype(str).astype(object) + 'ns"'
+    else:
+        dumps = json.JSONEncoder(default=_default, ensure_ascii=False).encode
+        encoded = np.array([None if m else dumps(v) for v, m in zip(series.to_numpy(dtype=object), missing)], dtype=object)
+    if missing.any():
+        encoded[missing] = None
+    return encoded
+
+
+def encode_dataframe(df, id_column=None, chunk_rows=10000):
+    """
+    Yield (rows, JSON array) for each chunk of chunk_rows rows of a DataFrame.
+
+    The id_column, if given, is stored as each record's id. The index is ignored, as with df.to_dict('records').
+    Missing values are left out of the record, so they are NONE in SurrealDB.
+    """
+    pd = _pandas()
+    import numpy as np
+    if not isinstance(df, pd.DataFrame):
+        raise TypeError('insert_dataframe needs a pandas DataFrame.')
+    if id_column is not None and id_column not in df.columns:
+        raise ValueError(f'id_column "{id_column}" is not a column of the DataFrame.')
+    columns = [(column, json.dumps('id' if column == id_column else str(column), ensure_ascii=False)) for column in df.columns]
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        # each field is ',"name":value' or '' if the value is missing, so a row is its fields added together
+        rows = np.full(len(chunk), '', dtype=object)
+        for column, name in columns:
+            encoded = _encode_column(pd, chunk[column])
+            present = encoded != None  # noqa: E711
+            rows[present] += ',' + name + ':' + encoded[present]
+        yield len(chunk), '[' + ','.join('{' + row[1:] + '}' for row in rows) + ']'
+
+
+def insert_dataframe(connection, table, df, id_column=None, chunk_rows=10000):
+    """Insert the rows of a DataFrame with one insert_batch() per chunk, and return the number of rows inserted."""
+    inserted = 0
+    for count, data in encode_dataframe(df, id_column, chunk_rows):
+        connection.insert_batch(table, data)
+        inserted += count
+    return inserted
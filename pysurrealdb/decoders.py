@@ -0,0 +1,147 @@
+import dataclasses
+import datetime
+import decimal
+import re
+import threading
+import typing
+import uuid
+
+from .utils import RecordID
+
+_decoders = {}
+_lock = threading.Lock()
+_fraction = re.compile(r'(\.\d{6})\d+')
+
+
+# Converters are called for every row, so each one passes None (and values that are already converted) straight through.
+
+def parse_datetime(value):
+    """Parse a SurrealDB datetime string. SurrealDB sends up to 9 fractional digits and a Z suffix, which fromisoformat only accepts from Python 3.11."""
+    if not isinstance(value, str):
+        return value
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        value = _fraction.sub(r'\1', value)
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        return datetime.datetime.fromisoformat(value)
+
+
+def parse_date(value):
+    if not isinstance(value, str):
+        return value
+    return parse_datetime(value).date() if 'T' in value else datetime.date.fromisoformat(value)
+
+
+def parse_record_id(value):
+    if not isinstance(value, str) or isinstance(value, RecordID):
+        return value
+    return str.__new__(RecordID, value)
+
+
+def parse_uuid(value):
+    if not isinstance(value, str):
+        return value
+    return uuid.UUID(value)
+
+
+def parse_decimal(value):
+    if value is None or isinstance(value, decimal.Decimal):
+        return value
+    return decimal.Decimal(str(value))
+
+
+# How to coerce a value for each field type. Types not listed here are passed through unchanged.
+_converters = {
+    datetime.datetime: parse_datetime,
+    datetime.date: parse_date,
+    RecordID: parse_record_id,
+    uuid.UUID: parse_uuid,
+    decimal.Decimal: parse_decimal,
+}
+
+
+def _converter(hint):
+    """Return the converter for a type hint, unwrapping Optional[...]."""
+    if getattr(hint, '__origin__', None) is typing.Union:
+        args = [a for a in hint.__args__ if a is not type(None)]
+        if len(args) == 1:
+            hint = args[0]
+    return _converters.get(hint)
+
+
+_missing = object()
+
+def _fields(cls):
+    """Return (name, default, default_factory) for each field of cls, and whether cls is built by calling it with the fields as keyword arguments."""
+    if dataclasses.is_dataclass(cls):
+        fields = [(f.name, f.default, f.default_factory) for f in dataclasses.fields(cls) if f.init]
+        return [(name, _missing if d is dataclasses.MISSING else d, None if factory is dataclasses.MISSING else factory) for name, d, factory in fields], True
+    if isinstance(cls, type) and issubclass(cls, tuple) and hasattr(cls, '_fields'):
+        defaults = getattr(cls, '_field_defaults', {})
+        return [(name, defaults.get(name, _missing), None) for name in cls._fields], True
+    slots = []
+    for klass in reversed(cls.__mro__):
+        names = klass.__dict__.get('__slots__', ())
+        slots.extend([names] if isinstance(names, str) else names)
+    slots = [name for name in slots if name not in ('__dict__', '__weakref__')]
+    if slots:
+        return [(name, _missing, None) for name in slots], False
+    raise TypeError(f'Cannot decode rows into {cls.__name__}. Use a dataclass, a namedtuple or a class with __slots__.')
+
+
+def _compile(cls):
+    """Generate a decoder function for cls, so decoding a row is one function call with no per-row introspection."""
+    fields, call = _fields(cls)
+    try:
+        hints = typing.get_type_hints(cls)
+    except Exception:
+        hints = getattr(cls, '__annotations__', {})
+
+    namespace = {'_cls': cls, '_new': object.__new__}
+    values = []
+    for i, (name, default, factory) in enumerate(fields):
+        if factory is not None:
+            namespace[f'_f{i}'] = factory
+            value = f"(row['{name}'] if '{name}' in row else _f{i}())"
+        elif default is not _missing:
+            namespace[f'_d{i}'] = default
+            value = f"row.get('{name}', _d{i})"
+        else:
+            value = f"row.get('{name}')"
+        convert = _converter(hints.get(name))
+        if convert:
+            namespace[f'_c{i}'] = convert
+            value = f'_c{i}({value})'
+        values.append((name, value))
+
+    if call:
+        body = '    return _cls(' + ', '.join(f'{name}={value}' for name, value in values) + ')'
+    else:
+        body = '    obj = _new(_cls)\n' + ''.join(f'    obj.{name} = {value}\n' for name, value in values) + '    return obj'
+    source = f'def decode(row):\n{body}\n'
+    exec(compile(source, f'<pysurrealdb decoder for {cls.__qualname__}>', 'exec'), namespace)
+    return namespace['decode']
+
+
+def get_decoder(cls):
+    """
+    Return a function that turns a result row into an instance of cls. Decoders are compiled once per type and cached.
+
+    cls can be a dataclass, a namedtuple, or a class with __slots__. Fields are filled from the row keys with the same name, and missing keys use the field default (or None).
+    Fields annotated as datetime, date, RecordID, UUID or Decimal are converted from the strings SurrealDB returns.
+    """
+    decoder = _decoders.get(cls)
+    if decoder is None:
+        with _lock:
+            decoder = _decoders.get(cls)
+            if decoder is None:
+                decoder = _decoders[cls] = _compile(cls)
+    return decoder
+
+
+def decode_rows(rows, cls):
+    """Return a new list with each row decoded into an instance of cls. The rows are not changed, since a result can be shared (by coalesced reads or a mirror)."""
+    decode = get_decoder(cls)
+    return [decode(row) for row in rows]
@@ -2,4 +2,7 @@ class QueryError(Exception):
     """Exception related to Queries"""
 
 class SurrealDBError(Exception):
-    """Exception related to SurrealDB"""
\ No newline at end of file
+    """Exception related to SurrealDB"""
+
+class QueryTimeoutError(SurrealDBError):
+    """The server didn't reply before the timeout"""
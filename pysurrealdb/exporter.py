@@ -0,0 +1,124 @@
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .connections import resolve_connection
+from .query_builder import QueryBuilder
+
+
+class _NdjsonWriter:
+    def __init__(self, path):
+        self.f = open(path, 'w', encoding='utf-8')
+
+    def write(self, rows):
+        self.f.write(''.join(json.dumps(row, default=str, ensure_ascii=False) + '\n' for row in rows))
+
+    def close(self):
+        self.f.close()
+
+
+class _CsvWriter:
+    """The columns are taken from the first row. Columns that only appear in later rows are left out."""
+    def __init__(self, path):
+        self.f = open(path, 'w', encoding='utf-8', newline='')
+        self.writer = None
+
+    def write(self, rows):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.f, fieldnames=list(rows[0].keys()), extrasaction='ignore')
+            self.writer.writeheader()
+        self.writer.writerows({k: json.dumps(v, default=str) if isinstance(v, (dict, list)) else v for k, v in row.items()} for row in rows)
+
+    def close(self):
+        self.f.close()
+
+
+class _ParquetWriter:
+    """The schema is taken from the first page. Each page is written as a row group."""
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('Exporting to parquet requires pyarrow. Install it with "pip install pyarrow".')
+        self.pyarrow = pyarrow
+        self.path = path
+        self.writer = None
+
+    def write(self, rows):
+        if self.writer is None:
+            table = self.pyarrow.Table.from_pylist(rows)
+            self.writer = self.pyarrow.parquet.ParquetWriter(self.path, table.schema)
+        else:
+            table = self.pyarrow.Table.from_pylist(rows, schema=self.writer.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+_writers = {
+    'ndjson': _NdjsonWriter,
+    'jsonl': _NdjsonWriter,
+    'csv': _CsvWriter,
+    'parquet': _ParquetWriter,
+}
+
+
+def _pages(builder, page_size, prefetch):
+    """Yield pages of the query. With prefetch, the next page is fetched in the background while the current one is used."""
+    pages = builder.chunk(page_size)
+    if not prefetch:
+        yield from pages
+        return
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(next, pages, None)
+        while True:
+            page = future.result()
+            if page is None:
+                return
+            future = executor.submit(next, pages, None)
+            yield page
+
+
+def export(table_or_query, path, format=None, connection=None, page_size=1000, prefetch=True):
+    """
+    Export a table or query to a file, one page at a time.
+
+    Only the page being written and the page being fetched are held in memory, so memory use doesn't grow with the size of the table.
+
+    Args:
+        table_or_query: A table name or a QueryBuilder. Rows are exported in id order.
+        path: The file to write.
+        format: 'ndjson', 'csv' or 'parquet'. Defaults to the file extension. Parquet requires pyarrow.
+        connection: The connection to use when a table name is given. Defaults to the current connection.
+        page_size: The number of rows to fetch per request.
+        prefetch: Fetch the next page while the current page is being written.
+
+    Returns:
+        The number of rows written.
+    """
+    if isinstance(table_or_query, QueryBuilder):
+        builder = table_or_query
+    elif isinstance(table_or_query, str) and table_or_query.strip() and ' ' not in table_or_query.strip():
+        builder = resolve_connection(connection).table(table_or_query.strip())
+    else:
+        raise ValueError('export() needs a table name or a QueryBuilder. Raw SQL cannot be paged.')
+
+    if format is None:
+        format = os.path.splitext(os.path.basename(str(path)))[1][1:] or 'ndjson'
+    format = format.lower()
+    if format not in _writers:
+        raise ValueError(f'Unsupported format "{format}". Use "ndjson", "csv" or "parquet".')
+
+    writer = _writers[format](path)
+    count = 0
+    try:
+        for page in _pages(builder, page_size, prefetch):
+            writer.write(page)
+            count += len(page)
+    finally:
+        writer.close()
+    return count
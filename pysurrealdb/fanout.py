@@ -0,0 +1,91 @@
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class FanOutResult:
+    """
+    The outcome of a fanned out query on one namespace and database. Either result or error is set.
+    """
+    namespace: str
+    database: str
+    result: Any = None
+    error: Exception = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _normalize_target(target):
+    if isinstance(target, dict):
+        return target['namespace'], target['database']
+    namespace, database = target
+    return namespace, database
+
+
+def fan_out(connection, query, targets, concurrency=8, timeout=None):
+    """
+    Run one query on many namespaces and databases at once, and yield a FanOutResult for each as it completes.
+
+    Each query runs on a client from a pool of copies of the connection's client, and selects its namespace and database on that client.
+    A pooled client is only used by one query at a time, so no session is shared and the connection's own client is never switched.
+    At most concurrency queries are in flight, and targets are read as they are needed, so targets can be a generator.
+
+    This is used by Connection.fan_out(). Stop iterating to cancel the queries that haven't started.
+    """
+    if hasattr(query, '_build_query'):
+        sql, as_type = query._build_query(), query._as_type
+    else:
+        sql, as_type = query, None
+    targets = iter(targets)
+
+    # clients are copied as they are first needed, so a short list of targets doesn't open concurrency connections
+    pool = queue.Queue()
+    clients = []
+    source = connection.client
+
+    def run(namespace, database):
+        start = time.monotonic()
+        client = None
+        try:
+            try:
+                client = pool.get_nowait()
+            except queue.Empty:
+                client = source.copy()
+                clients.append(client)
+            client.use(namespace, database)
+            result = client.query(sql, timeout=timeout)
+            if as_type is not None and isinstance(result, list):
+                from .decoders import decode_rows
+                result = decode_rows(result, as_type)
+            return FanOutResult(namespace, database, result, elapsed=time.monotonic() - start)
+        except Exception as e:
+            return FanOutResult(namespace, database, error=e, elapsed=time.monotonic() - start)
+        finally:
+            if client is not None:
+                pool.put(client)
+
+    executor = ThreadPoolExecutor(concurrency, thread_name_prefix='pysurrealdb-fan-out')
+    pending = set()
+    try:
+        for target in targets:
+            while len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(run, *_normalize_target(target)))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        for client in clients:
+            client.close()
@@ -0,0 +1,84 @@
+import queue
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class HedgedReader:
+    """
+    Sends a read to one client, and if it hasn't replied after the hedge delay, sends the same read to another client. The first reply is used.
+
+    The delay is the given percentile of recent read latencies, unless a fixed delay is set. No duplicate is sent until min_samples reads have been timed.
+    Clients are checked out of a pool for each attempt, so a client is never used by two reads at once. A read that loses the race finishes in the background and returns its client to the pool.
+    If every client is busy when a duplicate is due, none is sent, since it would only wait for a client behind the reads already running.
+
+    This is used by Connection.enable_hedging(). You should not need to create one directly.
+    """
+    def __init__(self, clients, delay=None, percentile=0.95, window=1000, min_samples=20):
+        if len(clients) < 2:
+            raise ValueError('Hedged reads need at least 2 clients.')
+        self.fixed_delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.reads = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+        self._latencies = deque(maxlen=window)
+        self._pool = queue.Queue()
+        for client in clients:
+            self._pool.put(client)
+        self._executor = ThreadPoolExecutor(len(clients) * 2, thread_name_prefix='pysurrealdb-hedge')
+
+    def delay(self):
+        """Return the time to wait before sending a duplicate read, or None if no duplicate should be sent yet."""
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+        latencies = list(self._latencies)
+        if len(latencies) < self.min_samples:
+            return None
+        latencies.sort()
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.percentile))]
+
+    def _attempt(self, method, args, kwargs, client=None):
+        if client is None:
+            client = self._pool.get()
+        try:
+            start = time.monotonic()
+            result = getattr(client, method)(*args, **kwargs)
+            self._latencies.append(time.monotonic() - start)
+            return result
+        finally:
+            self._pool.put(client)
+
+    def read(self, method, *args, **kwargs):
+        """Run a read method on the clients, hedging it if the first attempt is slow."""
+        self.reads += 1
+        delay = self.delay()
+        first = self._executor.submit(self._attempt, method, args, kwargs)
+        if delay is None or wait([first], timeout=delay).done:
+            return first.result()
+
+        try:
+            client = self._pool.get_nowait()
+        except queue.Empty:
+            self.hedges_skipped += 1
+            return first.result()
+        self.hedged += 1
+        second = self._executor.submit(self._attempt, method, args, kwargs, client)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self.hedge_wins += 1
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        while not self._pool.empty():
+            self._pool.get().close()
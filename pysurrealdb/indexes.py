@@ -0,0 +1,170 @@
+import random
+import re
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .connections import Connection
+    from .query_builder import QueryBuilder
+
+_plain_column = re.compile(r'^\w+(\.\w+)*$')
+_index_definition = re.compile(r'\bFIELDS\s+(.+?)(?:\s+(UNIQUE)\b.*|\s+(?:SEARCH|MTREE|HNSW|COMMENT|CONCURRENTLY)\b.*)?$', re.IGNORECASE | re.DOTALL)
+
+_equality_operators = {'=', '==', 'IS'}
+_range_operators = {'<', '<=', '>', '>='}
+
+
+def index_name(table, columns):
+    """The default name for an index, like 'person_email_idx'."""
+    return '_'.join([table] + [column.replace('.', '_') for column in columns] + ['idx'])
+
+
+def parse_indexes(info):
+    """Return the indexes in the result of INFO FOR TABLE, as a list of dicts with name, fields, unique and definition keys."""
+    indexes = []
+    for name, definition in ((info or {}).get('ix') or {}).items():
+        match = _index_definition.search(definition)
+        fields = [field.strip() for field in match.group(1).split(',')] if match else []
+        indexes.append({'name': name, 'fields': fields, 'unique': bool(match and match.group(2)), 'definition': definition})
+    return indexes
+
+
+def _predicates(wheres, equality, ranges):
+    """
+    Collect the columns a list of where clauses filters on, in the forms QueryBuilder stores them. Returns False if the clauses are joined by OR, since one index can't serve both sides.
+    """
+    single_index = True
+    for where in wheres:
+        if len(where) == 1 and isinstance(where[0], str):
+            single_index = False
+            continue
+        if where and all(isinstance(w, list) for w in where):
+            single_index = _predicates(where, equality, ranges) and single_index
+            continue
+        if len(where) == 1 and isinstance(where[0], list) and all(isinstance(w, list) for w in where[0]):
+            single_index = _predicates(where[0], equality, ranges) and single_index
+            continue
+        if len(where) == 2:
+            column, operator = where[0], '='
+        elif len(where) == 3 and isinstance(where[0], list):
+            # where_in stores [values, 'CONTAINS', column]. A lookup of each value can use an index.
+            column, operator = where[2], '=' if str(where[1]).upper() == 'CONTAINS' else None
+        elif len(where) == 3:
+            column, operator = where[0], str(where[1]).upper()
+        else:
+            continue
+        if not isinstance(column, str) or not _plain_column.match(column):
+            continue
+        if operator in _equality_operators and column not in equality:
+            equality.append(column)
+        elif operator in _range_operators and column not in ranges:
+            ranges.append(column)
+    return single_index
+
+
+def candidate_indexes(builder: 'QueryBuilder'):
+    """
+    Return the indexes that could serve a select, as tuples of columns: the equality columns, then one range column, or else the order by column.
+    Queries by id are skipped, since record ids are always indexed.
+    """
+    equality, ranges = [], []
+    single_index = _predicates(builder._where, equality, ranges)
+    if 'id' in equality:
+        return []
+    order = str(builder._order_by[0]) if builder._order_by and _plain_column.match(str(builder._order_by[0])) else None
+    if not single_index:
+        # with OR, each column needs an index of its own
+        return [(column,) for column in equality + ranges if column != 'id']
+    columns = equality + ranges[:1]
+    if not ranges and order and order not in columns and order != 'id':
+        columns.append(order)
+    return [tuple(columns)] if columns else []
+
+
+@dataclass
+class IndexSuggestion:
+    """An index that would have served queries the advisor saw, with the time those queries took."""
+    table: str
+    columns: tuple
+    queries: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def mean_time(self):
+        return self.total_time / self.queries if self.queries else 0.0
+
+    @property
+    def statement(self):
+        return f"DEFINE INDEX {index_name(self.table, self.columns)} ON TABLE {self.table} FIELDS {', '.join(self.columns)}"
+
+
+class IndexAdvisor:
+    """
+    Records the columns that query builder selects filter and sort on, and how long they took, and suggests the indexes that would save the most time.
+
+    Suggestions are ranked by the total time of the queries each index would serve. Indexes that already exist, and indexes that a higher ranked suggestion covers as a prefix, are left out.
+    Only a sample_rate share of queries is recorded, and queries faster than min_latency are ignored, so it can be left on in production.
+
+    This is used by Connection.enable_index_advisor(). You should not need to create one directly.
+    """
+    def __init__(self, connection: 'Connection', sample_rate=1.0, min_latency=0.0):
+        self.connection = connection
+        self.sample_rate = sample_rate
+        self.min_latency = min_latency
+        self.recorded = 0
+        self._candidates = {}
+        self._lock = threading.Lock()
+
+    def record(self, builder: 'QueryBuilder', elapsed):
+        """Record a select that took elapsed seconds."""
+        if builder._type != 'select' or not builder._table or elapsed < self.min_latency:
+            return
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        table = str(builder._table)
+        candidates = candidate_indexes(builder)
+        with self._lock:
+            self.recorded += 1
+            for columns in candidates:
+                suggestion = self._candidates.get((table, columns))
+                if suggestion is None:
+                    suggestion = self._candidates[(table, columns)] = IndexSuggestion(table, columns)
+                suggestion.queries += 1
+                suggestion.total_time += elapsed
+                suggestion.max_time = max(suggestion.max_time, elapsed)
+
+    def suggestions(self, top=10, min_queries=1):
+        """Return up to top IndexSuggestions, the most time saved first."""
+        with self._lock:
+            candidates = sorted(self._candidates.values(), key=lambda s: s.total_time, reverse=True)
+        existing = {}
+        chosen = []
+        for suggestion in candidates:
+            if suggestion.queries < min_queries:
+                continue
+            if suggestion.table not in existing:
+                try:
+                    existing[suggestion.table] = [tuple(index['fields']) for index in self.connection.list_indexes(suggestion.table)]
+                except Exception:
+                    existing[suggestion.table] = []
+            covering = existing[suggestion.table] + [s.columns for s in chosen if s.table == suggestion.table]
+            if any(columns[:len(suggestion.columns)] == suggestion.columns for columns in covering):
+                continue
+            chosen.append(suggestion)
+            if len(chosen) >= top:
+                break
+        return chosen
+
+    def apply(self, top=1, min_queries=1):
+        """Define the top suggested indexes, and return the suggestions that were applied."""
+        applied = self.suggestions(top, min_queries)
+        for suggestion in applied:
+            self.connection.define_index(suggestion.table, list(suggestion.columns))
+        return applied
+
+    def reset(self):
+        with self._lock:
+            self._candidates = {}
+            self.recorded = 0
@@ -0,0 +1,289 @@
+import re
+import threading
+from typing import TYPE_CHECKING
+
+from .config import config
+from .query_builder import QueryBuilder
+
+if TYPE_CHECKING:
+    from .connections import Connection
+
+_plain_column = re.compile(r'^\w+(\.\w+)*$')
+
+
+def _index_key(value):
+    """Return a hashable key for a column value, or None if the value can't be indexed."""
+    if isinstance(value, list):
+        return None
+    if isinstance(value, dict):
+        return None
+    return value
+
+
+class MirrorQueryBuilder(QueryBuilder):
+    """
+    A QueryBuilder for a mirrored table. Selects with only equality where clauses are answered from the mirror. Everything else is sent to the server as usual.
+
+    This is returned by Connection.table() for mirrored tables. You should not need to instantiate this directly.
+    """
+    def __init__(self, client, mirror: 'TableMirror'):
+        super().__init__(client)
+        self.mirror = mirror
+
+    def _local_conditions(self):
+        """Return the where clauses as a list of (column, value), or None if the query can't be answered from the mirror."""
+        if self._type != 'select' or self._table != self.mirror.table or self._group_by or self._fetch:
+            return None
+        if self._select and not all(column == '*' or _plain_column.match(column) for column in self._select):
+            return None
+        if self._order_by and not _plain_column.match(str(self._order_by[0])):
+            return None
+        conditions = []
+        for where in self._where:
+            # a list of clauses in one call, like where([['code', 'US'], ['active', True]])
+            if len(where) == 1 and isinstance(where[0], list) and all(isinstance(w, list) for w in where[0]):
+                clauses = where[0]
+            else:
+                clauses = [where]
+            for clause in clauses:
+                if len(clause) == 2:
+                    column, value = clause
+                elif len(clause) == 3 and clause[1] in ('=', '=='):
+                    column, _, value = clause
+                else:
+                    return None
+                if not isinstance(column, str) or not _plain_column.match(column) or _index_key(value) is None:
+                    return None
+                conditions.append((column, value if isinstance(value, (str, int, float, bool)) or value is None else str(value)))
+        return conditions
+
+    def get(self, timeout=None):
+        conditions = self._local_conditions()
+        if conditions is None:
+            self.mirror.misses += 1
+            return super().get(timeout)
+        rows = self.mirror.select(conditions, self._order_by, self._limit, self._select)
+        if rows is None:
+            self.mirror.misses += 1
+            return super().get(timeout)
+        self.mirror.hits += 1
+        if self._as_type is not None:
+            from .decoders import decode_rows
+            return decode_rows(rows, self._as_type)
+        return rows
+
+
+class TableMirror:
+    """
+    An in-memory copy of a table, with hash indexes on chosen columns.
+
+    The table is loaded once, then kept up to date by re-reading rows changed since the last refresh (with updated_column), by reloading the whole table, or by a live query over WebSocket.
+    Rows are returned as copies, so changing a returned row doesn't change the mirror.
+
+    This is created by Connection.mirror(). You should not need to instantiate this directly.
+    """
+    def __init__(self, connection: 'Connection', table, indexes=(), updated_column=None, refresh_interval=None, live=False):
+        self.connection = connection
+        self.table = table
+        self.indexes = [indexes] if isinstance(indexes, str) else list(indexes)
+        self.updated_column = updated_column
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._rows = {}
+        self._index = {column: {} for column in self.indexes}
+        self._last_updated = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._live_client = None
+        self._live_id = None
+
+        self.load()
+        if live:
+            self._start_live()
+        if refresh_interval:
+            self._thread = threading.Thread(target=self._refresh_loop, name=f'pysurrealdb-mirror-{table}', daemon=True)
+            self._thread.start()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _server_query(self):
+        return QueryBuilder(self.connection).table(self.table)
+
+    def _put(self, row):
+        """Add or replace a row and its index entries. Call with the lock held."""
+        id = row.get('id')
+        if id is None:
+            return
+        self._remove(id)
+        self._rows[id] = row
+        for column, index in self._index.items():
+            key = _index_key(QueryBuilder._get_path(row, column))
+            if key is not None:
+                index.setdefault(key, {})[id] = row
+        if self.updated_column:
+            updated = row.get(self.updated_column)
+            if updated is not None and (self._last_updated is None or updated > self._last_updated):
+                self._last_updated = updated
+
+    def _remove(self, id):
+        """Remove a row and its index entries. Call with the lock held."""
+        row = self._rows.pop(id, None)
+        if row is None:
+            return
+        for column, index in self._index.items():
+            key = _index_key(QueryBuilder._get_path(row, column))
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(id, None)
+                if not bucket:
+                    del index[key]
+
+    def load(self):
+        """Read the whole table from the server and replace the mirror's contents."""
+        rows = self._server_query().get()
+        with self._lock:
+            self._rows = {}
+            self._index = {column: {} for column in self.indexes}
+            self._last_updated = None
+            for row in rows:
+                self._put(row)
+        self.refreshes += 1
+
+    def refresh(self):
+        """
+        Bring the mirror up to date.
+        With updated_column, only rows changed since the last refresh are read. Deleted rows are not noticed this way, so call load() (or use live=True) if rows are deleted.
+        Without updated_column, the whole table is read again.
+        """
+        if not self.updated_column or self._last_updated is None:
+            return self.load()
+        # >= so rows written in the same instant as the last refresh aren't missed. Applying a row twice does no harm.
+        rows = self._server_query().where(self.updated_column, '>=', self._last_updated).get()
+        with self._lock:
+            for row in rows:
+                self._put(row)
+        self.refreshes += 1
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                if config.warnings: print(f'SurrealDB: Refreshing the mirror of {self.table} failed:', e)
+
+    def _start_live(self):
+        """Start a live query on a separate WebSocket client, and apply its notifications from a background thread."""
+        client = self.connection.client
+        if client.client_type != 'ws':
+            raise ValueError('Live mirrors need a WebSocket connection.')
+        self._live_client = client.copy()
+        self._live_id = self._live_client.live(self.table)
+        # reload, in case rows changed between the first load and the start of the live query
+        self.load()
+        threading.Thread(target=self._live_loop, name=f'pysurrealdb-mirror-live-{self.table}', daemon=True).start()
+
+    def _live_loop(self):
+        while not self._stop.is_set():
+            try:
+                notification = self._live_client.notification(timeout=1)
+            except Exception as e:
+                if self._stop.is_set():
+                    return
+                if config.warnings: print(f'SurrealDB: Live query for the mirror of {self.table} failed:', e)
+                self._stop.wait(1)
+                continue
+            if notification:
+                self.apply(notification.get('action'), notification.get('result'))
+
+    def apply(self, action, record):
+        """Apply a change notification (CREATE, UPDATE or DELETE) to the mirror."""
+        with self._lock:
+            if str(action).upper() == 'DELETE':
+                self._remove(record.get('id') if isinstance(record, dict) else record)
+            elif isinstance(record, dict):
+                self._put(record)
+
+    def get(self, id=None):
+        """Return the row with an id, like 'country:us' or 'us', or every row if no id is given."""
+        if id is None:
+            with self._lock:
+                return [dict(row) for row in self._rows.values()]
+        id = str(id)
+        if ':' not in id:
+            id = f'{self.table}:{id}'
+        row = self._rows.get(id)
+        return dict(row) if row is not None else None
+
+    def lookup(self, column, value):
+        """Return the rows where column equals value."""
+        return self.select([(column, value)])
+
+    def select(self, conditions, order_by=None, limit=None, columns=None):
+        """
+        Return copies of the rows matching every (column, value) condition, sorted and limited.
+        The most selective indexed condition picks the candidate rows, and the others are checked on each candidate.
+        Return None if the rows can't be sorted locally.
+        """
+        conditions = [(column, str(value) if ':' in str(value) else f'{self.table}:{value}') if column == 'id' else (column, value) for column, value in conditions]
+        with self._lock:
+            candidates = None
+            rest = []
+            for column, value in conditions:
+                if column == 'id':
+                    row = self._rows.get(value)
+                    found = {row['id']: row} if row is not None else {}
+                elif column in self._index:
+                    found = self._index[column].get(value, {})
+                else:
+                    rest.append((column, value))
+                    continue
+                if candidates is None or len(found) < len(candidates):
+                    if candidates is not None:
+                        rest.append(candidate_condition)
+                    candidates, candidate_condition = found, (column, value)
+                else:
+                    rest.append((column, value))
+            rows = list((candidates if candidates is not None else self._rows).values())
+
+        if rest:
+            rows = [row for row in rows if all(QueryBuilder._get_path(row, column) == value for column, value in rest)]
+        if order_by:
+            column, direction = order_by
+            try:
+                rows.sort(key=lambda row: QueryBuilder._get_path(row, column), reverse=str(direction).upper() == 'DESC')
+            except TypeError:
+                return None
+        if limit:
+            rows = rows[:int(limit)]
+        if columns and '*' not in columns:
+            return [{column: row[column] for column in columns if column in row} for row in rows]
+        return [dict(row) for row in rows]
+
+    def query(self) -> MirrorQueryBuilder:
+        """Return a query builder that reads from the mirror where it can."""
+        return MirrorQueryBuilder(self.connection, self).table(self.table)
+
+    def close(self):
+        """Stop refreshing, end the live query, and detach the mirror from its connection."""
+        self._stop.set()
+        if self._live_client is not None:
+            try:
+                self._live_client.kill(self._live_id)
+                self._live_client.close()
+            except Exception:
+                pass
+        self.connection._mirrors.pop(self.table, None)
+
+    def stats(self):
+        """Return the number of rows, reads answered locally (hits), reads sent to the server (misses) and refreshes."""
+        return {'rows': len(self._rows), 'hits': self.hits, 'misses': self.misses, 'refreshes': self.refreshes}
@@ -9,6 +9,7 @@ class Model:
     This is not fully implemented. Do not use. 
     """
     _table = None
+    _schema = None # optional dataclass, namedtuple or __slots__ class that rows from where() are decoded into
     _data = {}
     _client = None
     _id = None
@@ -63,7 +64,10 @@ class Model:
 
         TODO: This should return a new model instance. 
         """
-        return self._query_builder.table(self._table).where(*args)
+        builder = self._query_builder.table(self._table).where(*args)
+        if self._schema:
+            builder.as_type(self._schema)
+        return builder
 
     def save(self):
         """
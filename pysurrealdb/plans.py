@@ -0,0 +1,136 @@
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from .config import config
+
+if TYPE_CHECKING:
+    from .connections import Connection
+    from .query_builder import QueryBuilder
+
+
+@dataclass
+class QueryPlan:
+    """
+    The plan SurrealDB chose for a select, from EXPLAIN.
+
+    operations is the plan as the server returned it, a list of dicts with operation and detail keys.
+    full_scan is True if any table is read by iterating over all of its records, and indexes lists the indexes that are used.
+    rows is the number of records fetched, which only EXPLAIN FULL reports.
+    """
+    sql: str
+    operations: list = field(default_factory=list)
+
+    @property
+    def full_scan(self):
+        return any(operation.get('operation') == 'Iterate Table' for operation in self.operations)
+
+    @property
+    def tables(self):
+        return [operation['detail']['table'] for operation in self.operations if isinstance(operation.get('detail'), dict) and 'table' in operation['detail']]
+
+    @property
+    def indexes(self):
+        indexes = []
+        for operation in self.operations:
+            plan = (operation.get('detail') or {}).get('plan') if isinstance(operation.get('detail'), dict) else None
+            if isinstance(plan, dict) and plan.get('index'):
+                indexes.append(plan['index'])
+        return indexes
+
+    @property
+    def rows(self):
+        for operation in self.operations:
+            if operation.get('operation') == 'Fetch' and isinstance(operation.get('detail'), dict):
+                return operation['detail'].get('count')
+        return None
+
+
+def parse_plan(sql, result):
+    """Build a QueryPlan from the result of a select run with EXPLAIN."""
+    if isinstance(result, dict):
+        result = [result]
+    return QueryPlan(sql, [operation for operation in result or [] if isinstance(operation, dict)])
+
+
+class PlanWatcher:
+    """
+    Samples the selects run by query builders, fetches their plans with EXPLAIN, and warns when one scans a whole table of at least min_rows records.
+
+    Table sizes are counted once per size_ttl seconds, and each query shape (table and filtered columns) is warned about at most once per warn_interval seconds.
+    Sampled queries pay for an extra EXPLAIN (and sometimes a count) in the thread that ran them, so keep sample_rate low in production.
+
+    This is used by Connection.enable_plan_warnings(). You should not need to create one directly.
+    """
+    def __init__(self, connection: 'Connection', sample_rate=0.01, min_rows=10000, size_ttl=300.0, warn_interval=300.0, callback=None, keep=100):
+        self.connection = connection
+        self.sample_rate = sample_rate
+        self.min_rows = min_rows
+        self.size_ttl = size_ttl
+        self.warn_interval = warn_interval
+        self.callback = callback
+        self.sampled = 0
+        self.full_scans = 0
+        self.warnings = 0
+        self.plans = deque(maxlen=keep)
+        self._sizes = {}
+        self._warned = {}
+        self._lock = threading.Lock()
+
+    def record(self, builder: 'QueryBuilder', elapsed):
+        """Builder hook. Samples a select that took elapsed seconds, and checks its plan."""
+        if builder._type != 'select' or not builder._table:
+            return
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        try:
+            self.check(builder, elapsed)
+        except Exception as e:
+            # the query itself succeeded, so a failed check must not fail it
+            if config.warnings: print('SurrealDB: Could not check a query plan.', e)
+
+    def check(self, builder: 'QueryBuilder', elapsed=None):
+        """Fetch the plan of a builder's select, warn if it scans a large table, and return the plan."""
+        plan = builder.explain()
+        with self._lock:
+            self.sampled += 1
+            self.plans.append((plan, elapsed))
+        if not plan.full_scan:
+            return plan
+        with self._lock:
+            self.full_scans += 1
+        table = str(builder._table)
+        size = self.table_size(table)
+        if size is None or size < self.min_rows:
+            return plan
+
+        from .indexes import candidate_indexes
+        key = (table, tuple(candidate_indexes(builder)))
+        now = time.monotonic()
+        with self._lock:
+            if now - self._warned.get(key, float('-inf')) < self.warn_interval:
+                return plan
+            self._warned[key] = now
+            self.warnings += 1
+        if self.callback is not None:
+            self.callback(plan, builder, elapsed)
+        elif config.warnings:
+            took = f' took {elapsed:.3f}s and' if elapsed is not None else ''
+            print(f'SurrealDB: A query on {table}{took} scanned all {size} records. An index may help: {plan.sql}')
+        return plan
+
+    def table_size(self, table):
+        """Return the number of records in a table, counted at most once per size_ttl seconds."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._sizes.get(table)
+            if cached is not None and now - cached[1] < self.size_ttl:
+                return cached[0]
+        result = self.connection.query(f'SELECT count() FROM {table} GROUP ALL')
+        size = result[0].get('count', 0) if result else 0
+        with self._lock:
+            self._sizes[table] = (size, now)
+        return size
@@ -1,3 +1,41 @@
+import copy
+import json
+import time
+
+
+class Raw:
+    """
+    A value that is placed in a query as is, without quoting. Useful for record ids and SurrealQL expressions.
+    """
+    def __init__(self, sql):
+        self.sql = sql
+
+    def __str__(self):
+        return self.sql
+
+    def __repr__(self):
+        return f'Raw({self.sql!r})'
+
+
+# Short names that can be used in QueryBuilder.aggregate()
+_aggregate_functions = {
+    'count': 'count',
+    'sum': 'math::sum',
+    'avg': 'math::mean',
+    'mean': 'math::mean',
+    'min': 'math::min',
+    'max': 'math::max',
+}
+
+
+def _group_key(value):
+    """Make a grouped value usable as a dict key. Arrays become tuples and objects their JSON text with sorted keys."""
+    if isinstance(value, list):
+        return tuple(_group_key(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, sort_keys=True, default=str)
+    return value
+
 
 class QueryBuilder:
     """
@@ -16,6 +54,7 @@ class QueryBuilder:
     _fetch = []
     _data = None
     _escape_table = None
+    _as_type = None
 
     def __init__(self, client):
         self.client = client
@@ -30,6 +69,7 @@ class QueryBuilder:
         self._fetch = []
         self._data = None
         self._escape_table = None
+        self._as_type = None
 
     def where(self, *args) -> 'QueryBuilder':
         """
@@ -129,19 +169,83 @@ class QueryBuilder:
         self._group_by = column
         return self
 
-    def get(self):
+    def as_type(self, cls) -> 'QueryBuilder':
         """
-        Execute the query and return the result.
+        Return rows as instances of cls instead of dicts. cls can be a dataclass, a namedtuple or a class with __slots__.
+        Fields annotated as datetime, date, RecordID, UUID or Decimal are converted. See decoders.get_decoder().
         """
-        return self.client.query(self._build_query())
+        self._as_type = cls
+        return self
 
-    def first(self):
+    def get(self, timeout=None):
+        """
+        Execute the query and return the result.
+        If a timeout is given, QueryTimeoutError is raised when the server takes longer than that many seconds to reply.
+        """
+        hooks = getattr(self.client, '_builder_hooks', None)
+        if hooks:
+            # hooks like the index advisor see each select with its latency
+            start = time.perf_counter()
+            results = self.client.query(self._build_query(), timeout=timeout)
+            elapsed = time.perf_counter() - start
+            for hook in hooks:
+                hook(self, elapsed)
+        else:
+            results = self.client.query(self._build_query(), timeout=timeout)
+        if self._as_type is not None and isinstance(results, list):
+            from .decoders import decode_rows
+            return decode_rows(results, self._as_type)
+        return results
+
+    def chunk(self, size=1000):
+        """
+        Execute the query in pages and yield each page as a list of rows.
+
+        Pages are read in id order, starting after the last id of the previous page, so a page costs the same wherever it is in the table.
+        Any order by is replaced with id order. A limit applies to the total number of rows.
+        """
+        remaining = self._limit
+        last_id = None
+        while remaining is None or remaining > 0:
+            builder = self._copy()
+            if builder._select and '*' not in builder._select and 'id' not in builder._select:
+                builder._select = list(builder._select) + ['id']
+            if last_id is not None:
+                # group the existing where clauses, so an OR can't escape the id condition
+                if builder._where:
+                    builder._where = [[list(where) for where in builder._where]]
+                builder.where('id', '>', Raw(last_id))
+            builder._order_by = ['id', 'ASC']
+            builder._limit = size if remaining is None else min(size, remaining)
+
+            rows = builder.get()
+            if not rows:
+                return
+            yield rows
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < builder._limit:
+                return
+            last_id = rows[-1]['id'] if isinstance(rows[-1], dict) else rows[-1].id
+
+    def parallel_scan(self, workers=4, column=None, ordered=False, page_size=1000):
+        """
+        Execute the query over several connections at once and yield each row.
+
+        The rows are split into workers disjoint ranges, of record ids by default or of a numeric or datetime column, and each range is read in pages like chunk() by its own thread and connection.
+        Rows are yielded as they arrive, in no particular order. With ordered, all rows of a range are yielded before the next range, and each range is in id order.
+        Any order by is ignored. A limit applies to the total number of rows.
+        """
+        from .scan import parallel_scan
+        return parallel_scan(self, workers, column, ordered, page_size)
+
+    def first(self, timeout=None):
         """
         Execute the query and return the first result.
         Return None if no results are found.
         """
         self._limit = 1
-        results = self.get()
+        results = self.get(timeout)
         if results:
             return results[0]
         return None
@@ -154,6 +258,17 @@ class QueryBuilder:
         self._limit = 1
         return bool(self.get())
 
+    def explain(self, full=False):
+        """
+        Return the plan the server chooses for this select, as a QueryPlan. The query is not run, unless full is set.
+        With full, the query is run to count the records it fetches, but no rows are returned.
+        """
+        if self._type != 'select':
+            raise ValueError('Only selects can be explained.')
+        from .plans import parse_plan
+        sql = self._build_select() + (' EXPLAIN FULL' if full else ' EXPLAIN')
+        return parse_plan(sql, self.client.query(sql))
+
     def fetch(self, column):
         """
         Add a fetch clause to the query.
@@ -169,6 +284,8 @@ class QueryBuilder:
         Execute the query and return the number of results.
         """
         self._select = ['count()']
+        # aggregate rows don't have the fields of an as_type class
+        self._as_type = None
         if not self._group_by:
             self._group_by = 'all'
         return self.get()[0]['count']
@@ -178,6 +295,7 @@ class QueryBuilder:
         Execute the query and return the sum of a column.
         """
         self._select = [f'math::sum({column})']
+        self._as_type = None
         if not self._group_by:
             self._group_by = 'all'
         return self.get()[0][f'math::sum']
@@ -187,6 +305,7 @@ class QueryBuilder:
         Execute the query and return the average of a column.
         """
         self._select = [f'math::mean({column})']
+        self._as_type = None
         if not self._group_by:
             self._group_by = 'all'
         return self.get()[0][f'math::mean']
@@ -199,6 +318,7 @@ class QueryBuilder:
         Execute the query and return the max of a column.
         """
         self._select = [f'math::max({column})']
+        self._as_type = None
         if not self._group_by:
             self._group_by = 'all'
         return self.get()[0][f'math::max']
@@ -208,10 +328,72 @@ class QueryBuilder:
         Execute the query and return the min of a column.
         """
         self._select = [f'math::min({column})']
+        self._as_type = None
         if not self._group_by:
             self._group_by = 'all'
         return self.get()[0][f'math::min']
 
+    def _copy(self) -> 'QueryBuilder':
+        """
+        Return a copy of the query that can be changed without affecting this one.
+        """
+        builder = copy.copy(self)
+        builder._where = list(self._where)
+        builder._fetch = list(self._fetch)
+        return builder
+
+    def aggregate(self, **aggregates):
+        """
+        Execute the query and compute several aggregates in one request.
+
+        Each keyword names a result. Pass '*' for a count of rows, or a (function, column) tuple. The function can be count, sum, avg, mean, min, max, or any SurrealQL function.
+
+            conn.table('order').aggregate(count='*', total=('sum', 'amount'), hi=('max', 'amount'))
+            # {'count': 3, 'total': 60, 'hi': 30}
+
+        If group_by is set, the result is a dict keyed by the group value (a tuple of values when grouping by several columns), with a dict of aggregates for each group.
+        Array values are keyed as tuples and object values as JSON text.
+        """
+        if not aggregates:
+            raise ValueError("aggregate() needs at least one aggregate.")
+        builder = self._copy()
+        groups = [c.strip() for c in str(self._group_by).split(',')] if self._group_by and self._group_by != 'all' else []
+
+        select = list(groups)
+        for name, aggregate in aggregates.items():
+            if aggregate == '*':
+                select.append(f'count() AS {name}')
+            else:
+                function, column = aggregate
+                select.append(f'{_aggregate_functions.get(function.lower(), function)}({column}) AS {name}')
+        builder._select = select
+        builder._as_type = None
+        if not groups:
+            builder._group_by = 'all'
+        rows = builder.get()
+
+        if not groups:
+            row = rows[0] if rows else {}
+            return {name: row.get(name, 0 if aggregate == '*' else None) for name, aggregate in aggregates.items()}
+
+        results = {}
+        for row in rows:
+            values = [_group_key(self._get_path(row, column)) for column in groups]
+            key = values[0] if len(values) == 1 else tuple(values)
+            results[key] = {name: row.get(name) for name in aggregates}
+        return results
+
+    @staticmethod
+    def _get_path(row, column):
+        """
+        Get a column from a row. Nested columns use dot notation, like 'address.city'.
+        """
+        for part in column.split('.'):
+            if not isinstance(row, dict):
+                return None
+            row = row.get(part)
+        return row
+
     def to_sql(self):
         """
         Return the query as a string.
@@ -0,0 +1,236 @@
+import atexit
+import datetime
+import json
+import re
+import threading
+import time
+
+from .config import config
+
+_durations = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+_duration = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h|d|w)\s*$')
+_plain_column = re.compile(r'^\w+$')
+_functions = ('count', 'sum', 'min', 'max', 'mean')
+
+
+def parse_duration(value):
+    """Return a duration like '1m', '15s' or '1h' (or a number of seconds) in seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    match = _duration.match(str(value))
+    if not match:
+        raise ValueError(f'Invalid duration "{value}". Use a number of seconds, or a duration like "10s", "1m" or "1h".')
+    return float(match.group(1)) * _durations[match.group(2)]
+
+
+def _timestamp(value):
+    """Return a sample's time in seconds since the epoch. Accepts datetimes (naive ones are UTC), epoch seconds and ISO 8601 strings."""
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        from .decoders import parse_datetime
+        value = parse_datetime(value)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.timestamp()
+    raise ValueError(f'Cannot read a time from {value!r}.')
+
+
+class RollupWriter:
+    """
+    Aggregates samples in memory per time bucket and group, and writes one merged upsert per bucket and group instead of one row per sample.
+
+    Use Connection.rollup_writer() to create one. Each bucket and group is stored as one record, with an id made from the bucket start and the group values.
+    A flush adds counts and sums to the stored record and keeps the smaller min and larger max, so samples that arrive after their bucket was flushed are merged in, not lost.
+    Flushes happen every flush_interval seconds from a background thread, and as soon as max_groups buckets and groups are held, so memory use stays bounded.
+    """
+    def __init__(self, connection, table, bucket='1m', group_by=(), aggregates=None, time_column='time', max_groups=10000, flush_interval=10.0, statements_per_request=500, on_error=None):
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        self.connection = connection
+        self.table = table
+        self.bucket = parse_duration(bucket)
+        if self.bucket <= 0:
+            raise ValueError('bucket must be longer than 0 seconds.')
+        self.group_by = list(group_by)
+        self.aggregates = self._parse_aggregates(aggregates or {})
+        self.time_column = time_column
+        self.max_groups = max_groups
+        self.flush_interval = flush_interval
+        self.statements_per_request = statements_per_request
+        self.on_error = on_error
+        for column in self.group_by + [time_column] + list(self.aggregates):
+            if not _plain_column.match(column):
+                raise ValueError(f'Invalid column name "{column}".')
+
+        self.samples = 0
+        self.written = 0
+        self.failed = 0
+        self.requests = 0
+
+        self._groups = {}
+        self._flushing = None
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f'pysurrealdb-rollup-{table}', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def _parse_aggregates(aggregates):
+        """Normalize {'column': 'sum'} and {'column': ['min', 'max']} to {'column': ('min', 'max')}."""
+        parsed = {}
+        for column, functions in aggregates.items():
+            functions = (functions,) if isinstance(functions, str) else tuple(functions)
+            for function in functions:
+                if function not in _functions:
+                    raise ValueError(f'Unsupported aggregate "{function}". Use one of {", ".join(_functions)}.')
+            parsed[column] = functions
+        return parsed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def write(self, sample):
+        """
+        Add a sample. It is read straight away, so later changes to it don't matter.
+        Blocks while a flush triggered by max_groups is still being sent.
+        """
+        start = int(_timestamp(sample.get(self.time_column)) // self.bucket)
+        key = (start, tuple(json.dumps(sample.get(column), sort_keys=True, default=str) for column in self.group_by))
+        with self._cond:
+            if self._closed:
+                raise ValueError('Cannot write to a closed RollupWriter.')
+            group = self._groups.get(key)
+            if group is None:
+                # bounded cardinality: hand the full set of groups to the flush thread before starting a new one
+                while len(self._groups) >= self.max_groups:
+                    if self._flushing is None:
+                        self._flushing, self._groups = self._groups, {}
+                        self._cond.notify_all()
+                    else:
+                        self._cond.wait()
+                group = self._groups[key] = {'count': 0, 'values': {column: [0, 0.0, None, None] for column in self.aggregates}, 'group': [sample.get(column) for column in self.group_by]}
+            group['count'] += 1
+            for column, state in group['values'].items():
+                value = sample.get(column)
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                state[0] += 1
+                state[1] += value
+                if state[2] is None or value < state[2]:
+                    state[2] = value
+                if state[3] is None or value > state[3]:
+                    state[3] = value
+            self.samples += 1
+
+    def write_many(self, samples):
+        """Add several samples."""
+        for sample in samples:
+            self.write(sample)
+
+    def flush(self):
+        """Write every bucket and group held, and wait for it to finish."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while (self._groups or self._flushing) and self._thread.is_alive():
+                self._cond.wait()
+
+    def close(self):
+        """Flush, stop the background thread and close the writer's connection. Safe to call more than once."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        atexit.unregister(self.close)
+        # the connection is the writer's own copy, from Connection.rollup_writer()
+        self.connection.close()
+
+    def stats(self):
+        """Return the samples taken, the records written, and the number of samples per record written."""
+        return {
+            'samples': self.samples,
+            'written': self.written,
+            'failed': self.failed,
+            'requests': self.requests,
+            'pending_groups': len(self._groups),
+            'reduction': self.samples / self.written if self.written else 0.0,
+        }
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            with self._cond:
+                while self._flushing is None and not (self._closed or self._flush_requested):
+                    remaining = self.flush_interval - (time.monotonic() - last_flush)
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._flushing is None:
+                    self._flushing, self._groups = self._groups, {}
+                groups = self._flushing
+                if not groups:
+                    self._flushing = None
+                    self._flush_requested = False
+                    self._cond.notify_all()
+                    if self._closed:
+                        return
+                    last_flush = time.monotonic()
+                    continue
+
+            self._send(groups)
+            last_flush = time.monotonic()
+            with self._cond:
+                self._flushing = None
+                self._cond.notify_all()
+
+    def _statement(self, start, group):
+        """Build the UPDATE that merges one bucket and group into its record. UPDATE on a record id creates the record if it doesn't exist."""
+        bucket = datetime.datetime.fromtimestamp(start * self.bucket, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        id = json.dumps([bucket] + group['group'], default=str, ensure_ascii=False)
+        fields = [f'{self.time_column} = <datetime> {json.dumps(bucket)}']
+        fields += [f'{column} = {json.dumps(value, default=str, ensure_ascii=False)}' for column, value in zip(self.group_by, group['group'])]
+        fields.append(f"count += {group['count']}")
+        for column, functions in self.aggregates.items():
+            count, total, low, high = group['values'][column]
+            if 'count' in functions or 'mean' in functions:
+                fields.append(f'{column}_count += {count}')
+            if 'sum' in functions or 'mean' in functions:
+                fields.append(f'{column}_sum += {total}')
+            if 'mean' in functions:
+                fields.append(f'{column}_mean = {column}_sum / {column}_count')
+            if 'min' in functions and low is not None:
+                fields.append(f'{column}_min = math::min([{column}_min ?? {low}, {low}])')
+            if 'max' in functions and high is not None:
+                fields.append(f'{column}_max = math::max([{column}_max ?? {high}, {high}])')
+        # an array id, like [bucket start, ...group values], so records sort by bucket and can be read by id range
+        return f"UPDATE type::thing({json.dumps(self.table)}, {id}) SET {', '.join(fields)}"
+
+    def _send(self, groups):
+        items = [self._statement(start, group) for (start, _), group in groups.items()]
+        for i in range(0, len(items), self.statements_per_request):
+            statements = items[i:i + self.statements_per_request]
+            try:
+                self.connection.query(';\n'.join(statements))
+                self.written += len(statements)
+            except Exception as e:
+                self.failed += len(statements)
+                if self.on_error:
+                    try:
+                        self.on_error(e, statements)
+                    except Exception as callback_error:
+                        if config.warnings: print('SurrealDB: RollupWriter error callback failed.', callback_error)
+                elif config.warnings:
+                    print(f'SurrealDB: Rollup write of {len(statements)} records to {self.table} failed.', e)
+            finally:
+                self.requests += 1
@@ -0,0 +1,171 @@
+import datetime
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .query_builder import QueryBuilder
+
+# Put at the end of a range's pages
+_done = object()
+
+
+def _id_boundaries(builder: 'QueryBuilder', ranges, executor):
+    """Split a select into ranges of about the same number of records, by reading the ids at evenly spaced offsets in id order."""
+    from .query_builder import Raw
+    count = builder.aggregate(count='*')['count']
+    if not count or ranges < 2:
+        return []
+    probe = builder._copy()
+    probe._select = ['id']
+    probe._order_by = ['id', 'ASC']
+    sql = probe._build_select()
+    offsets = sorted({count * k // ranges for k in range(1, ranges)} - {0})
+    futures = [executor.submit(builder.client.query, f'{sql} LIMIT 1 START {offset}') for offset in offsets]
+    boundaries = []
+    for future in futures:
+        rows = future.result()
+        if rows and str(rows[0]['id']) not in boundaries:
+            boundaries.append(str(rows[0]['id']))
+    return [Raw(boundary) for boundary in boundaries]
+
+
+def _parse_time(value):
+    from .decoders import parse_datetime
+    if not isinstance(value, str):
+        return None
+    try:
+        return parse_datetime(value)
+    except ValueError:
+        return None
+
+
+def _column_end(builder: 'QueryBuilder', column, direction):
+    """Return the smallest (ASC) or largest (DESC) value of a column. math::min and math::max only take numbers, so this sorts instead, which works for datetimes and can use an index."""
+    from .query_builder import Raw
+    probe = builder._copy()
+    if probe._where:
+        probe._where = [[list(where) for where in probe._where]]
+    probe.where(column, '!=', Raw('NONE'))
+    probe._select = [column]
+    probe._order_by = [column, direction]
+    probe._limit = 1
+    rows = probe.get()
+    return probe._get_path(rows[0], column) if rows else None
+
+
+def _column_boundaries(builder: 'QueryBuilder', column, ranges):
+    """Split a select into ranges of equal width between the smallest and largest value of a numeric or datetime column."""
+    from .query_builder import Raw
+    low, high = _column_end(builder, column, 'ASC'), _column_end(builder, column, 'DESC')
+    if low is None or high is None or low == high or ranges < 2:
+        return []
+    if isinstance(low, (int, float)) and isinstance(high, (int, float)):
+        step = (high - low) / ranges
+        return [low + step * k for k in range(1, ranges)]
+    low_time, high_time = _parse_time(low), _parse_time(high)
+    if low_time is None or high_time is None:
+        raise ValueError(f'parallel_scan can only split on a numeric or datetime column, and {column} has values like {low!r}.')
+    if low_time.tzinfo is None:
+        low_time, high_time = low_time.replace(tzinfo=datetime.timezone.utc), high_time.replace(tzinfo=datetime.timezone.utc)
+    step = (high_time - low_time) / ranges
+    times = [(low_time + step * k).astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ') for k in range(1, ranges)]
+    return [Raw(f'<datetime> {json.dumps(t)}') for t in times]
+
+
+def _range_builders(builder: 'QueryBuilder', column, boundaries):
+    """Return a builder for each range between boundaries. The first range has no lower bound and the last no upper bound."""
+    builders = []
+    bounds = [None] + list(boundaries) + [None]
+    for low, high in zip(bounds, bounds[1:]):
+        part = builder._copy()
+        # group the existing where clauses, so an OR can't escape the range
+        if part._where:
+            part._where = [[list(where) for where in part._where]]
+        if low is not None:
+            part.where(column, '>=', low)
+        if high is not None:
+            part.where(column, '<', high)
+        builders.append(part)
+    return builders
+
+
+def parallel_scan(builder: 'QueryBuilder', workers=4, column=None, ordered=False, page_size=1000, prefetch=2):
+    """
+    Read the rows of a select from several disjoint ranges at once, and yield them one by one. Used by QueryBuilder.parallel_scan().
+
+    Each range is read in pages by its own thread over its own connection, and at most prefetch pages per range wait to be yielded.
+    Stop iterating to stop the scan.
+    """
+    from .connections import Connection
+    if builder._type != 'select':
+        raise ValueError('Only selects can be scanned.')
+    if builder._group_by:
+        raise ValueError('A grouped select cannot be split into ranges.')
+    limit = builder._limit
+    # boundaries are found with plain selects, so the probes don't decode into as_type or fetch links
+    base = builder._copy()
+    base._limit = None
+    base._order_by = None
+    base._fetch = []
+    base._as_type = None
+
+    executor = ThreadPoolExecutor(workers, thread_name_prefix='pysurrealdb-scan')
+    stop = threading.Event()
+    try:
+        if column is None:
+            boundaries = _id_boundaries(base, workers, executor)
+        else:
+            boundaries = _column_boundaries(base, column, workers)
+        parts = _range_builders(builder._copy(), column or 'id', boundaries)
+        shared = queue.Queue(maxsize=prefetch * len(parts))
+        queues = [queue.Queue(maxsize=prefetch) for _ in parts] if ordered else [shared] * len(parts)
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def scan(index, part):
+            connection = None
+            try:
+                # each range has its own connection, so ranges don't wait on each other's requests
+                connection = part.client = Connection(client=builder.client.client.copy())
+                for page in part.chunk(page_size):
+                    if not put(queues[index], (index, page)):
+                        return
+                put(queues[index], (index, _done))
+            except Exception as e:
+                put(queues[index], (index, e))
+            finally:
+                if connection is not None:
+                    connection.close()
+
+        for index, part in enumerate(parts):
+            executor.submit(scan, index, part)
+
+        yielded = 0
+        for index in range(len(parts)) if ordered else [None]:
+            pending = 1 if ordered else len(parts)
+            q = queues[index] if ordered else shared
+            while pending:
+                _, item = q.get()
+                if item is _done:
+                    pending -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                for row in item:
+                    yield row
+                    yielded += 1
+                    if limit is not None and yielded >= limit:
+                        return
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
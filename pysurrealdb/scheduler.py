@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class WriteScheduler:
+    """
+    Tunes the batch size and the number of requests in flight for bulk writes, from the latency and errors it observes.
+
+    It works like TCP congestion control (additive increase, multiplicative decrease). Each round of successful batches that finish under target_latency grows the batch by increase_rows, and adds one request in flight if there is plenty of headroom.
+    A failed batch, or one slower than target_latency, multiplies both by decrease_factor. After a decrease, batches that were already in flight don't cause another one.
+
+    Writers ask for batch_rows and batch_bytes before building a batch, hold a slot() while sending it, and report the outcome with record().
+    The scheduler is thread safe, so one scheduler can be shared by all the writers to a server.
+
+        scheduler = WriteScheduler(target_latency=0.5)
+        bulk_load('events.ndjson', 'event', scheduler=scheduler)
+        print(scheduler.stats())
+    """
+    def __init__(self, batch_rows=1000, batch_bytes=1000000, concurrency=4, target_latency=1.0,
+                 min_batch_rows=10, max_batch_rows=100000, min_concurrency=1, max_concurrency=32,
+                 increase_rows=None, decrease_factor=0.5, window=10.0):
+        if not 0 < decrease_factor < 1:
+            raise ValueError('decrease_factor must be between 0 and 1.')
+        self.target_latency = target_latency
+        self.min_batch_rows = min_batch_rows
+        self.max_batch_rows = max_batch_rows
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase_rows = increase_rows or max(1, batch_rows // 10)
+        self.decrease_factor = decrease_factor
+        self.window = window
+
+        self._batch_rows = float(batch_rows)
+        self._bytes_per_row = batch_bytes / batch_rows
+        self._concurrency = float(concurrency)
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._generation = 0
+        self._round = 0
+        self._round_latency = 0.0
+        self._recent = deque()
+        self._started = time.monotonic()
+
+        self.rows = 0
+        self.bytes = 0
+        self.requests = 0
+        self.errors = 0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def batch_rows(self) -> int:
+        """The number of rows to put in the next batch."""
+        return int(self._batch_rows)
+
+    @property
+    def batch_bytes(self) -> int:
+        """The most bytes to put in the next batch. Grows and shrinks with batch_rows."""
+        return int(self._batch_rows * self._bytes_per_row)
+
+    @property
+    def concurrency(self) -> int:
+        """The number of batches that may be in flight at once."""
+        return int(self._concurrency)
+
+    @property
+    def generation(self) -> int:
+        """Goes up by one on every decrease. Pass the value read when a batch was sent to record()."""
+        return self._generation
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """
+        Wait until fewer than concurrency batches are in flight, and hold a place while the batch is sent. Yields the generation to pass to record().
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._in_flight < self.concurrency, timeout):
+                raise TimeoutError('Timed out waiting for a write slot.')
+            self._in_flight += 1
+            generation = self._generation
+        try:
+            yield generation
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify()
+
+    def record(self, rows, nbytes, latency, error=None, generation=None):
+        """
+        Report a finished batch. Pass error (an exception, or True) if it failed, and the generation from slot() if the batch held one.
+        """
+        now = time.monotonic()
+        with self._condition:
+            self.requests += 1
+            if error:
+                self.errors += 1
+            else:
+                self.rows += rows
+                self.bytes += nbytes
+                self._recent.append((now, rows, nbytes))
+            while self._recent and self._recent[0][0] < now - self.window:
+                self._recent.popleft()
+
+            if error or latency > self.target_latency:
+                # batches sent before the last decrease were sized for the old settings, so they don't count
+                if generation is None or generation >= self._generation:
+                    self._decrease()
+                return
+
+            self._round += 1
+            self._round_latency = max(self._round_latency, latency)
+            if self._round >= self.concurrency:
+                self._increase(self._round_latency)
+                self._round = 0
+                self._round_latency = 0.0
+            self._condition.notify_all()
+
+    def _decrease(self):
+        self._batch_rows = max(self.min_batch_rows, self._batch_rows * self.decrease_factor)
+        self._concurrency = max(self.min_concurrency, self._concurrency * self.decrease_factor)
+        self._generation += 1
+        self._round = 0
+        self._round_latency = 0.0
+        self.decreases += 1
+
+    def _increase(self, latency):
+        self._batch_rows = min(self.max_batch_rows, self._batch_rows + self.increase_rows)
+        # more requests in flight only help while the server keeps up, so only add one with plenty of headroom
+        if latency < self.target_latency / 2:
+            self._concurrency = min(self.max_concurrency, self._concurrency + 1)
+        self.increases += 1
+
+    def stats(self):
+        """Return the current settings and the throughput achieved, overall and over the last window seconds."""
+        now = time.monotonic()
+        with self._condition:
+            recent = [r for r in self._recent if r[0] >= now - self.window]
+            span = min(self.window, now - self._started) or 1e-9
+            elapsed = (now - self._started) or 1e-9
+            return {
+                'batch_rows': self.batch_rows,
+                'batch_bytes': self.batch_bytes,
+                'concurrency': self.concurrency,
+                'in_flight': self._in_flight,
+                'rows': self.rows,
+                'bytes': self.bytes,
+                'requests': self.requests,
+                'errors': self.errors,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'rows_per_sec': self.rows / elapsed,
+                'recent_rows_per_sec': sum(r[1] for r in recent) / span,
+                'recent_bytes_per_sec': sum(r[2] for r in recent) / span,
+            }
@@ -0,0 +1,353 @@
+import bisect
+import hashlib
+import heapq
+import json
+import random
+import re
+import string
+from concurrent.futures import ThreadPoolExecutor
+
+from .connections import Connection, resolve_connection
+from .query_builder import QueryBuilder
+from .utils import verify_table_and_id
+
+_id_characters = string.ascii_lowercase + string.digits
+
+# An aggregate in a select, like 'count()', 'math::sum(amount) AS total'
+_aggregate_column = re.compile(r'^\s*(count|math::sum|math::min|math::max|math::mean)\((.*)\)\s*(?:AS\s+(\S+))?\s*$', re.IGNORECASE)
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+def _sort_key(value):
+    """Order values of different types the way SurrealDB does: none, booleans, numbers, strings, then everything else."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, json.dumps(value, sort_keys=True, default=str))
+
+
+class HashRing:
+    """
+    A consistent hash ring. Each node is placed on the ring at vnodes points, and a key belongs to the node at the first point after the key's hash.
+
+    Adding a node only takes keys from the points it lands next to, so about 1/n of the keys move, all of them to the new node. Removing a node only moves its own keys.
+    """
+    def __init__(self, nodes=(), vnodes=100):
+        self.vnodes = vnodes
+        self._points = []
+        self._owners = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for i in range(self.vnodes):
+            point = _hash(f'{node}#{i}')
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node(self, key):
+        """Return the node that owns a key."""
+        if not self._points:
+            raise ValueError('The hash ring has no nodes.')
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class ShardedQueryBuilder(QueryBuilder):
+    """
+    A QueryBuilder for a sharded table. Selects are sent to every shard in parallel, and the results are merged on the client.
+
+    With order_by, each shard's rows arrive sorted and are merged in order, and the limit is applied to the merged rows.
+    Grouped selects are merged by group. count(), math::sum(), math::min(), math::max() and math::mean() are combined across shards. Other columns are taken from the first shard that returned the group.
+    A fetch only finds linked records on the same shard.
+
+    This is returned by ShardedConnection.table(). You should not need to instantiate this directly.
+    """
+    def get(self, timeout=None):
+        if self._type != 'select':
+            return super().get(timeout)
+        if self._group_by:
+            rows = self._get_grouped(timeout)
+        else:
+            rows = self._merge([rows for rows in self.client.scatter(self._build_query(), timeout) if rows])
+        if self._as_type is not None:
+            from .decoders import decode_rows
+            return decode_rows(rows, self._as_type)
+        return rows
+
+    def _merge(self, results):
+        """Merge the rows from each shard, keeping the order by, then apply the limit."""
+        if self._order_by:
+            column, direction = self._order_by[0], str(self._order_by[1]).upper()
+            rows = list(heapq.merge(*results, key=lambda row: _sort_key(self._get_path(row, column)), reverse=direction == 'DESC'))
+        else:
+            rows = [row for result in results for row in result]
+        return rows[:self._limit] if self._limit else rows
+
+    def _get_grouped(self, timeout):
+        groups = [] if str(self._group_by).lower() == 'all' else [c.strip() for c in str(self._group_by).split(',')]
+        # each shard returns its partial aggregates for every group. The limit only applies once the groups are merged.
+        builder = self._copy()
+        builder._limit = None
+        select, combine = [], []
+        for i, column in enumerate(self._select or ['*']):
+            match = _aggregate_column.match(column)
+            if not match:
+                select.append(column)
+                continue
+            function, argument, alias = match.group(1).lower(), match.group(2), match.group(3)
+            name = alias or function
+            if function == 'math::mean':
+                # a mean of means is wrong, so each shard returns a sum and a count of numbers
+                select += [f'math::sum({argument}) AS _shard_sum_{i}', f'count(type::is::number({argument})) AS _shard_count_{i}']
+                combine.append((name, 'mean', (f'_shard_sum_{i}', f'_shard_count_{i}')))
+            else:
+                select.append(column)
+                combine.append((name, 'sum' if function in ('count', 'math::sum') else function[6:], name))
+        builder._select = select
+
+        merged = {}
+        for rows in self.client.scatter(builder._build_query(), timeout):
+            for row in rows or []:
+                key = tuple(json.dumps(self._get_path(row, column), sort_keys=True, default=str) for column in groups)
+                if key not in merged:
+                    merged[key] = (dict(row), [[] for _ in combine])
+                for values, (name, kind, source) in zip(merged[key][1], combine):
+                    values.append(tuple(row.get(s) for s in source) if kind == 'mean' else row.get(source))
+
+        results = []
+        for row, values in merged.values():
+            for partials, (name, kind, source) in zip(values, combine):
+                if kind == 'mean':
+                    total = sum(s for s, _ in partials if s is not None)
+                    count = sum(c for _, c in partials if c)
+                    row[name] = total / count if count else None
+                    for s in source:
+                        row.pop(s, None)
+                    continue
+                partials = [p for p in partials if p is not None]
+                if kind == 'sum':
+                    row[name] = sum(partials)
+                elif partials:
+                    row[name] = (min if kind == 'min' else max)(partials, key=_sort_key)
+                else:
+                    row[name] = None
+            results.append(row)
+        if self._order_by:
+            column, direction = self._order_by[0], str(self._order_by[1]).upper()
+            results.sort(key=lambda row: _sort_key(self._get_path(row, column)), reverse=direction == 'DESC')
+        return results[:self._limit] if self._limit else results
+
+    def explain(self, full=False):
+        """Return the plan each shard chooses for this select, as a dict of shard name to QueryPlan."""
+        from .plans import parse_plan
+        sql = self._build_select() + (' EXPLAIN FULL' if full else ' EXPLAIN')
+        return {name: parse_plan(sql, result) for name, result in self.client.query(sql).items()}
+
+    def update(self, data):
+        """Update fields on every shard, and return the updated rows."""
+        self._type = 'update'
+        self._data = data
+        return [row for rows in self.client.scatter(self._build_query()) for row in rows or []]
+
+    def relate(self, noun1, verb, noun2, data=None):
+        """Relate 2 records. The edge is stored on the shard that owns noun1."""
+        self._type = 'relate'
+        self._relate = [noun1, verb, noun2]
+        self._data = data
+        return self.client.shard(noun1).query(self._build_query())
+
+
+class ShardedConnection:
+    """
+    Spreads tables over several SurrealDB servers (or databases). Each record lives on one shard, chosen by hashing its 'table:id' on a consistent hash ring.
+
+    get(), create(), insert(), update() and delete() go to the shard that owns the record. Records created without an id get one on the client, so they can be routed.
+    table() returns a query builder whose selects run on every shard in parallel and are merged on the client.
+
+        shards = ShardedConnection({'a': {'host': 'db-a'}, 'b': {'host': 'db-b'}})
+        shards.create('event', {'kind': 'click'})
+        shards.table('event').where('kind', 'click').order_by('time', 'DESC').limit(10).get()
+
+    Adding a shard only moves the records the new shard takes over. Call rebalance() to move them.
+    """
+    def __init__(self, shards, vnodes=100):
+        """
+        Args:
+            shards: A dict of shard name to Connection, connection name or dict of connection settings, or a list of these. Shards in a list are named after their host, port, namespace and database.
+            vnodes: How many points each shard has on the hash ring. More points spread records more evenly.
+        """
+        self.shards = {}
+        self.ring = HashRing(vnodes=vnodes)
+        self._executor = None
+        items = shards.items() if isinstance(shards, dict) else ((None, shard) for shard in shards)
+        for name, shard in items:
+            self.add_shard(shard, name)
+
+    @staticmethod
+    def _shard_name(connection):
+        settings = connection.client.settings()
+        return f"{settings.get('host')}:{settings.get('port')}/{settings.get('namespace')}/{settings.get('database')}"
+
+    def add_shard(self, connection, name=None):
+        """Add a shard. Records that now belong to it stay where they are until rebalance() moves them."""
+        connection = resolve_connection(connection) if not isinstance(connection, Connection) else connection
+        name = name or self._shard_name(connection)
+        if name in self.shards:
+            raise ValueError(f'There is already a shard named {name}.')
+        self.shards[name] = connection
+        self.ring.add(name)
+        self._resize_executor()
+        return name
+
+    def remove_shard(self, name, tables=(), chunk_size=1000):
+        """Stop routing to a shard, move the records of tables from it to the shards that now own them, and return its connection."""
+        self.ring.remove(name)
+        connection = self.shards.pop(name)
+        self._resize_executor()
+        if isinstance(tables, str):
+            tables = [tables]
+        for table in tables:
+            self._move(connection, None, table, chunk_size)
+        return connection
+
+    def _resize_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max(1, len(self.shards)), thread_name_prefix='pysurrealdb-shard')
+
+    def shard_name(self, table, id=None):
+        """Return the name of the shard that owns a record."""
+        table, id = verify_table_and_id(table, None if id is None else str(id))
+        if not id:
+            raise ValueError('A record id is needed to find its shard.')
+        return self.ring.node(f'{table}:{id}')
+
+    def shard(self, table, id=None) -> Connection:
+        """Return the connection to the shard that owns a record."""
+        return self.shards[self.shard_name(table, id)]
+
+    def scatter(self, sql, timeout=None):
+        """Run a query on every shard in parallel, and return the results in shard order."""
+        futures = [self._executor.submit(connection.query, sql, timeout=timeout) for connection in self.shards.values()]
+        return [future.result() for future in futures]
+
+    def query(self, sql, timeout=None):
+        """Run a query on every shard, and return a dict of shard name to result."""
+        return dict(zip(self.shards, self.scatter(sql, timeout)))
+
+    def table(self, table) -> ShardedQueryBuilder:
+        return ShardedQueryBuilder(self).table(table)
+
+    def get(self, table, id=None, timeout=None):
+        """Get a record from its shard, or every record of a table from all shards."""
+        table, id = verify_table_and_id(table, None if id is None else str(id))
+        if id:
+            return self.shard(table, id).get(table, id, timeout=timeout)
+        futures = [self._executor.submit(connection.get, table, timeout=timeout) for connection in self.shards.values()]
+        return [row for future in futures for row in future.result() or []]
+
+    def _with_id(self, table, data):
+        table, id = verify_table_and_id(table, None if data.get('id') is None else str(data['id']))
+        if not id:
+            id = ''.join(random.choices(_id_characters, k=20))
+        return table, id, {**data, 'id': id}
+
+    def create(self, table, data):
+        """Create one or many records, each on the shard that owns it. Records without an id get a random one."""
+        if not isinstance(data, list):
+            table, id, data = self._with_id(table, data)
+            return self.shard(table, id).create(table, data)
+        results = []
+        for connection, rows in self._group(table, data).values():
+            results += connection.create(table.split(':')[0], rows)
+        return results
+
+    def insert(self, table, data):
+        """Insert one or many records, each on the shard that owns it. Records without an id get a random one."""
+        return self.create(table, data)
+
+    def insert_batch(self, table, data):
+        """Insert many records, with one request per shard."""
+        if isinstance(data, str):
+            data = json.loads(data)
+        futures = [self._executor.submit(connection.insert_batch, table, rows) for connection, rows in self._group(table, data).values()]
+        return [row for future in futures for row in future.result() or []]
+
+    def _group(self, table, data):
+        """Split rows by the shard that owns them. Returns a dict of shard name to (connection, rows)."""
+        groups = {}
+        for row in data:
+            row_table, id, row = self._with_id(table, row)
+            name = self.shard_name(row_table, id)
+            groups.setdefault(name, (self.shards[name], []))[1].append(row)
+        return groups
+
+    def update(self, table, data=None):
+        """Replace a record on the shard that owns it."""
+        if data is None:
+            data = table
+            table = str(data['id'])
+        table, id = verify_table_and_id(table, None if data.get('id') is None else str(data['id']))
+        if not id:
+            raise ValueError("Cannot update a record without an ID.")
+        return self.shard(table, id).update(f'{table}:{id}', data)
+
+    def delete(self, table, id=None):
+        """Delete a record from the shard that owns it."""
+        table, id = verify_table_and_id(table, None if id is None else str(id))
+        if not id:
+            raise ValueError("Cannot delete a record without an ID. If you meant to delete the entire table, use the drop() method.")
+        return self.shard(table, id).delete(table, id)
+
+    def drop(self, table):
+        """Delete every record in a table, on every shard."""
+        for connection in self.shards.values():
+            connection.drop(table)
+        return []
+
+    def rebalance(self, tables, chunk_size=1000):
+        """
+        Move records that are on the wrong shard after a shard was added to the shard that owns them. Returns the number of records moved.
+        Each record is written to its new shard before it is deleted from the old one, so it is never missing, but it can be found twice while it moves.
+        """
+        if isinstance(tables, str):
+            tables = [tables]
+        moved = 0
+        for table in tables:
+            for name, connection in list(self.shards.items()):
+                moved += self._move(connection, name, table, chunk_size)
+        return moved
+
+    def _move(self, connection, name, table, chunk_size):
+        """Move the records of a table on a connection that aren't owned by the shard called name."""
+        moved = 0
+        for rows in QueryBuilder(connection).table(table).chunk(chunk_size):
+            for row in rows:
+                owner = self.shard_name(table, str(row['id']))
+                if owner == name:
+                    continue
+                self.shards[owner].update(str(row['id']), row)
+                connection.delete(str(row['id']))
+                moved += 1
+        return moved
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        for connection in self.shards.values():
+            connection.close()
@@ -0,0 +1,28 @@
+import threading
+import time
+from pysurrealdb.coalesce import SingleFlight, is_read_query
+
+def test_is_read_query():
+    assert is_read_query('SELECT * FROM person WHERE age > 18')
+    assert is_read_query('select count() from person group by all; INFO FOR DB')
+    assert not is_read_query('UPDATE person SET age = 1')
+    assert not is_read_query('SELECT * FROM (CREATE person)')
+    assert not is_read_query('LET $a = 1; SELECT * FROM person')
+
+def test_single_flight_shares_calls():
+    flight = SingleFlight()
+    calls = []
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return [{'id': 'person:1'}]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [[{'id': 'person:1'}]] * 5
+    assert flight.shared == 4
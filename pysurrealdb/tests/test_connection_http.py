@@ -1,5 +1,7 @@
+import json
 import pytest
-from pysurrealdb import connect
+from pysurrealdb import connect, bulk_load, export, ShardedConnection
+from pysurrealdb.err import QueryError
 
 conn = connect('localhost', 8000, 'test', 'test', 'test', 'test', 'http')
 
@@ -51,3 +53,243 @@ def test_where():
     assert len(records) == 2
     records = conn.table('test').where('age', 2).or_where([['age', 42], ['name', '=', 'test']]).get()
     assert len(records) == 2
+
+def test_bulk_load(tmp_path):
+    conn.drop('test')
+    path = tmp_path / 'test.ndjson'
+    path.write_text('{"name": "test"}\n{"name": "test2"}\n{"name": "test3"}\n')
+    stats = bulk_load(str(path), 'test', connection=conn, workers=2, batch_rows=2)
+    assert stats.rows == 3
+    assert stats.failed_rows == 0
+    assert len(conn.get('test')) == 3
+
+def test_insert_dataframe():
+    pd = pytest.importorskip('pandas')
+    conn.drop('test')
+    df = pd.DataFrame({'key': ['a', 'b'], 'age': [2, 12], 'score': [1.5, float('nan')], 'joined': pd.to_datetime(['2024-01-01', None])})
+    assert conn.insert_dataframe('test', df, id_column='key', chunk_rows=1) == 2
+    assert conn.get('test', 'a')['age'] == 2
+    assert 'score' not in conn.get('test', 'b')
+    from pysurrealdb.dataframe import encode_dataframe
+    df = pd.DataFrame({'big': pd.Series([2**64 - 1, 2**63], dtype='uint64'), 'age': pd.Series([2, None], dtype='Int64')})
+    assert [data for _, data in encode_dataframe(df)] == ['[{"big":18446744073709551615,"age":2},{"big":9223372036854775808}]']
+
+def test_export(tmp_path):
+    conn.drop('test')
+    conn.insert('test', [{'name': 'test', 'age': 2 }, {'name': 'test2', 'age': 12}, {'name': 'test', 'age': 42}])
+    path = tmp_path / 'test.ndjson'
+    assert export(conn.table('test').where('name', 'test'), str(path), page_size=1) == 2
+    assert len(path.read_text().splitlines()) == 2
+    # a dot in a directory name is not an extension
+    (tmp_path / 'v1.2').mkdir()
+    path = tmp_path / 'v1.2' / 'test'
+    assert export(conn.table('test').where('name', 'test'), str(path)) == 2
+    assert len(path.read_text().splitlines()) == 2
+
+def test_buffered_writer():
+    conn.drop('test')
+    with conn.buffered_writer('test', max_rows=2) as writer:
+        writer.write_many([{'name': 'test'}, {'name': 'test2'}, {'name': 'test3'}])
+    assert writer.written == 3
+    assert len(conn.get('test')) == 3
+
+def test_rollup_writer():
+    conn.drop('test')
+    with conn.rollup_writer('test', bucket='1m', group_by='host', aggregates={'cpu': ['mean', 'min', 'max']}, max_groups=2) as rollup:
+        rollup.write_many([{'time': 0, 'host': 'a', 'cpu': 1}, {'time': 30, 'host': 'a', 'cpu': 3}, {'time': 61, 'host': 'a', 'cpu': 5}, {'time': 1, 'host': 'b', 'cpu': 2}])
+        rollup.flush()
+        rollup.write({'time': 59, 'host': 'a', 'cpu': 8})
+    rows = conn.table('test').where('host', 'a').order_by('time').get()
+    assert [(r['count'], r['cpu_mean'], r['cpu_min'], r['cpu_max']) for r in rows] == [(3, 4, 1, 8), (1, 5, 5, 5)]
+    assert rollup.stats()['samples'] == 5
+
+def test_transaction():
+    conn.drop('test')
+    with conn.transaction():
+        conn.create('test', {'id': 'test', 'name': 'test'})
+        conn.table('test').where('name', 'test').update({'name': 'test2'})
+        assert conn.get('test') == []
+    assert conn.get('test') == [{'id': 'test:test', 'name': 'test2'}]
+
+    conn.begin()
+    conn.insert('test', {'name': 'test3'})
+    conn.rollback()
+    assert len(conn.get('test')) == 1
+
+def test_cursor():
+    conn.drop('test')
+    cursor = conn.cursor()
+    cursor.executemany('CREATE test SET name = $name, age = $age', [{'name': 'test', 'age': 2}, {'name': 'test2', 'age': 12}])
+    assert cursor.rowcount == 2
+    cursor.execute('SELECT * FROM test WHERE age > $age', {'age': 5})
+    assert cursor.rowcount == 1
+    assert cursor.fetchone()['name'] == 'test2'
+    assert cursor.fetchone() is None
+    from pysurrealdb.cursor import bind
+    assert bind('SELECT * FROM test WHERE tags ?= %s AND age = ? AND name = name ?? ?', ['a', 1, 'b']) == 'SELECT * FROM test WHERE tags ?= "a" AND age = 1 AND name = name ?? "b"'
+
+def test_aggregate():
+    conn.drop('test')
+    conn.insert('test', [{'name': 'test', 'age': 2 }, {'name': 'test2', 'age': 12}, {'name': 'test', 'age': 42}])
+    stats = conn.table('test').aggregate(count='*', total=('sum', 'age'), oldest=('max', 'age'))
+    assert stats == {'count': 3, 'total': 56, 'oldest': 42}
+    groups = conn.table('test').group_by('name').aggregate(count='*', youngest=('min', 'age'))
+    assert groups == {'test': {'count': 2, 'youngest': 2}, 'test2': {'count': 1, 'youngest': 12}}
+    conn.drop('test')
+    conn.insert('test', [{'tags': ['a', 'b'], 'age': 2}, {'tags': ['a', 'b'], 'age': 12}, {'tags': ['c'], 'age': 42}])
+    groups = conn.table('test').group_by('tags').aggregate(count='*')
+    assert groups == {('a', 'b'): {'count': 2}, ('c',): {'count': 1}}
+
+def test_thread_local():
+    import threading
+    from pysurrealdb import Connection
+    # built without connect(), so it doesn't replace the current connection that other tests use
+    local = Connection(host='localhost', port=8000, user='test', password='test', database='test', namespace='test', client='http', thread_local=True)
+    clients = []
+    thread = threading.Thread(target=lambda: clients.append(local.client))
+    thread.start()
+    thread.join()
+    assert clients[0] is not local.client
+    assert local.query('SELECT * FROM emptytable') == []
+    local.close()
+
+def test_mirror():
+    conn.drop('test')
+    conn.insert('test', [{'id': 'us', 'code': 'US'}, {'id': 'fr', 'code': 'FR'}])
+    mirror = conn.mirror('test', indexes=['code'])
+    assert conn.table('test').where('code', 'FR').first() == {'id': 'test:fr', 'code': 'FR'}
+    assert conn.get('test', 'us') == {'id': 'test:us', 'code': 'US'}
+    assert mirror.stats()['hits'] == 1
+    conn.insert('test', {'id': 'de', 'code': 'DE'})
+    mirror.refresh()
+    assert conn.table('test').where('code', 'DE').first()['id'] == 'test:de'
+    mirror.close()
+
+def test_fan_out():
+    targets = [('test', 'tenant1'), ('test', 'tenant2')]
+    for tenant in conn.fan_out("DELETE test; CREATE test:one SET name = 'one'", targets):
+        assert tenant.ok
+    results = list(conn.fan_out(conn.table('test').where('name', 'one'), targets, concurrency=2))
+    assert sorted(r.database for r in results) == ['tenant1', 'tenant2']
+    assert all(r.result == [{'id': 'test:one', 'name': 'one'}] for r in results)
+
+def test_query_raw():
+    conn.drop('test')
+    conn.create('test', {'id': 'test', 'status': 'pending'})
+    raw = conn.query_raw('SELECT * FROM test')
+    assert isinstance(raw, bytes)
+    assert json.loads(raw)[0]['result'] == [{'id': 'test:test', 'status': 'pending'}]
+    with pytest.raises(QueryError):
+        conn.query_raw("CREATE test:test SET name = 'test'")
+
+def test_sharding():
+    settings = conn.client.settings()
+    shards = ShardedConnection({name: {**settings, 'client': conn.client.client_type, 'database': name} for name in ['shard1', 'shard2']})
+    shards.drop('test')
+    shards.insert('test', [{'id': i, 'age': i} for i in range(20)])
+    assert all(len(shard.get('test')) < 20 for shard in shards.shards.values())
+    assert shards.get('test', 7) == {'id': 'test:7', 'age': 7}
+    assert [r['age'] for r in shards.table('test').order_by('age', 'DESC').limit(3).get()] == [19, 18, 17]
+    assert shards.table('test').count() == 20
+    assert shards.table('test').aggregate(total=('sum', 'age'), avg=('avg', 'age')) == {'total': 190, 'avg': 9.5}
+    shards.close()
+
+def test_sharding_rebalance():
+    settings = conn.client.settings()
+    shards = ShardedConnection({name: {**settings, 'client': conn.client.client_type, 'database': name} for name in ['shard1', 'shard2']})
+    shards.drop('test')
+    shards.insert('test', [{'id': i, 'age': i} for i in range(50)])
+    before = {i: shards.shard_name('test', i) for i in range(50)}
+    shards.add_shard({**settings, 'client': conn.client.client_type, 'database': 'shard3'}, 'shard3')
+    shards.shards['shard3'].drop('test')
+    after = {i: shards.shard_name('test', i) for i in range(50)}
+    # only the keys the new shard takes over change owner
+    moved = [i for i in range(50) if before[i] != after[i]]
+    assert moved and all(after[i] == 'shard3' for i in moved)
+    assert shards.rebalance('test') == len(moved)
+    for name, shard in shards.shards.items():
+        assert sorted(row['age'] for row in shard.get('test')) == [i for i in range(50) if after[i] == name]
+    assert shards.table('test').count() == 50
+    shards.close()
+
+def test_indexes():
+    conn.drop('test')
+    conn.insert('test', [{'name': 'test', 'age': 2}, {'name': 'test2', 'age': 12}])
+    for index in conn.list_indexes('test'):
+        conn.drop_index('test', index['name'])
+    conn.define_index('test', 'name', unique=True)
+    assert [(i['name'], i['fields'], i['unique']) for i in conn.list_indexes('test')] == [('test_name_idx', ['name'], True)]
+    with pytest.raises(Exception):
+        conn.create('test', {'name': 'test'})
+    advisor = conn.enable_index_advisor()
+    try:
+        conn.table('test').where('age', '>', 5).get()
+        conn.table('test').where('name', 'test').get()
+        assert [s.columns for s in advisor.suggestions()] == [('age',)]
+    finally:
+        conn.disable_index_advisor()
+    assert conn._builder_hooks is None
+    conn.drop_index('test', 'test_name_idx')
+    assert conn.list_indexes('test') == []
+
+def test_explain():
+    conn.drop('test')
+    conn.insert('test', [{'name': 'test', 'age': 2}, {'name': 'test2', 'age': 12}])
+    plan = conn.table('test').where('age', '>', 5).explain()
+    assert plan.full_scan and plan.tables == ['test']
+    assert conn.table('test').where('age', '>', 5).explain(full=True).rows == 1
+    warnings = []
+    conn.enable_plan_warnings(sample_rate=1, min_rows=2, callback=lambda plan, builder, elapsed: warnings.append(plan))
+    try:
+        conn.table('test').where('age', '>', 5).get()
+        conn.table('test').where('age', '>', 6).get()
+        assert len(warnings) == 1
+    finally:
+        conn.disable_plan_warnings()
+    assert conn._builder_hooks is None
+
+def test_auth():
+    from pysurrealdb import Connection
+    basic = Connection(host='localhost', port=8000, user='test', password='test', database='test', namespace='test', client='http')
+    assert basic.query('SELECT * FROM emptytable') == []
+    assert basic.client.auth_type == 'basic' and basic.client._token is None
+    token = Connection(host='localhost', port=8000, user='test', password='test', database='test', namespace='test', client='http', auth='token')
+    assert token.query('SELECT * FROM emptytable') == []
+    assert token.client.auth_type == 'token' and token.client.auth is None and token.client._token
+
+def test_parallel_scan():
+    conn.drop('test')
+    conn.insert('test', [{'age': i} for i in range(50)])
+    rows = list(conn.table('test').where('age', '>=', 10).parallel_scan(workers=3, page_size=7))
+    assert sorted(r['age'] for r in rows) == list(range(10, 50))
+    rows = list(conn.table('test').parallel_scan(workers=3, column='age', ordered=True))
+    assert [r['age'] < 17 for r in rows][:17] == [True] * 17 and len(rows) == 50
+    conn.drop('test')
+    conn.query(';'.join(f"CREATE test SET at = <datetime> '2024-01-0{day}T00:00:00.123456789Z'" for day in range(1, 5)))
+    assert len(list(conn.table('test').parallel_scan(workers=2, column='at'))) == 4
+
+def test_as_type_aggregates():
+    from dataclasses import dataclass
+    @dataclass
+    class Person:
+        id: str
+        age: int
+    conn.drop('test')
+    conn.insert('test', [{'age': 2}, {'age': 12}])
+    assert conn.table('test').as_type(Person).count() == 2
+    assert conn.table('test').as_type(Person).max('age') == 12
+    assert conn.table('test').as_type(Person).aggregate(total=('sum', 'age')) == {'total': 14}
+    assert isinstance(conn.table('test').as_type(Person).first(), Person)
+
+def test_hedging_use():
+    from pysurrealdb import Connection
+    hedged = Connection(client=conn.client.copy())
+    reader = hedged.enable_hedging(pool_size=2, delay=0)
+    hedged.use('test', 'test_hedging')
+    hedged.drop('test')
+    hedged.create('test', {'id': 'other', 'name': 'other'})
+    assert hedged.get('test') == [{'id': 'test:other', 'name': 'other'}]
+    assert hedged.query('SELECT * FROM test') == [{'id': 'test:other', 'name': 'other'}]
+    assert hedged._hedged_reader is not reader
+    hedged.drop('test')
+    hedged.close()
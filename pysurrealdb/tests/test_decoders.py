@@ -0,0 +1,36 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional
+from pysurrealdb.decoders import get_decoder, decode_rows
+from pysurrealdb.utils import RecordID
+
+@dataclass
+class Person:
+    id: RecordID
+    name: str
+    created: Optional[datetime.datetime] = None
+    tags: list = field(default_factory=list)
+
+class Point(NamedTuple):
+    x: int
+    y: int = 0
+
+class Slotted:
+    __slots__ = ('id', 'name')
+    id: RecordID
+
+def test_dataclass():
+    person = get_decoder(Person)({'id': 'person:1', 'name': 'test', 'created': '2023-01-02T03:04:05.123456789Z', 'extra': 1})
+    assert person == Person('person:1', 'test', datetime.datetime(2023, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc))
+    assert person.id.table == 'person'
+    assert get_decoder(Person)({'id': 'person:2'}).tags == []
+
+def test_namedtuple_and_slots():
+    assert decode_rows([{'x': 1}, {'x': 2, 'y': 3}], Point) == [Point(1, 0), Point(2, 3)]
+    rows = [{'x': 1}]
+    assert decode_rows(rows, Point) == [Point(1, 0)] and rows == [{'x': 1}]
+    row = get_decoder(Slotted)({'id': 'person:1', 'name': 'test'})
+    assert (row.id, row.id.id, row.name) == ('person:1', '1', 'test')
+
+def test_decoder_is_cached():
+    assert get_decoder(Person) is get_decoder(Person)
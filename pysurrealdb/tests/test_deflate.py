@@ -0,0 +1,59 @@
+import json
+import zlib
+from websocket import ABNF
+from pysurrealdb.clients.deflate import Deflate, DeflateFrameBuffer, parse_agreement
+
+def server_frames(messages, fragment=None):
+    """Frames as a server with permessage-deflate would send them: compressed with one deflate stream, unmasked, rsv1 on the first frame."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    data = b''
+    for message in messages:
+        payload = compressor.compress(message.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        payload = payload[:-4]
+        parts = [payload[i:i + fragment] for i in range(0, len(payload), fragment)] if fragment else [payload]
+        for i, part in enumerate(parts):
+            opcode = ABNF.OPCODE_TEXT if i == 0 else ABNF.OPCODE_CONT
+            frame = ABNF(int(i == len(parts) - 1), int(i == 0), 0, 0, opcode, 0, part)
+            data += frame.format()
+    return data
+
+def reader(data):
+    buffer = bytearray(data)
+    def recv(size):
+        chunk = bytes(buffer[:size])
+        del buffer[:size]
+        return chunk
+    return recv
+
+def test_parse_agreement():
+    assert parse_agreement({'sec-websocket-extensions': 'permessage-deflate; server_no_context_takeover; client_max_window_bits=10'}) == {'server_no_context_takeover': None, 'client_max_window_bits': '10'}
+    assert parse_agreement({'sec-websocket-extensions': 'x-webkit-deflate-frame'}) is None
+    assert parse_agreement({}) is None
+
+def test_inflate_messages():
+    messages = [json.dumps({'id': str(i), 'result': [{'name': 'test', 'age': n} for n in range(100)]}) for i in range(3)]
+    deflate = Deflate({})
+    buffer = DeflateFrameBuffer(reader(server_frames(messages, fragment=50)), deflate)
+    received = []
+    for _ in messages:
+        frame = buffer.recv_frame()
+        data = frame.data
+        while not frame.fin:
+            frame = buffer.recv_frame()
+            data += frame.data
+        received.append(data)
+    assert [r.decode() for r in received] == messages
+    stats = deflate.stats()
+    assert stats['received_compressed'] == 3 and stats['bytes_saved'] > 0
+
+def test_compress_messages():
+    deflate = Deflate({'client_max_window_bits': '12'}, level=9, min_size=100)
+    small = deflate.frame('{"id":"1","method":"ping","params":[]}')
+    assert not small.rsv1
+    decompressor = zlib.decompressobj(-12)
+    for i in range(2):
+        message = json.dumps({'id': str(i), 'method': 'query', 'params': ['INSERT INTO test ' + json.dumps([{'name': 'test'}] * 100)]})
+        frame = deflate.frame(message)
+        assert frame.rsv1 and len(frame.data) < len(message)
+        assert decompressor.decompress(frame.data + b'\x00\x00\xff\xff').decode() == message
+    assert deflate.stats()['sent_compressed'] == 2
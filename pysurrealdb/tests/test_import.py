@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run(code):
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+
+def test_import_is_lazy():
+    loaded = run('import sys, pysurrealdb; print([m for m in ["requests", "websocket", "pysurrealdb.clients.http_client", "pysurrealdb.clients.ws_client"] if m in sys.modules])')
+    assert loaded == '[]'
+
+def test_config_is_read_on_first_use():
+    assert run('import sys, pysurrealdb; print(sys.modules["pysurrealdb.config"].config._config)') == 'None'
+    assert run('import pysurrealdb; print(pysurrealdb.config.default_client)') == 'http'
+
+def test_lazy_attributes():
+    assert run('import pysurrealdb; print(pysurrealdb.HttpClient.__name__, pysurrealdb.bulk_load.__name__)') == 'HttpClient bulk_load'
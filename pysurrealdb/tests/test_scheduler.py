@@ -0,0 +1,18 @@
+from pysurrealdb.scheduler import WriteScheduler
+
+def test_increases_while_fast():
+    scheduler = WriteScheduler(batch_rows=100, concurrency=2, target_latency=1.0, increase_rows=10)
+    # one round is as many batches as are allowed in flight: 2, then 3
+    for _ in range(5):
+        scheduler.record(100, 1000, 0.1)
+    assert scheduler.batch_rows == 120
+    assert scheduler.concurrency == 4
+
+def test_decreases_once_per_generation():
+    scheduler = WriteScheduler(batch_rows=100, concurrency=8, target_latency=1.0)
+    generation = scheduler.generation
+    scheduler.record(100, 1000, 0.1, error=True, generation=generation)
+    # batches sent before the decrease don't decrease again
+    scheduler.record(100, 1000, 2.0, generation=generation)
+    assert (scheduler.batch_rows, scheduler.concurrency) == (50, 4)
+    assert scheduler.stats()['errors'] == 1
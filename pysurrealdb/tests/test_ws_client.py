@@ -0,0 +1,21 @@
+import json
+from pysurrealdb.clients.ws_client import WSClient
+
+class FakeSocket:
+    """Replays messages as a server would send them."""
+    def __init__(self, messages):
+        self.messages = [json.dumps(m) for m in messages]
+    def settimeout(self, timeout):
+        pass
+    def recv(self):
+        return self.messages.pop(0)
+    def recv_data(self):
+        return 1, self.messages.pop(0).encode()
+
+def test_recv_skips_messages_without_id():
+    messages = [{'result': {'action': 'CREATE', 'result': {'name': 'test'}}}, {'id': 'old', 'result': [1]}, {'id': '2', 'result': [2]}]
+    for raw in (False, True):
+        client = WSClient('ws://localhost', 8000, 'test', 'test', 'test', 'test')
+        client.sock = FakeSocket(messages)
+        assert client._recv('2', raw=raw) in ([2], b'[2]')
+        assert client.notification() == {'action': 'CREATE', 'result': {'name': 'test'}}
@@ -0,0 +1,66 @@
+import json
+
+from .utils import verify_table_and_id
+
+
+def _content(data):
+    """Encode record data as a SurrealQL object, leaving out the id since it is part of the record name."""
+    return json.dumps({k: v for k, v in data.items() if k != 'id'}, default=str, ensure_ascii=False)
+
+
+class Transaction:
+    """
+    Collects write statements, and sends them as one transaction when committed.
+
+    This is used by Connection.begin() and Connection.transaction(). You should not need to create one directly.
+    Reads made during a transaction are sent straight away, so they don't see the writes that are waiting to be committed.
+    """
+    def __init__(self, client):
+        self.client = client
+        self.statements = []
+
+    def add(self, sql):
+        """Add a statement to the transaction."""
+        sql = sql.strip().rstrip(';')
+        if sql:
+            self.statements.append(sql)
+
+    def create(self, table, data):
+        if isinstance(data, list):
+            return self.insert_batch(table, data)
+        table, id = verify_table_and_id(table, str(data['id']) if data.get('id') is not None else None)
+        target = f'{table}:{id}' if id else table
+        self.add(f'CREATE {target} CONTENT {_content(data)}')
+
+    def insert_batch(self, table, data):
+        if not isinstance(data, str):
+            data = json.dumps(data, default=str, ensure_ascii=False)
+        self.add(f'INSERT INTO {table} {data}')
+
+    def update(self, table, data=None):
+        if data is None:
+            data = table
+            table = str(data['id'])
+        table, id = verify_table_and_id(table, str(data['id']) if data.get('id') is not None else None)
+        if not id:
+            raise ValueError("Cannot update a record without an ID.")
+        self.add(f'UPDATE {table}:{id} CONTENT {_content(data)}')
+
+    def delete(self, table, id=None):
+        table, id = verify_table_and_id(table, id)
+        if not id:
+            raise ValueError("Cannot delete a record without an ID. If you meant to delete the entire table, use the drop() method.")
+        self.add(f'DELETE {table}:{id}')
+
+    def drop(self, table):
+        self.add(f'DELETE {table}')
+
+    def to_sql(self):
+        """Return the transaction as a string."""
+        return 'BEGIN TRANSACTION;\n' + ''.join(f'{sql};\n' for sql in self.statements) + 'COMMIT TRANSACTION;'
+
+    def commit(self):
+        """Send the statements in one request, and return their results."""
+        if not self.statements:
+            return []
+        return self.client.query(self.to_sql())
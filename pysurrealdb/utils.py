@@ -1,3 +1,9 @@
+import json
+import re
+
+from .err import QueryError
+
+
 def verify_table_and_id(table=None, id=None):
     """
     Verifies the table and id parameters and returns them seperately.
@@ -39,4 +45,42 @@ def verify_table_and_id(table=None, id=None):
     return table, id
 
 
+class RecordID(str):
+    """
+    A record id, like 'person:tobie'.
+    It is a str, so it can be used anywhere a record id string is expected, with table and id attributes for the two parts.
+    """
+    __slots__ = ()
+
+    def __new__(cls, table, id=None):
+        table, id = verify_table_and_id(table, id)
+        return super().__new__(cls, f'{table}:{id}')
+
+    @property
+    def table(self):
+        return self.split(':', 1)[0]
+
+    @property
+    def id(self):
+        return self.split(':', 1)[1]
 
+    def __repr__(self):
+        return f'RecordID({str(self)!r})'
+
+
+# The status of a failed statement. Strings in JSON can't contain an unescaped quote, so this only matches keys and values, never text inside a string.
+_failed_status = re.compile(rb'"status"\s*:\s*"ERR"')
+
+
+def check_raw_result(data):
+    """
+    Raise QueryError if a raw JSON reply (a list of statement results) has a failed statement, without decoding it.
+
+    The reply is only searched for an ERR status. If there is one, it may belong to a record with a status field, so the reply is then decoded to check each statement.
+    """
+    if not _failed_status.search(data):
+        return data
+    for statement in json.loads(data):
+        if statement.get('status') != 'OK':
+            raise QueryError("Query failed.", statement.get('result'))
+    return data
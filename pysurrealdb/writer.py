@@ -0,0 +1,141 @@
+import atexit
+import json
+import queue
+import threading
+import time
+
+from .config import config
+
+
+class BufferedWriter:
+    """
+    Buffers records in memory and inserts them in batches from a background thread.
+
+    Use Connection.buffered_writer() to create one. Records are encoded when they are written, so later changes to a record don't affect what is stored.
+    A batch is sent when it reaches max_rows or max_bytes, or when flush_interval seconds have passed since the last flush.
+    If the buffered and in-flight data reaches max_buffer_bytes, write() blocks until a batch has been sent.
+    """
+    def __init__(self, connection, table, max_rows=1000, max_bytes=1000000, flush_interval=1.0, max_buffer_bytes=None, on_error=None):
+        self.connection = connection
+        self.table = table
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_buffer_bytes = max_buffer_bytes or max_bytes * 10
+        self.on_error = on_error
+        self.written = 0
+        self.failed = 0
+
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._in_flight_bytes = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f'pysurrealdb-writer-{table}', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def write(self, record, block=True, timeout=None):
+        """
+        Add a record to the buffer.
+
+        Raises queue.Full if the buffer is full and block is False, or if it is still full after timeout seconds.
+        """
+        row = json.dumps(record, default=str, ensure_ascii=False)
+        size = len(row)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._closed:
+                raise ValueError('Cannot write to a closed BufferedWriter.')
+            # backpressure: wait for the flush thread to make room
+            while self._buffer and self._buffer_bytes + self._in_flight_bytes + size > self.max_buffer_bytes:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    raise queue.Full(f'BufferedWriter for {self.table} is full.')
+                self._cond.wait(remaining)
+            self._buffer.append(row)
+            self._buffer_bytes += size
+            if len(self._buffer) >= self.max_rows or self._buffer_bytes >= self.max_bytes:
+                self._cond.notify_all()
+
+    def write_many(self, records, block=True, timeout=None):
+        """Add several records to the buffer."""
+        for record in records:
+            self.write(record, block, timeout)
+
+    def flush(self):
+        """Send everything in the buffer and wait for it to finish."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while (self._buffer or self._in_flight_bytes) and self._thread.is_alive():
+                self._cond.wait()
+
+    def close(self):
+        """Flush the buffer, stop the background thread and close the writer's connection. Safe to call more than once."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        atexit.unregister(self.close)
+        # the connection is the writer's own copy, from Connection.buffered_writer()
+        self.connection.close()
+
+    def _take_batch(self):
+        """Remove up to max_rows rows and max_bytes bytes from the buffer. Called with the lock held."""
+        count, size = 0, 0
+        for row in self._buffer:
+            if count and (count >= self.max_rows or size + len(row) > self.max_bytes):
+                break
+            count += 1
+            size += len(row)
+        batch = self._buffer[:count]
+        del self._buffer[:count]
+        self._buffer_bytes -= size
+        self._in_flight_bytes += size
+        return batch, size
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            with self._cond:
+                while not (self._closed or self._flush_requested or len(self._buffer) >= self.max_rows or self._buffer_bytes >= self.max_bytes):
+                    remaining = self.flush_interval - (time.monotonic() - last_flush)
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._buffer:
+                    self._flush_requested = False
+                    self._cond.notify_all()
+                    if self._closed:
+                        return
+                    last_flush = time.monotonic()
+                    continue
+                batch, size = self._take_batch()
+
+            self._send(batch)
+            last_flush = time.monotonic()
+            with self._cond:
+                self._in_flight_bytes -= size
+                self._cond.notify_all()
+
+    def _send(self, batch):
+        try:
+            self.connection.insert_batch(self.table, '[' + ','.join(batch) + ']')
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            if self.on_error:
+                try:
+                    self.on_error(e, [json.loads(row) for row in batch])
+                except Exception as callback_error:
+                    if config.warnings: print('SurrealDB: BufferedWriter error callback failed.', callback_error)
+            elif config.warnings:
+                print(f'SurrealDB: Buffered write of {len(batch)} records to {self.table} failed.', e)